@@ -0,0 +1,27 @@
+"""Add update_alias_sequence_table
+
+Revision ID: 3cde3882bc24
+Revises: 1c58aa468b17
+Create Date: 2026-10-19 10:41:12.318790
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '3cde3882bc24'
+down_revision = '1c58aa468b17'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('update_alias_sequence_table',
+        sa.Column('id_prefix', sa.Unicode(length=25), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('last_id', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id_prefix', 'year')
+    )
+
+
+def downgrade():
+    op.drop_table('update_alias_sequence_table')
@@ -0,0 +1,27 @@
+"""Add cache_version_table
+
+Revision ID: 4f2a8e4c9d7b
+Revises: 3cde3882bc24
+Create Date: 2026-10-19 11:02:47.551204
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4f2a8e4c9d7b'
+down_revision = '3cde3882bc24'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    versions = op.create_table('cache_version_table',
+        sa.Column('name', sa.Unicode(length=64), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(versions, [{'name': u'releases', 'version': 1}])
+
+
+def downgrade():
+    op.drop_table('cache_version_table')
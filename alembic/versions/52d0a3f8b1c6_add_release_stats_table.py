@@ -0,0 +1,34 @@
+"""Add release_stats_table
+
+Revision ID: 52d0a3f8b1c6
+Revises: 4f2a8e4c9d7b
+Create Date: 2026-10-19 12:20:05.734112
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '52d0a3f8b1c6'
+down_revision = '4f2a8e4c9d7b'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.create_table('release_stats_table',
+        sa.Column('release_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.Unicode(length=32), nullable=False),
+        sa.Column('status', sa.Unicode(length=32), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['release_id'], ['releases.id'], ),
+        sa.PrimaryKeyConstraint('release_id', 'type', 'status')
+    )
+    op.execute('INSERT INTO release_stats_table '
+               '(release_id, type, status, count) '
+               'SELECT release_id, type, status, COUNT(id) FROM updates '
+               'WHERE release_id IS NOT NULL '
+               'GROUP BY release_id, type, status')
+
+
+def downgrade():
+    op.drop_table('release_stats_table')
@@ -0,0 +1,23 @@
+"""Add packages.test_cases_synced
+
+Revision ID: 8e1f3c5a7b92
+Revises: 52d0a3f8b1c6
+Create Date: 2026-10-19 18:02:41.318295
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '8e1f3c5a7b92'
+down_revision = '52d0a3f8b1c6'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('packages', sa.Column('test_cases_synced', sa.DateTime(),
+                                        nullable=True))
+
+
+def downgrade():
+    op.drop_column('packages', 'test_cases_synced')
@@ -61,7 +61,6 @@ BuildRequires:   createrepo_c
 
 # External resources
 BuildRequires:   python-bugzilla
-BuildRequires:   python-simplemediawiki
 BuildRequires:   fedmsg
 
 BuildRequires:   python-sphinx
@@ -146,7 +145,6 @@ Requires:   createrepo_c
 
 # External resources
 Requires:   python-bugzilla
-Requires:   python-simplemediawiki
 Requires:   fedmsg
 
 Requires:   python-sphinx
@@ -206,6 +204,9 @@ PYTHONPATH=. %{__python} setup.py test
 %{python_sitelib}/%{name}/
 %{_bindir}/initialize_bodhi_db
 %{_bindir}/bodhi-expire-overrides
+%{_bindir}/bodhi-refresh-release-stats
+%{_bindir}/bodhi-refresh-critpath
+%{_bindir}/bodhi-sync-test-cases
 %config(noreplace) %{_sysconfdir}/httpd/conf.d/bodhi.conf
 %dir %{_sysconfdir}/bodhi/
 %attr(-,bodhi,root) %{_datadir}/%{name}
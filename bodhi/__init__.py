@@ -13,7 +13,6 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from collections import defaultdict
-from dogpile.cache import make_region
 from sqlalchemy import engine_from_config
 
 from pyramid.settings import asbool
@@ -45,9 +44,7 @@ def get_dbsession(request):
 
 
 def get_cacheregion(request):
-    region = make_region()
-    region.configure_from_config(request.registry.settings, "dogpile.cache.")
-    return region
+    return request.registry.cache
 
 
 def get_user(request):
@@ -75,6 +72,15 @@ def get_buildinfo(request):
     return defaultdict(dict)
 
 
+def get_entities(request):
+    """
+    A per-request cache of the models looked up by their id, so that the ACL
+    factories, validators and views don't query the same row over and over.
+    See `BodhiBase.get_for_request`.
+    """
+    return {}
+
+
 #
 # Cornice filters
 #
@@ -95,8 +101,9 @@ DEFAULT_FILTERS.insert(0, exception_filter)
 
 def main(global_config, testing=None, **settings):
     """ This function returns a WSGI application """
-    from bodhi.models import DBSession, Base
+    from bodhi.models import DBSession, Base, setup_savepoints
     engine = engine_from_config(settings, 'sqlalchemy.')
+    setup_savepoints(engine)
     DBSession.configure(bind=engine)
     Base.metadata.bind = engine
 
@@ -120,6 +127,31 @@ def main(global_config, testing=None, **settings):
     config = Configurator(settings=settings,
                           session_factory=session_factory)
 
+    # A single cache region shared by every request of this process
+    from bodhi.cache import make_cacheregion
+    config.registry.cache = make_cacheregion(settings)
+
+    # The package ACLs from pkgdb, cached in that region
+    from bodhi.acls import ACLStore
+    config.registry.acls = ACLStore(config.registry.cache, settings)
+
+    # Runtime metrics, reported at /admin/metrics
+    from bodhi.metrics import metrics
+    metrics.configure(settings)
+    if metrics.enabled:
+        metrics.listen(engine)
+        metrics.register_collector(lambda: [
+            ('bodhi_cache_%s_total' % kind, {'namespace': namespace}, value)
+            for namespace, counts in config.registry.cache.stats().items()
+            for kind, value in counts.items()])
+        config.add_tween('bodhi.metrics.metrics_tween_factory')
+
+    # Opt-in SQL profiling, reported at /admin/sql
+    if asbool(settings.get('profiling.sql', False)):
+        from bodhi.profiling import QueryProfiler
+        config.registry.sql_profiler = QueryProfiler(engine, settings)
+        config.add_tween('bodhi.profiling.sql_profiling_tween_factory')
+
     # Plugins
     config.include('pyramid_mako')
     config.include('cornice')
@@ -130,6 +162,7 @@ def main(global_config, testing=None, **settings):
     config.add_request_method(get_dbsession, 'db', reify=True)
     config.add_request_method(get_cacheregion, 'cache', reify=True)
     config.add_request_method(get_buildinfo, 'buildinfo', reify=True)
+    config.add_request_method(get_entities, 'entities', reify=True)
 
     # Templating
     config.add_mako_renderer('.html', settings_prefix='mako.')
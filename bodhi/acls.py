@@ -0,0 +1,190 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+A cache of the package ACLs kept in the Package Database.
+
+The ACLs of each package and branch are kept in the ``acls`` namespace of the
+cache region for ``dogpile.cache.expiration_time.acls`` seconds, a day by
+default, and never less than twice ``acls.refresh_after``.  Once they are
+older than ``acls.refresh_after`` seconds they are still served, but get
+refreshed from pkgdb in a background thread.  Packages missing from the cache
+are fetched concurrently, ``acls.workers`` at a time::
+
+    dogpile.cache.expiration_time.acls = 86400
+    acls.refresh_after = 600
+    acls.workers = 4
+"""
+
+import threading
+import time
+
+from multiprocessing.pool import ThreadPool
+
+from dogpile.cache.api import NO_VALUE
+
+from bodhi import log
+from bodhi.metrics import metrics
+from bodhi.outbound import outbound
+
+
+def parse_acls(acls):
+    """ Pull the users who can commit and are watching a package.
+
+    Return two two-tuples of lists:
+    * The first tuple is for usernames.  The second tuple is for groups.
+    * The first list of the tuple is for committers. The second is for
+      watchers.
+    """
+    watchers = []
+    committers = []
+    watchergroups = []
+    committergroups = []
+
+    for package in acls['packages']:
+        for acl in package.get('acls', []):
+            if acl['status'] == 'Approved':
+                if acl['acl'] == 'watchcommits':
+                    name = acl['fas_name']
+                    if name.startswith('group::'):
+                        watchergroups.append(name.split('::')[1])
+                    else:
+                        watchers.append(name)
+                elif acl['acl'] == 'commit':
+                    name = acl['fas_name']
+                    if name.startswith('group::'):
+                        committergroups.append(name.split('::')[1])
+                    else:
+                        committers.append(name)
+
+    return (committers, watchers), (committergroups, watchergroups)
+
+
+def call_pkgdb(url, path, **params):
+    """ Query the pkgdb API, and return its answer
+
+    Raises an IOError when pkgdb can't be reached or returns an error.
+    """
+    url = url.rstrip('/') + '/api' + path
+    with metrics.timer('bodhi_external_seconds', service='pkgdb',
+                       method=path.strip('/')):
+        output = outbound.json('GET', url, params=params)
+    if not output or 'error' in output:
+        raise IOError('pkgdb returned %r for %s' % (
+            output and output.get('error'), url))
+    return output
+
+
+def fetch_pkgdb_acls(package, branch, settings):
+    """ Ask pkgdb for the ACLs of the given package """
+    return parse_acls(call_pkgdb(
+        settings.get('pkgdb_url'), '/package/', pkgname=package,
+        branches=branch, acls=True, namespace='rpms'))
+
+
+class ACLStore(object):
+    """ The cached ACLs of our packages, shared by every request """
+
+    namespace = 'acls'
+
+    def __init__(self, region, settings, fetch=None):
+        self.region = region
+        self.settings = settings
+        self.refresh_after = int(settings.get('acls.refresh_after', 600))
+        # The ACLs must outlive refresh_after, or they'd never get refreshed
+        # in the background before expiring
+        self.expiration_time = max(
+            region.expiration_times.get(self.namespace, 86400),
+            2 * self.refresh_after)
+        self.workers = int(settings.get('acls.workers', 4))
+        self.fetch = fetch or (lambda package, branch: fetch_pkgdb_acls(
+            package, branch, settings))
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    def key(self, package, branch):
+        return '%s|%s %s' % (self.namespace, package, branch)
+
+    def get(self, package, branch):
+        """ Return the ACLs of a package, in the form of `parse_acls` """
+        return self.get_many([package], branch)[package]
+
+    def get_many(self, packages, branch):
+        """
+        Return a dict of the ACLs of the given packages, only asking pkgdb
+        about the ones that aren't cached yet.
+        """
+        values = self.region.get_multi(
+            [self.key(package, branch) for package in packages],
+            expiration_time=self.expiration_time)
+        now = time.time()
+        acls, missing, stale = {}, [], []
+        for package, value in zip(packages, values):
+            if value is NO_VALUE:
+                missing.append(package)
+                continue
+            fetched, acls[package] = value
+            if now - fetched > self.refresh_after:
+                stale.append(package)
+        self.region.count(self.namespace, hits=len(acls),
+                          misses=len(missing))
+
+        if missing:
+            acls.update(self.refresh(missing, branch))
+        if stale:
+            self.refresh_in_background(stale, branch)
+        return acls
+
+    def refresh(self, packages, branch):
+        """ Fetch the ACLs of the given packages from pkgdb, and cache them """
+        fetch = lambda package: self.fetch(package, branch)
+        if len(packages) == 1 or self.workers < 2:
+            results = map(fetch, packages)
+        else:
+            pool = ThreadPool(min(self.workers, len(packages)))
+            try:
+                results = pool.map(fetch, packages)
+            finally:
+                pool.close()
+        now = time.time()
+        self.region.set_multi(dict(
+            (self.key(package, branch), (now, result))
+            for package, result in zip(packages, results)))
+        return dict(zip(packages, results))
+
+    def refresh_in_background(self, packages, branch):
+        with self.lock:
+            packages = [package for package in packages
+                        if (package, branch) not in self.refreshing]
+            self.refreshing.update((package, branch) for package in packages)
+        if not packages:
+            return
+
+        def work():
+            try:
+                self.refresh(packages, branch)
+            except Exception:
+                log.exception('Unable to refresh the ACLs of %s' % packages)
+            finally:
+                with self.lock:
+                    self.refreshing.difference_update(
+                        (package, branch) for package in packages)
+
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def invalidate(self, package, branch):
+        self.region.delete(self.key(package, branch))
@@ -18,6 +18,7 @@ import xmlrpclib
 from kitchen.text.converters import to_unicode
 from bunch import Bunch
 from bodhi.config import config
+from bodhi.metrics import metrics
 
 log = logging.getLogger('bodhi')
 
@@ -27,7 +28,7 @@ class BugTracker(object):
     def _(self, *args, **kw):  # pragma: no cover
         raise NotImplementedError
 
-    getbug = update_details = modified = on_qa = close = update_details = _
+    getbug = getbugs = update_details = modified = on_qa = close = update_details = _
 
 
 class FakeBugTracker(BugTracker):
@@ -35,6 +36,9 @@ class FakeBugTracker(BugTracker):
     def getbug(self, bug_id, *args, **kw):
         return Bunch(bug_id=int(bug_id))
 
+    def getbugs(self, bug_ids):
+        return [self.getbug(bug_id) for bug_id in bug_ids]
+
     def __noop__(self, *args, **kw):
         log.debug('__noop__(%s)' % str(args))
 
@@ -57,9 +61,16 @@ class Bugzilla(BugTracker):
     def get_url(self, bug_id):
         return "%s/show_bug.cgi?id=%s" % (config['bz_baseurl'], bug_id)
 
+    @metrics.timed('bugzilla')
     def getbug(self, bug_id):
         return self.bz.getbug(bug_id)
 
+    @metrics.timed('bugzilla')
+    def getbugs(self, bug_ids):
+        """ Fetch many bugs in one call, with None for the inaccessible ones """
+        return self.bz.getbugs(bug_ids)
+
+    @metrics.timed('bugzilla')
     def comment(self, bug_id, comment):
         try:
             bug = self.bz.getbug(bug_id)
@@ -67,6 +78,7 @@ class Bugzilla(BugTracker):
         except:
             log.exception("Unable to add comment to bug #%d" % bug_id)
 
+    @metrics.timed('bugzilla')
     def on_qa(self, bug_id, comment):
         """
         Change the status of this bug to ON_QA, and comment on the bug with
@@ -79,6 +91,7 @@ class Bugzilla(BugTracker):
         except:
             log.exception("Unable to alter bug #%d" % bug_id)
 
+    @metrics.timed('bugzilla')
     def close(self, bug_id, fixedin=None):
         args = {}
         if fixedin:
@@ -89,6 +102,7 @@ class Bugzilla(BugTracker):
         except xmlrpclib.Fault:
             log.exception("Unable to close bug #%d" % self.bug_id)
 
+    @metrics.timed('bugzilla')
     def update_details(self, bug, bug_entity):
         if not bug:
             try:
@@ -109,6 +123,7 @@ class Bugzilla(BugTracker):
         if 'security' in [keyword.lower() for keyword in keywords]:
             bug_entity.security = True
 
+    @metrics.timed('bugzilla')
     def modified(self, bug_id):
         try:
             bug = self.bz.getbug(bug_id)
@@ -129,3 +144,9 @@ if config.get('bugtracker') == 'bugzilla':
 else:
     log.info('Using the FakeBugTracker')
     bugtracker = FakeBugTracker()
+
+
+def comment_on_bugs(comments):
+    """ Post a list of (bug_id, comment) pairs, usually as a background job """
+    for bug_id, comment in comments:
+        bugtracker.comment(bug_id, comment)
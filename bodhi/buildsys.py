@@ -12,11 +12,16 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+import re
 import time
 import logging
+import threading
 
+from collections import OrderedDict
 from os.path import join, expanduser
 
+from bodhi.metrics import metrics
+
 log = logging.getLogger(__name__)
 
 _buildsystem = None
@@ -288,6 +293,304 @@ class DevBuildsys(Buildsystem):
         }
 
 
+def _simulated_call(method):
+    """
+    Wrap a SimulatedBuildsys method so that it either pays for a round-trip to
+    the hub, or is queued when the session is in multicall mode.
+    """
+    def call(self, *args, **kw):
+        if self.multicall:
+            self._queue.append((method, args, kw))
+            return None
+        self._round_trip()
+        with self._lock:
+            return method(self, *args, **kw)
+    call.__name__ = method.__name__
+    call.__doc__ = method.__doc__
+    return call
+
+
+class SimulatedBuildsys(Buildsystem):
+    """
+    A simulated Koji hub for benchmarking bodhi without a real buildsystem.
+
+    Unlike the DevBuildsys, which returns the same canned data instantly, this
+    keeps its tags, builds, RPMs and tasks in an in-memory store shared by all
+    sessions, and sleeps for `latency` seconds on every round-trip to the hub.
+    As with a real ClientSession, calls made while `multicall` is set are
+    queued and answered together by a single round-trip in `multiCall()`.
+
+    It is enabled and seeded through the settings::
+
+        buildsystem = simulated
+        buildsystem.latency = 0.05
+        buildsystem.task_duration = 10
+        buildsystem.tags = f23-updates-candidate f23-updates-testing f23
+        buildsystem.builds_per_tag = 5000
+        buildsystem.rpms_per_build = 10
+
+    Builds that bodhi asks about but which were never seeded are created on
+    the fly, and tagged into their release's candidate tag, so that any
+    update can be submitted against it.
+    """
+    latency = 0
+    task_duration = 0
+    rpms_per_build = 2
+
+    # Number of round-trips made to the hub, across all sessions
+    round_trips = 0
+
+    _lock = threading.RLock()
+    _builds = {}        # nvr -> build info
+    _build_ids = {}     # build id -> nvr
+    _rpms = {}          # build id -> [rpm info]
+    _tags = {}          # tag name -> tag info
+    _tagged = {}        # tag name -> OrderedDict of the nvrs tagged, in order
+    _tasks = {}         # task id -> task info
+    _packages = {}      # package name -> package id
+
+    def __init__(self):
+        self.multicall = False
+        self._queue = []
+
+    @classmethod
+    def configure(cls, settings):
+        """ Apply the buildsystem.* settings, and seed the store """
+        cls.latency = float(settings.get('buildsystem.latency', 0))
+        cls.task_duration = float(settings.get('buildsystem.task_duration', 0))
+        cls.rpms_per_build = int(settings.get('buildsystem.rpms_per_build', 2))
+        cls.clear()
+        cls.populate(settings.get('buildsystem.tags', '').split(),
+                     int(settings.get('buildsystem.builds_per_tag', 0)))
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls.round_trips = 0
+            cls._builds = {}
+            cls._build_ids = {}
+            cls._rpms = {}
+            cls._tags = {}
+            cls._tagged = {}
+            cls._tasks = {}
+            cls._packages = {}
+
+    @classmethod
+    def populate(cls, tags, builds_per_tag):
+        """
+        Tag `builds_per_tag` builds into each of the given tags.  Tags of the
+        same release share the same builds, as they would in Koji.
+        """
+        with cls._lock:
+            for tag in tags:
+                dist = cls._dist(tag)
+                for i in range(builds_per_tag):
+                    cls._tag('simulated%05d-1.0-1.%s' % (i, dist), tag)
+
+    @staticmethod
+    def _dist(tag):
+        """ Return the dist tag of the builds in the given koji tag """
+        match = re.match(r'(?:dist-)?(f|el|epel)(\d+)', tag)
+        if not match:
+            return 'sim'
+        return '%s%s' % ('fc' if match.group(1) == 'f' else 'el',
+                         match.group(2))
+
+    @classmethod
+    def _candidate_tag(cls, nvr):
+        for token in nvr.rsplit('-', 1)[-1].split('.'):
+            if token.startswith('fc'):
+                return 'f%s-updates-candidate' % token[2:]
+            if token.startswith('el'):
+                return 'epel%s-testing-candidate' % token[2:]
+        raise ValueError("Couldn't determine dist for build '%s'" % nvr)
+
+    @classmethod
+    def _get_tag(cls, name):
+        if name not in cls._tags:
+            cls._tags[name] = {
+                'id': len(cls._tags) + 1, 'name': name, 'arches': None,
+                'locked': False, 'perm': None, 'perm_id': None,
+                'maven_support': False, 'maven_include_all': False}
+            cls._tagged[name] = OrderedDict()
+        return cls._tags[name]
+
+    @classmethod
+    def _get_build(cls, nvr, create=True):
+        """ Look up a build by its nvr or id, creating unknown nvrs """
+        if isinstance(nvr, int):
+            nvr = cls._build_ids.get(nvr)
+        if nvr in cls._builds or not create or nvr is None:
+            return cls._builds.get(nvr)
+
+        name, version, release = nvr.rsplit('-', 2)
+        build_id = len(cls._builds) + 1
+        cls._builds[nvr] = {
+            'id': build_id, 'build_id': build_id, 'nvr': nvr, 'name': name,
+            'package_name': name, 'package_id': cls._package_id(name),
+            'version': version, 'release': release, 'epoch': None,
+            'state': 1, 'owner_id': 1, 'owner_name': 'bodhi',
+            'task_id': None, 'creation_time': '2015-01-01 00:00:00.000000',
+            'completion_time': '2015-01-01 01:00:00.000000'}
+        cls._build_ids[build_id] = nvr
+        rpm = {'build_id': build_id, 'buildroot_id': 1, 'buildtime': 1420070400,
+               'epoch': None, 'nvr': nvr, 'version': version,
+               'release': release, 'size': 1024, 'payloadhash': '0' * 32}
+        cls._rpms[build_id] = [
+            dict(rpm, id=build_id * 1000 + i, name=name,
+                 arch='src' if i == 0 else 'x86_64')
+            for i in range(cls.rpms_per_build)]
+
+        # Anything built in koji lands in its candidate tag
+        try:
+            cls._tag(nvr, cls._candidate_tag(nvr))
+        except ValueError:
+            pass
+        return cls._builds[nvr]
+
+    @classmethod
+    def _package_id(cls, name):
+        return cls._packages.setdefault(name, len(cls._packages) + 1)
+
+    @classmethod
+    def _tag(cls, nvr, tag):
+        cls._get_tag(tag)
+        cls._get_build(nvr)
+        cls._tagged[tag][nvr] = True
+
+    @classmethod
+    def _task(cls):
+        now = time.time()
+        task_id = len(cls._tasks) + 1
+        cls._tasks[task_id] = {'id': task_id, 'create_ts': now,
+                               'completion_ts': now + cls.task_duration}
+        return task_id
+
+    def _round_trip(self):
+        with self._lock:
+            SimulatedBuildsys.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def multiCall(self, strict=False):
+        """
+        Run the queued calls in one round-trip.  Each result is wrapped in a
+        list, or replaced by a fault dict when the call raised.
+        """
+        calls, self._queue, self.multicall = self._queue, [], False
+        self._round_trip()
+        results = []
+        with self._lock:
+            for method, args, kw in calls:
+                try:
+                    results.append([method(self, *args, **kw)])
+                except Exception as e:
+                    if strict:
+                        raise
+                    results.append({'faultCode': 1000,
+                                    'faultString': str(e)})
+        return results
+
+    @_simulated_call
+    def ssl_login(self, *args, **kw):
+        return True
+
+    @_simulated_call
+    def getBuild(self, buildInfo, strict=False):
+        build = self._get_build(buildInfo, create=not isinstance(buildInfo,
+                                                                 int))
+        if build is None and strict:
+            raise koji.GenericError('No such build: %s' % buildInfo)
+        return build and dict(build)
+
+    @_simulated_call
+    def listBuildRPMs(self, buildID, *args, **kw):
+        build = self._get_build(buildID, create=not isinstance(buildID, int))
+        if not build:
+            return []
+        return [dict(rpm) for rpm in self._rpms[build['id']]]
+
+    @_simulated_call
+    def getRPMHeaders(self, rpmID, headers):
+        build = self._get_build(rpmID // 1000, create=False)
+        if not build:
+            return {}
+        return {'name': build['name'], 'version': build['version'],
+                'release': build['release'], 'url': '',
+                'summary': 'Simulated %s' % build['name'],
+                'description': 'A simulated build of %s' % build['name'],
+                'changelogname': [], 'changelogtime': [], 'changelogtext': []}
+
+    @_simulated_call
+    def listTags(self, build, *args, **kw):
+        build = self._get_build(build)
+        return [dict(self._tags[tag]) for tag in sorted(self._tagged)
+                if build['nvr'] in self._tagged[tag]]
+
+    @_simulated_call
+    def listTagged(self, tag, event=None, inherit=False, prefix=None,
+                   latest=False, package=None, **kw):
+        builds = OrderedDict()
+        for nvr in self._tagged.get(tag, ()):
+            build = self._builds[nvr]
+            if package and build['name'] != package:
+                continue
+            if latest:
+                # The most recently tagged build of each package wins
+                builds.pop(build['name'], None)
+            builds[build['name'] if latest else nvr] = build
+        return [dict(build, tag_name=tag)
+                for build in reversed(builds.values())]
+
+    def getLatestBuilds(self, tag, event=None, package=None, **kw):
+        return self.listTagged(tag, event=event, package=package, latest=True)
+
+    @_simulated_call
+    def listPackages(self):
+        return [{'package_id': package_id, 'package_name': name}
+                for name, package_id in sorted(self._packages.items(),
+                                               key=lambda item: item[1])]
+
+    @_simulated_call
+    def getTag(self, taginfo, strict=False, **kw):
+        if isinstance(taginfo, int):
+            for tag in self._tags.itervalues():
+                if tag['id'] == taginfo:
+                    return dict(tag)
+        elif taginfo in self._tags:
+            return dict(self._tags[taginfo])
+        if strict:
+            raise koji.GenericError("Invalid tagInfo: '%s'" % taginfo)
+        return None
+
+    @_simulated_call
+    def tagBuild(self, tag, build, force=False, *args, **kw):
+        self._tag(self._get_build(build)['nvr'], tag)
+        return self._task()
+
+    @_simulated_call
+    def untagBuild(self, tag, build, *args, **kw):
+        self._tagged.get(tag, {}).pop(self._get_build(build)['nvr'], None)
+
+    @_simulated_call
+    def moveBuild(self, from_tag, to_tag, build, *args, **kw):
+        nvr = self._get_build(build)['nvr']
+        self._tagged.get(from_tag, {}).pop(nvr, None)
+        self._tag(nvr, to_tag)
+        return self._task()
+
+    @_simulated_call
+    def taskFinished(self, task):
+        return time.time() >= self._tasks[task]['completion_ts']
+
+    @_simulated_call
+    def getTaskInfo(self, task):
+        info = dict(self._tasks[task])
+        info['state'] = koji.TASK_STATES[
+            'CLOSED' if time.time() >= info['completion_ts'] else 'OPEN']
+        return info
+
+
 def koji_login(config):
     """ Login to Koji and return the session """
     koji_client = koji.ClientSession(_koji_hub, {})
@@ -296,6 +599,31 @@ def koji_login(config):
     return koji_client
 
 
+def list_tags(session, builds):
+    """
+    Return the names of the tags of each build.  Koji is asked about all of
+    them in a single multicall, but sessions that can't answer those, like the
+    DevBuildsys, get asked about them one at a time.
+    """
+    results = []
+    if len(builds) > 1:
+        session.multicall = True
+        for build in builds:
+            session.listTags(build)
+        results = session.multiCall() or []
+        session.multicall = False
+    if len(results) < len(builds):
+        return [[tag['name'] for tag in session.listTags(build)]
+                for build in builds]
+    tags = []
+    for build, result in zip(builds, results):
+        if isinstance(result, dict):
+            raise Exception('Unable to list the tags of %s: %s' % (
+                build, result.get('faultString')))
+        tags.append([tag['name'] for tag in result[0]])
+    return tags
+
+
 def get_certs(config):
     """ Return paths to the local certs needed log into koji """
     client = config.get('client_cert', join(expanduser('~'), '.fedora.cert'))
@@ -325,12 +653,18 @@ def setup_buildsystem(settings):
 
     if buildsys == 'koji':
         log.debug('Using Koji Buildsystem')
-        _buildsystem = lambda: koji_login(config=settings)
+        _buildsystem = lambda: metrics.instrument(
+            koji_login(config=settings), 'koji')
 
     elif buildsys in ('dev', 'dummy', None):
         log.debug('Using DevBuildsys')
         _buildsystem = DevBuildsys
 
+    elif buildsys == 'simulated':
+        log.debug('Using SimulatedBuildsys')
+        SimulatedBuildsys.configure(settings)
+        _buildsystem = lambda: metrics.instrument(SimulatedBuildsys(), 'koji')
+
 
 def wait_for_tasks(tasks, sleep=300):
     """
@@ -0,0 +1,154 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Bodhi's process-wide dogpile.cache region.
+
+A single region is built by :func:`bodhi.main` and handed out as
+``request.cache``.  It is configured with the usual ``dogpile.cache.*``
+settings, so any dogpile backend may be used, including the in-memory
+LRU backend defined here::
+
+    dogpile.cache.backend = bodhi.lru
+    dogpile.cache.arguments.max_size = 10000
+    dogpile.cache.expiration_time = 100
+
+    # Per-namespace overrides of the expiration time
+    dogpile.cache.expiration_time.home = 60
+    dogpile.cache.expiration_time.avatar = 86400
+"""
+
+import threading
+
+from collections import defaultdict, OrderedDict
+
+from dogpile.cache import register_backend
+from dogpile.cache.api import NO_VALUE
+from dogpile.cache.backends.memory import MemoryBackend
+from dogpile.cache.region import CacheRegion
+from dogpile.cache.util import function_key_generator
+
+register_backend('bodhi.lru', 'bodhi.cache', 'LRUMemoryBackend')
+
+
+class LRUMemoryBackend(MemoryBackend):
+    """ An in-memory backend that only keeps the `max_size` most recent keys """
+
+    def __init__(self, arguments):
+        self.max_size = int(arguments.pop('max_size', 10000))
+        arguments.setdefault('cache_dict', OrderedDict())
+        super(LRUMemoryBackend, self).__init__(arguments)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._cache.pop(key, NO_VALUE)
+            if value is not NO_VALUE:
+                self._cache[key] = value
+            return value
+
+    def get_multi(self, keys):
+        return [self.get(key) for key in keys]
+
+    def set(self, key, value):
+        with self._lock:
+            self._cache.pop(key, None)
+            self._cache[key] = value
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def set_multi(self, mapping):
+        for key, value in mapping.items():
+            self.set(key, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._cache.pop(key, None)
+
+    def delete_multi(self, keys):
+        for key in keys:
+            self.delete(key)
+
+
+def namespace_key_generator(namespace, fn, **kw):
+    """
+    Prefix our cache keys with just the namespace when one is given, so that
+    the region can tell which namespace a key belongs to.
+    """
+    generate_key = function_key_generator(None, fn, **kw)
+    if namespace is None:
+        return generate_key
+    return lambda *args: namespace + '|' + generate_key(*args).split('|', 1)[1]
+
+
+class BodhiCacheRegion(CacheRegion):
+    """
+    A dogpile region that applies per-namespace expiration times and keeps
+    hit and miss counters for each namespace.
+    """
+
+    def __init__(self, *args, **kw):
+        kw.setdefault('function_key_generator', namespace_key_generator)
+        super(BodhiCacheRegion, self).__init__(*args, **kw)
+        self.expiration_times = {}
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._stats_lock = threading.Lock()
+
+    def configure_from_config(self, config_dict, prefix):
+        expiration = '%sexpiration_time.' % prefix
+        for key, value in config_dict.items():
+            if key.startswith(expiration):
+                self.expiration_times[key[len(expiration):]] = int(value)
+        return super(BodhiCacheRegion, self).configure_from_config(
+            config_dict, prefix)
+
+    def get_or_create(self, key, creator, expiration_time=None,
+                      should_cache_fn=None):
+        namespace = key.split('|', 1)[0]
+        if expiration_time is None:
+            expiration_time = self.expiration_times.get(namespace)
+        created = []
+
+        def counting_creator():
+            created.append(True)
+            return creator()
+
+        value = super(BodhiCacheRegion, self).get_or_create(
+            key, counting_creator, expiration_time, should_cache_fn)
+        if created:
+            self.count(namespace, misses=1)
+        else:
+            self.count(namespace, hits=1)
+        return value
+
+    def count(self, namespace, hits=0, misses=0):
+        """ Record hits and misses of lookups bypassing get_or_create """
+        with self._stats_lock:
+            self.hits[namespace] += hits
+            self.misses[namespace] += misses
+
+    def stats(self):
+        """ Return the hit and miss counts of each namespace """
+        with self._stats_lock:
+            return dict((namespace, {
+                'hits': self.hits[namespace],
+                'misses': self.misses[namespace],
+            }) for namespace in set(self.hits) | set(self.misses))
+
+
+def make_cacheregion(settings, prefix='dogpile.cache.'):
+    region = BodhiCacheRegion()
+    region.configure_from_config(settings, prefix)
+    return region
@@ -42,19 +42,30 @@ def cli():
 @click.option('--suggest', help='Post-update user suggestion',
               type=click.Choice(['logout', 'reboot']))
 @click.option('--file', help='A text file containing all the update details')
-def new(username, password, **kwargs):
+@click.option('--batch-size', default=50, type=click.IntRange(1, 100),
+              help='How many updates of the file to submit at once')
+def new(username, password, batch_size, **kwargs):
     client = BodhiClient()
     client.login(username, password)
 
     if kwargs['file'] is None:
-        updates = [kwargs]
-
-    else:
-        updates = client.parse_file(os.path.abspath(kwargs['file']))
-
-    for update in updates:
-        resp = client.new(**update)
+        resp = client.new(**kwargs)
         print_resp(resp)
+        return
+
+    updates = client.parse_file(os.path.abspath(kwargs['file']))
+    for start in range(0, len(updates), batch_size):
+        batch = updates[start:start + batch_size]
+        resp = client.new_batch(batch)
+        for number, (update, result) in enumerate(
+                zip(batch, resp['updates']), start + 1):
+            if 'update' in result:
+                status = 'created %s' % result['update']['title']
+            else:
+                status = '; '.join(error['description']
+                                   for error in result['errors'])
+            click.echo('[%d/%d] %s: %s' % (number, len(updates),
+                                           update['builds'], status))
 
 
 @cli.command()
@@ -12,6 +12,8 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+import json
+
 from fedora.client import OpenIdBaseClient
 
 BASE_URL = 'http://127.0.0.1:6543'
@@ -26,6 +28,19 @@ class BodhiClient(OpenIdBaseClient):
         return self.send_request('/updates/', verb='POST', auth=True,
                                  data=kwargs)
 
+    def new_batch(self, updates):
+        """ Submit several updates at once.
+
+        :arg updates: A list of dictionaries of update values, like the ones
+            returned by ``parse_file``.
+
+        The server saves each update on its own, and answers with either the
+        update or the errors of each one, in order.
+        """
+        return self.send_request('/updates/batch/', verb='POST', auth=True,
+                                 data=json.dumps(dict(updates=updates)),
+                                 headers={'Content-Type': 'application/json'})
+
     def query(self, **kwargs):
         return self.send_request('/updates/', verb='GET', params=kwargs)
 
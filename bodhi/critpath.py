@@ -0,0 +1,112 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+The critical path packages of each collection.
+
+The lists come from pkgdb when ``critpath.type = pkgdb``, or else from the
+``critpath_pkgs`` setting.  Each collection's list is kept as a frozenset for
+``critpath.cache_ttl`` seconds, after which it is still used while being
+refreshed in a background thread.
+"""
+
+import threading
+import time
+
+from bodhi import log
+from bodhi.acls import call_pkgdb
+from bodhi.config import config
+
+
+def fetch_critpath_pkgs(collection):
+    """ Return the critical path packages of a collection """
+    critpath_pkgs = []
+    critpath_type = config.get('critpath.type')
+    if critpath_type == 'pkgdb':
+        results = call_pkgdb(config.get('pkgdb_url'), '/critpath/',
+                             branches=collection, format='json')
+        if collection in results['pkgs']:
+            critpath_pkgs = results['pkgs'][collection]
+    else:
+        critpath_pkgs = config.get('critpath_pkgs', '').split()
+    return frozenset(critpath_pkgs)
+
+
+class CritpathStore(object):
+    """ Caches the critical path packages of each collection """
+
+    def __init__(self, fetch=fetch_critpath_pkgs):
+        self.fetch = fetch
+        self.cache = {}
+        self.refreshing = set()
+        self.lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return int(config.get('critpath.cache_ttl', 3600))
+
+    def get(self, collection='master'):
+        """ Return a frozenset of the collection's critical path packages """
+        entry = self.cache.get(collection)
+        if entry is None:
+            return self.refresh(collection)
+        fetched, packages = entry
+        if time.time() - fetched > self.ttl:
+            self.refresh_in_background(collection)
+        return packages
+
+    def filter(self, packages, collection='master'):
+        """ Return which of the given packages are in the critical path """
+        return self.get(collection).intersection(packages)
+
+    def any(self, packages, collection='master'):
+        """ Return whether any of the given packages is in the critical path """
+        return not self.get(collection).isdisjoint(packages)
+
+    def refresh(self, collection):
+        packages = self.fetch(collection)
+        with self.lock:
+            self.cache[collection] = (time.time(), packages)
+        return packages
+
+    def refresh_in_background(self, collection):
+        with self.lock:
+            if collection in self.refreshing:
+                return
+            self.refreshing.add(collection)
+
+        def work():
+            try:
+                self.refresh(collection)
+            except Exception:
+                log.exception('Unable to refresh the %s critpath' % collection)
+            finally:
+                with self.lock:
+                    self.refreshing.discard(collection)
+
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def invalidate(self, collection=None):
+        with self.lock:
+            if collection is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(collection, None)
+
+
+# The critical path packages, shared by the whole process
+critpath = CritpathStore()
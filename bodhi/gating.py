@@ -0,0 +1,159 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Checking updates against the taskotron results they require.
+
+The masher checks a whole push at once: the results of each update are
+fetched from resultsdb ``gating.workers`` at a time, and the results of each
+(update, testcase) pair are cached for ``gating.results_ttl`` seconds so that
+a resumed or repeated push doesn't query them again.  Testcases without any
+result are never cached, as their results may show up at any time, and
+nothing is cached when resultsdb fails partway through the results::
+
+    gating.workers = 8
+    gating.results_ttl = 300
+"""
+
+import threading
+import time
+
+from collections import defaultdict
+from multiprocessing.pool import ThreadPool
+
+import bodhi.util
+from bodhi import log
+from bodhi.config import config
+from bodhi.metrics import metrics
+from bodhi.resultsdb import get_resultsdb
+
+
+def evaluate_requirements(requirements, results):
+    """ Check a list of taskotron results against the required testcases
+
+    Returns a tuple containing (result, reason) where result is a boolean
+    and reason is a string.
+    """
+    for testcase in requirements:
+        relevant = [result for result in results
+                    if result['testcase']['name'] == testcase]
+
+        if not relevant:
+            return False, 'No result found for required %s' % testcase
+
+        by_arch = defaultdict(list)
+        for r in relevant:
+            by_arch[r['result_data'].get('arch', ['noarch'])[0]].append(r)
+
+        for arch, results_ in by_arch.items():
+            latest = results_[0]  # TODO - do these need to be sorted still?
+            if latest['outcome'] not in ['PASSED', 'INFO']:
+                return False, "Required task %s returned %s" % (
+                    latest['testcase']['name'], latest['outcome'])
+
+    # TODO - check require_bugs and require_testcases also?
+
+    return True, "All checks pass."
+
+
+class Gating(object):
+    """ Checks the requirements of many updates, caching their results """
+
+    def __init__(self, settings=None):
+        self._settings = settings
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return config if self._settings is None else self._settings
+
+    @property
+    def ttl(self):
+        return int(self.settings.get('gating.results_ttl', 300))
+
+    @property
+    def workers(self):
+        return int(self.settings.get('gating.workers', 8))
+
+    def results(self, item, testcases):
+        """
+        Return the results of an item for the given testcases.  Raises an
+        IOError when resultsdb can't be reached.
+        """
+        now = time.time()
+        ttl = self.ttl
+        with self.lock:
+            cached = [self.cache.get((item, testcase)) for testcase in testcases]
+        if all(entry and now - entry[0] <= ttl for entry in cached):
+            metrics.inc('bodhi_gating_lookups_total', cached='true')
+            return sum([results for fetched, results in cached], [])
+
+        metrics.inc('bodhi_gating_lookups_total', cached='false')
+        results = list(get_resultsdb(self.settings).get('results', title=item))
+        by_testcase = defaultdict(list)
+        for result in results:
+            by_testcase[result['testcase']['name']].append(result)
+        with self.lock:
+            for testcase, relevant in by_testcase.items():
+                self.cache[(item, testcase)] = (now, relevant)
+        return results
+
+    def check(self, item, requirements):
+        if not requirements:
+            return True, "All checks pass."
+        try:
+            results = self.results(item, requirements)
+        except IOError as e:
+            return False, "Failed to talk to taskotron: %r" % e.message
+        return evaluate_requirements(requirements, results)
+
+    def check_updates(self, updates):
+        """ Check the requirements of updates in one pass
+
+        Returns a dict mapping each update's title to its (result, reason).
+        """
+        self.expire()
+        pending = [(update.title, list(bodhi.util.tokenize(
+            update.requirements or ''))) for update in updates]
+        check = lambda args: self.check(*args)
+        start = time.time()
+        if len(pending) < 2 or self.workers < 2:
+            outcomes = map(check, pending)
+        else:
+            pool = ThreadPool(min(self.workers, len(pending)))
+            try:
+                outcomes = pool.map(check, pending)
+            finally:
+                pool.close()
+        log.debug('Gated %d updates in %0.2fs' % (
+            len(pending), time.time() - start))
+        return dict((title, outcome) for (title, requirements), outcome
+                    in zip(pending, outcomes))
+
+    def expire(self):
+        """ Drop the results that are older than the TTL """
+        oldest = time.time() - self.ttl
+        with self.lock:
+            for key, (fetched, results) in self.cache.items():
+                if fetched < oldest:
+                    del self.cache[key]
+
+    def invalidate(self):
+        with self.lock:
+            self.cache.clear()
+
+
+# The cached results, shared by every push of the masher
+gating = Gating()
@@ -0,0 +1,157 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Work that shouldn't hold up a request, like commenting on bugs.
+
+Jobs are deferred while handling a request, and handed to a pool of
+``jobs.workers`` threads once the request's transaction commits, so that they
+never act on changes that got rolled back.  Each job runs in a transaction of
+its own, so it must be given ids rather than model instances.  With
+``jobs.workers = 0`` the jobs run in the committing thread instead::
+
+    jobs.workers = 4
+
+Code that can wait, like sending mail and fedmsg messages, goes through
+`JobQueue.later`: it runs right away, unless it is called within a
+`JobQueue.collect` block, in which case all of it is deferred as one job.
+
+Work that may still be undone before the transaction commits, like saving
+one update of a batch in a savepoint, can `JobQueue.hold` its jobs back and
+only `JobQueue.release` them once it has gone through.
+"""
+
+import threading
+
+from contextlib import contextmanager
+from multiprocessing.pool import ThreadPool
+
+import transaction
+
+from bodhi import log
+from bodhi.config import config
+from bodhi.metrics import metrics
+
+
+class JobQueue(object):
+    """ Runs jobs in a pool of threads once the current transaction commits """
+
+    def __init__(self):
+        self.pool = None
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @property
+    def workers(self):
+        return int(config.get('jobs.workers', 4))
+
+    def defer(self, func, *args, **kw):
+        """ Run `func(*args, **kw)` once the current transaction commits """
+        held = getattr(self.local, 'held', None)
+        if held is not None:
+            held.append((func, args, kw))
+            return
+        transaction.get().addAfterCommitHook(
+            self._after_commit, args=(func, args, kw))
+
+    @property
+    def collecting(self):
+        """ Whether `later` is collecting work in this thread """
+        return getattr(self.local, 'collected', None) is not None
+
+    @contextmanager
+    def collect(self):
+        """
+        Gather the work handed to `later` within this block, and defer all of
+        it as a single job once the block is over.
+        """
+        if self.collecting:
+            yield
+            return
+        self.local.collected = collected = []
+        try:
+            yield
+        finally:
+            self.local.collected = None
+        if collected:
+            self.defer(run_all, collected)
+
+    @contextmanager
+    def hold(self):
+        """
+        Hold back the jobs deferred within this block, yielding the list of
+        them.  They are dropped unless they are given to `release`.
+        """
+        previous = getattr(self.local, 'held', None)
+        self.local.held = held = []
+        try:
+            yield held
+        finally:
+            self.local.held = previous
+
+    def release(self, held):
+        """ Defer the jobs that were held back by `hold` """
+        for func, args, kw in held:
+            self.defer(func, *args, **kw)
+
+    def later(self, func, *args, **kw):
+        """ Run `func(*args, **kw)` now, or with the collected work """
+        if not self.collecting:
+            return func(*args, **kw)
+        self.local.collected.append((func, args, kw))
+
+    def _after_commit(self, success, func, args, kw):
+        if success:
+            self.submit(func, *args, **kw)
+        else:
+            log.debug('Dropping %s, the transaction failed' % func.__name__)
+
+    def submit(self, func, *args, **kw):
+        """ Run `func(*args, **kw)` in the pool right away """
+        metrics.add('bodhi_queue_depth', 1, queue='jobs')
+        if self.workers < 1:
+            return self.run(func, args, kw)
+        with self.lock:
+            if self.pool is None:
+                self.pool = ThreadPool(self.workers)
+        self.pool.apply_async(self.run_in_thread, (func, args, kw))
+
+    def run(self, func, args, kw):
+        try:
+            with transaction.manager:
+                func(*args, **kw)
+        except Exception:
+            log.exception('Job %s%r failed' % (func.__name__, args))
+        finally:
+            metrics.add('bodhi_queue_depth', -1, queue='jobs')
+
+    def run_in_thread(self, func, args, kw):
+        from bodhi.models import DBSession
+        try:
+            self.run(func, args, kw)
+        finally:
+            DBSession.remove()
+
+
+def run_all(calls):
+    """ Make each of the (func, args, kw) calls, whether or not others fail """
+    for func, args, kw in calls:
+        try:
+            func(*args, **kw)
+        except Exception:
+            log.exception('%s%r failed' % (func.__name__, args))
+
+
+# The background jobs of the whole process
+jobs = JobQueue()
@@ -22,6 +22,8 @@ from kitchen.iterutils import iterate
 from . import log
 from .util import get_rpm_header
 from .config import config
+from .jobs import jobs
+from .metrics import metrics
 
 #
 # All of the email messages that bodhi is going to be sending around.
@@ -402,9 +404,10 @@ def _send_mail(from_addr, to_addr, body):
         return
     smtp = None
     try:
-        log.debug('Connecting to %s', smtp_server)
-        smtp = smtplib.SMTP(smtp_server)
-        smtp.sendmail(from_addr, [to_addr], body)
+        with metrics.in_progress('bodhi_queue_depth', queue='mail'):
+            log.debug('Connecting to %s', smtp_server)
+            smtp = smtplib.SMTP(smtp_server)
+            smtp.sendmail(from_addr, [to_addr], body)
     except:
         log.exception('Unable to send mail')
     finally:
@@ -432,7 +435,7 @@ def send_mail(from_addr, to_addr, subject, body_text, headers=None):
     body = '\r\n'.join(msg)
 
     log.info('Sending mail to %s: %s', to_addr, subject)
-    _send_mail(from_addr, to_addr, body)
+    jobs.later(_send_mail, from_addr, to_addr, body)
 
 
 def send(to, msg_type, update, sender=None, agent=None):
@@ -22,7 +22,7 @@ mashed.
 import os
 import json
 import time
-import urllib2
+import requests
 import hashlib
 import threading
 import fedmsg.consumers
@@ -32,6 +32,8 @@ from collections import defaultdict
 from bodhi import log, buildsys, notifications, mail, util
 from bodhi.util import sorted_updates, sanity_check_repodata
 from bodhi.config import config
+from bodhi.gating import gating
+from bodhi.outbound import outbound
 from bodhi.models import (Update, UpdateRequest, UpdateType, Release,
                           UpdateStatus, ReleaseState)
 from bodhi.metadata import ExtendedMetadata
@@ -337,8 +339,9 @@ class MasherThread(threading.Thread):
 
     def perform_gating(self):
         self.log.debug('Performing gating.')
+        outcomes = gating.check_updates(self.updates)
         for update in list(self.updates):
-            result, reason = update.check_requirements(self.db, config)
+            result, reason = outcomes[update.title]
             if not result:
                 self.log.warn("%s failed gating: %s" % (update.title, reason))
                 self.eject_from_mash(update, reason)
@@ -402,7 +405,7 @@ class MasherThread(threading.Thread):
                     bug.update_details()
 
     def determine_tag_actions(self):
-        tag_types, tag_rels = Release.get_tags()
+        tag_types, tag_rels = Release.get_tags(self.db)
         for update in sorted_updates(self.updates):
             if update.status is UpdateStatus.testing:
                 status = 'testing'
@@ -611,12 +614,13 @@ class MasherThread(threading.Thread):
         while True:
             time.sleep(600)
             try:
-                masterrepomd = urllib2.urlopen(master_repomd %
-                                               self.release.get_version())
-            except (urllib2.URLError, urllib2.HTTPError):
+                masterrepomd = outbound.get(master_repomd %
+                                            self.release.get_version())
+                masterrepomd.raise_for_status()
+            except requests.RequestException:
                 self.log.exception('Error fetching repomd.xml')
                 continue
-            newsum = hashlib.sha1(masterrepomd.read()).hexdigest()
+            newsum = hashlib.sha1(masterrepomd.content).hexdigest()
             if newsum == checksum:
                 self.log.info("master repomd.xml matches!")
                 notifications.publish(topic="mashtask.sync.done", msg=dict(
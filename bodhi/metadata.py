@@ -20,12 +20,12 @@ import shutil
 import tempfile
 
 from datetime import datetime
-from urlgrabber.grabber import urlgrab
 from kitchen.text.converters import to_bytes
 
 import createrepo_c as cr
 
 from bodhi.config import config
+from bodhi.outbound import outbound
 from bodhi.models import Build, UpdateStatus, UpdateRequest, UpdateSuggestion
 from bodhi.buildsys import get_session
 
@@ -302,7 +302,11 @@ class ExtendedMetadata(object):
                 tempdir = tempfile.mkdtemp('bodhi')
                 local_tags = os.path.join(tempdir, 'pkgtags.sqlite')
                 log.info('Downloading %s' % tags_url)
-                urlgrab(tags_url, filename=local_tags)
+                response = outbound.get(tags_url, stream=True)
+                response.raise_for_status()
+                with open(local_tags, 'wb') as tags:
+                    for chunk in response.iter_content(64 * 1024):
+                        tags.write(chunk)
                 self.modifyrepo(local_tags)
             except:
                 log.exception("There was a problem injecting pkgtags")
@@ -0,0 +1,415 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Runtime metrics, exposed to admins in the Prometheus text format at
+``/admin/metrics``.
+
+Recording is a no-op until :func:`bodhi.main` enables it::
+
+    metrics = true
+    # A directory shared by every WSGI worker of this host.  Each process
+    # periodically writes its metrics there, and they are summed when scraped.
+    metrics.dir = /var/cache/bodhi/metrics
+    metrics.flush_interval = 10
+    # Upper bounds, in seconds, of the latency histogram buckets
+    metrics.buckets = 0.005 0.01 0.025 0.05 0.1 0.25 0.5 1 2.5 5 10
+
+Code talking to other services can time its calls with::
+
+    with metrics.timer('bodhi_external_seconds', service='pkgdb',
+                       method='get_package'):
+        ...
+"""
+
+import atexit
+import binascii
+import errno
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+from pyramid.settings import asbool
+from sqlalchemy import event
+
+log = logging.getLogger('bodhi')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# The renderer that produced each content type of our responses
+RENDERERS = {
+    'application/json': 'json',
+    'text/json': 'json',
+    'application/javascript': 'jsonp',
+    'application/atom+xml': 'rss',
+    'application/rss+xml': 'rss',
+    'text/html': 'html',
+}
+
+
+def format_labels(labels):
+    return ','.join('%s="%s"' % (key, unicode(value).replace('\\', '\\\\')
+                                 .replace('"', '\\"').replace('\n', '\\n'))
+                    for key, value in sorted(labels.items()))
+
+
+class Metrics(object):
+    """
+    Counters, gauges and histograms for the current process.
+
+    Samples are kept as ``{name: {labels: value}}`` dicts, where `labels` is
+    the already formatted label string, so that the samples of several
+    processes can be merged with a plain sum.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.directory = None
+        self.flush_interval = 10
+        self.buckets = DEFAULT_BUCKETS
+        self.collectors = []
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self._token = None
+        self.reset()
+
+    def configure(self, settings):
+        self.enabled = asbool(settings.get('metrics', False))
+        self.directory = settings.get('metrics.dir')
+        self.flush_interval = int(settings.get('metrics.flush_interval', 10))
+        self.collectors = []
+        if 'metrics.buckets' in settings:
+            self.buckets = tuple(sorted(
+                float(bucket) for bucket in settings['metrics.buckets'].split()))
+        self.reset()
+        if self.enabled and self.directory:
+            try:
+                os.makedirs(self.directory)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+
+    def reset(self):
+        with self.lock:
+            self.counters = defaultdict(lambda: defaultdict(float))
+            self.gauges = defaultdict(lambda: defaultdict(float))
+            self.histograms = defaultdict(dict)
+            self.last_flush = time.time()
+
+    #
+    # Recording
+    #
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name][format_labels(labels)] += value
+
+    def set(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name][format_labels(labels)] = value
+
+    def add(self, name, value, **labels):
+        """ Move a gauge up or down by `value` """
+        if not self.enabled:
+            return
+        with self.lock:
+            self.gauges[name][format_labels(labels)] += value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        with self.lock:
+            key = format_labels(labels)
+            histogram = self.histograms[name].get(key)
+            if histogram is None:
+                histogram = self.histograms[name][key] = {
+                    'buckets': [0] * len(self.buckets), 'sum': 0.0,
+                    'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    histogram['buckets'][i] += 1
+                    break
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """ Observe how long the block took, even when it raised """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.observe(name, time.time() - start, **labels)
+
+    def timed(self, service):
+        """ Decorate a function calling `service`, to time its calls """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kw):
+                with self.timer('bodhi_external_seconds', service=service,
+                                method=fn.__name__):
+                    return fn(*args, **kw)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def in_progress(self, name, **labels):
+        """ Count the block in the given gauge while it runs """
+        self.add(name, 1, **labels)
+        try:
+            yield
+        finally:
+            self.add(name, -1, **labels)
+
+    def instrument(self, obj, service):
+        """ Return a proxy of `obj` timing all of its method calls """
+        if not self.enabled:
+            return obj
+        return InstrumentedProxy(obj, service, self)
+
+    def register_collector(self, collector):
+        """
+        Register a function returning ``(name, labels, value)`` counters to
+        report in each snapshot, for stats that are kept elsewhere.
+        """
+        self.collectors.append(collector)
+
+    #
+    # Database time
+    #
+
+    def listen(self, engine):
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _before_execute(self, conn, *args):
+        conn.info.setdefault('metrics_start_time', []).append(time.time())
+
+    def _after_execute(self, conn, *args):
+        duration = time.time() - conn.info['metrics_start_time'].pop()
+        if getattr(self.local, 'db_time', None) is not None:
+            self.local.db_time += duration
+
+    #
+    # Aggregation
+    #
+
+    def snapshot(self):
+        """ Return the samples of this process """
+        with self.lock:
+            counters = dict((name, dict(samples))
+                            for name, samples in self.counters.items())
+            snapshot = {
+                'pid': os.getpid(),
+                'token': self.token,
+                'counters': counters,
+                'gauges': dict((name, dict(samples))
+                               for name, samples in self.gauges.items()),
+                'histograms': json.loads(json.dumps(self.histograms)),
+            }
+        for collector in self.collectors:
+            for name, labels, value in collector():
+                counters.setdefault(name, {})[format_labels(labels)] = value
+        return snapshot
+
+    @property
+    def token(self):
+        """
+        A random token telling this process apart from the exited ones that
+        had the same pid, so that it never overwrites their samples.
+        """
+        pid = os.getpid()
+        if self._token is None or self._token[0] != pid:
+            self._token = (pid, binascii.hexlify(os.urandom(8)))
+        return self._token[1]
+
+    def path(self, pid=None, token=None):
+        if pid is None:
+            pid, token = os.getpid(), self.token
+        return os.path.join(self.directory, 'bodhi-%d-%s.json' % (pid, token))
+
+    def flush(self):
+        """ Write this process's samples to the shared directory """
+        if not (self.enabled and self.directory):
+            return
+        self.last_flush = time.time()
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.bodhi-')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.rename(tmp, self.path())
+
+    def maybe_flush(self):
+        if time.time() - self.last_flush >= self.flush_interval:
+            try:
+                self.flush()
+            except (IOError, OSError):
+                log.exception('Unable to flush the metrics')
+
+    def collect(self):
+        """
+        Return the samples of every process, summed.  Counters and histograms
+        of exited workers are kept, so that the totals never go down, but
+        only live workers contribute to the gauges.  When a pid was reused,
+        the latest file written with it is the live one.
+        """
+        snapshots = [self.snapshot()]
+        if self.directory:
+            others = []
+            for filename in os.listdir(self.directory):
+                if not (filename.startswith('bodhi-') and
+                        filename.endswith('.json')):
+                    continue
+                path = os.path.join(self.directory, filename)
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                    mtime = os.path.getmtime(path)
+                except (IOError, OSError, ValueError):
+                    continue
+                if path == self.path():
+                    continue
+                others.append((mtime, snapshot))
+
+            live = set([os.getpid()])
+            for mtime, snapshot in sorted(others, reverse=True):
+                if snapshot['pid'] in live or not pid_alive(snapshot['pid']):
+                    snapshot['gauges'] = {}
+                else:
+                    live.add(snapshot['pid'])
+                snapshots.append(snapshot)
+
+        merged = {'counters': defaultdict(lambda: defaultdict(float)),
+                  'gauges': defaultdict(lambda: defaultdict(float)),
+                  'histograms': defaultdict(dict)}
+        for snapshot in snapshots:
+            for kind in ('counters', 'gauges'):
+                for name, samples in snapshot[kind].items():
+                    for labels, value in samples.items():
+                        merged[kind][name][labels] += value
+            for name, samples in snapshot['histograms'].items():
+                for labels, histogram in samples.items():
+                    total = merged['histograms'][name].setdefault(labels, {
+                        'buckets': [0] * len(histogram['buckets']),
+                        'sum': 0.0, 'count': 0})
+                    total['buckets'] = [a + b for a, b in zip(
+                        total['buckets'], histogram['buckets'])]
+                    total['sum'] += histogram['sum']
+                    total['count'] += histogram['count']
+        return merged
+
+    def render(self):
+        """ Render the merged samples in the Prometheus text format """
+        merged = self.collect()
+        lines = []
+        for kind, type_ in (('counters', 'counter'), ('gauges', 'gauge')):
+            for name in sorted(merged[kind]):
+                lines.append('# TYPE %s %s' % (name, type_))
+                for labels, value in sorted(merged[kind][name].items()):
+                    lines.append('%s%s %s' % (name, '{%s}' % labels
+                                              if labels else '', value))
+        for name in sorted(merged['histograms']):
+            lines.append('# TYPE %s histogram' % name)
+            for labels, histogram in sorted(merged['histograms'][name].items()):
+                prefix = labels + ',' if labels else ''
+                count = 0
+                for bound, value in zip(self.buckets, histogram['buckets']):
+                    count += value
+                    lines.append('%s_bucket{%sle="%s"} %d' % (
+                        name, prefix, bound, count))
+                lines.append('%s_bucket{%sle="+Inf"} %d' % (
+                    name, prefix, histogram['count']))
+                suffix = '{%s}' % labels if labels else ''
+                lines.append('%s_sum%s %s' % (name, suffix, histogram['sum']))
+                lines.append('%s_count%s %d' % (name, suffix,
+                                                histogram['count']))
+        return '\n'.join(lines) + '\n'
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+    return True
+
+
+class InstrumentedProxy(object):
+    """ Times the method calls made to a client of another service """
+
+    def __init__(self, obj, service, metrics):
+        self.__dict__['_obj'] = obj
+        self.__dict__['_service'] = service
+        self.__dict__['_metrics'] = metrics
+
+    def __getattr__(self, name):
+        attr = getattr(self._obj, name)
+        if not callable(attr):
+            return attr
+
+        def timed(*args, **kw):
+            with self._metrics.timer('bodhi_external_seconds',
+                                     service=self._service, method=name):
+                return attr(*args, **kw)
+        return timed
+
+    def __setattr__(self, name, value):
+        setattr(self._obj, name, value)
+
+
+def metrics_tween_factory(handler, registry):
+    """ Record the latency and DB time of each request """
+    if not metrics.enabled:
+        return handler
+
+    def metrics_tween(request):
+        start = time.time()
+        metrics.local.db_time = 0.0
+        status = 500
+        response = None
+        try:
+            response = handler(request)
+            status = response.status_int
+            return response
+        finally:
+            route = request.matched_route
+            route = route.name if route else 'notfound'
+            renderer = 'other'
+            if response is not None:
+                renderer = RENDERERS.get(response.content_type, 'other')
+            metrics.observe('bodhi_request_seconds', time.time() - start,
+                            route=route, renderer=renderer)
+            metrics.observe('bodhi_request_db_seconds', metrics.local.db_time,
+                            route=route)
+            metrics.inc('bodhi_responses_total', route=route,
+                        status='%dxx' % (status // 100))
+            metrics.local.db_time = None
+            metrics.maybe_flush()
+
+    return metrics_tween
+
+
+# The metrics of this process
+metrics = Metrics()
+atexit.register(lambda: metrics.enabled and metrics.flush())
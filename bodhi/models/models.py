@@ -22,31 +22,40 @@ import time
 import xmlrpclib
 
 from textwrap import wrap
-from datetime import datetime
-from collections import defaultdict
+from datetime import datetime, timedelta
+from collections import defaultdict, OrderedDict
 
 from sqlalchemy import Unicode, UnicodeText, Integer, Boolean
 from sqlalchemy import DateTime
-from sqlalchemy import Table, Column, ForeignKey
-from sqlalchemy import and_, or_
+from sqlalchemy import Table, Column, ForeignKey, PrimaryKeyConstraint
+from sqlalchemy import and_, or_, select, event, func
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import scoped_session, sessionmaker, relationship, backref
-from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm import class_mapper, contains_eager, lazyload
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import get_history
 from sqlalchemy.orm.properties import RelationshipProperty
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm.exc import NoResultFound
-from zope.sqlalchemy import ZopeTransactionExtension
+from zope.sqlalchemy import ZopeTransactionExtension, mark_changed
 from pyramid.settings import asbool
 
 from bodhi import buildsys, mail, notifications, log
 from bodhi.util import (
-    header, build_evr, get_nvr, flash_log, get_age, get_critpath_pkgs,
+    header, build_evr, get_nvr, flash_log, get_age,
     get_rpm_header, get_age_in_days, avatar as get_avatar, tokenize,
 )
 import bodhi.util
 from bodhi.models.enum import DeclEnum, EnumSymbol
 from bodhi.exceptions import BodhiException, LockedUpdateException
 from bodhi.config import config
-from bodhi.bugs import bugtracker
+from bodhi.acls import fetch_pkgdb_acls
+from bodhi.bugs import bugtracker, comment_on_bugs
+from bodhi.critpath import critpath
+from bodhi.gating import evaluate_requirements
+from bodhi.jobs import jobs
+from bodhi.resultsdb import get_resultsdb
+from bodhi.wiki import wiki
 
 try:
     import rpm
@@ -68,6 +77,21 @@ class BodhiBase(object):
             getattr(cls, col) == id for col in cls.__get_by__
         )).first()
 
+    @classmethod
+    def get_for_request(cls, id, request):
+        """
+        Like `get`, but remembers what it found in `request.entities` so that
+        the ACL factories, validators and views of a request share one query.
+        """
+        obj = request.entities.get((cls, id))
+        if obj is None:
+            obj = cls.get(id, request.db)
+            if obj is not None:
+                for col in cls.__get_by__:
+                    request.entities[(cls, getattr(obj, col))] = obj
+                request.entities[(cls, id)] = obj
+        return obj
+
     def __getitem__(self, key):
         return getattr(self, key)
 
@@ -179,6 +203,24 @@ metadata = Base.metadata
 DBSession = scoped_session(sessionmaker(extension=ZopeTransactionExtension()))
 
 
+def setup_savepoints(engine):
+    """
+    Let SAVEPOINTs work on SQLite, by taking the handling of transactions
+    away from pysqlite, which otherwise commits on its own and drops them.
+    Other databases are left alone.
+    """
+    if engine.dialect.name != 'sqlite':
+        return
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        connection.execute('BEGIN')
+
+
 ##
 ## Enumerated type declarations
 ##
@@ -259,6 +301,44 @@ user_package_table = Table('user_package_table', metadata,
         Column('user_id', Integer, ForeignKey('users.id')),
         Column('package_id', Integer, ForeignKey('packages.id')))
 
+# The last update number handed out for each (Release.id_prefix, year)
+update_alias_sequence_table = Table('update_alias_sequence_table', metadata,
+        Column('id_prefix', Unicode(25), nullable=False),
+        Column('year', Integer, nullable=False),
+        Column('last_id', Integer, nullable=False, default=0),
+        PrimaryKeyConstraint('id_prefix', 'year'))
+
+# Counters bumped whenever the data behind a process-wide cache changes, so
+# that every bodhi process knows when to throw its copy away.
+cache_version_table = Table('cache_version_table', metadata,
+        Column('name', Unicode(64), primary_key=True),
+        Column('version', Integer, nullable=False, default=0))
+
+# The number of updates of each type and status in each release, kept up to
+# date as updates change and rebuilt from scratch by refresh_release_stats()
+release_stats_table = Table('release_stats_table', metadata,
+        Column('release_id', Integer, ForeignKey('releases.id'),
+               nullable=False),
+        Column('type', Unicode(32), nullable=False),
+        Column('status', Unicode(32), nullable=False),
+        Column('count', Integer, nullable=False, default=0),
+        PrimaryKeyConstraint('release_id', 'type', 'status'))
+
+
+def get_cache_version(db, name):
+    """ Return the current version of the named cache """
+    return db.execute(select([cache_version_table.c.version]).where(
+        cache_version_table.c.name == name)).scalar() or 0
+
+
+def bump_cache_version(db, name):
+    """ Invalidate every process' copy of the named cache """
+    versions = cache_version_table
+    bump = versions.update().where(versions.c.name == name)\
+                   .values(version=versions.c.version + 1)
+    if not db.execute(bump).rowcount:
+        db.execute(versions.insert().values(name=name, version=1))
+
 
 class Release(Base):
     __tablename__ = 'releases'
@@ -307,28 +387,79 @@ class Release(Base):
         return ' '.join(self.long_name.split()[:-1])
 
     @classmethod
-    def get_tags(cls):
-        if cls._tag_cache:
-            return cls._tag_cache
+    def get_tags(cls, db=None):
+        """Return a (tags by type, tag -> release name) pair of dicts."""
+        return cls._get_registry(db)['tags']
+
+    @classmethod
+    def from_tags(cls, tags, db):
+        tag_types, tag_rels = cls.get_tags(db)
+        for tag in tags:
+            release = cls._from_registry(tag_rels[tag], db)
+            if release:
+                return release
+
+    @classmethod
+    def _get_registry(cls, db=None):
+        """Return our in-memory registry of every release and its tags.
+
+        The registry is shared by the whole process, and is rebuilt whenever
+        the 'releases' cache version changes.  That version is only checked
+        once per transaction, so lookups don't cost any queries.
+        """
+        if db is None:
+            db = DBSession()
+        registry = cls._tag_cache
+        checked = db.info.get('release_registry')
+        if registry is not None and checked == (registry['version'],
+                                                db.transaction):
+            return registry
+
+        version = get_cache_version(db, u'releases')
+        if registry is None or registry['version'] != version:
+            log.debug('Loading release registry version %d' % version)
+            registry = cls._tag_cache = cls._load_registry(db, version)
+        db.info['release_registry'] = (version, db.transaction)
+        return registry
+    _tag_cache = None
+
+    @classmethod
+    def _load_registry(cls, db, version):
         data = {'candidate': [], 'testing': [], 'stable': [], 'override': [],
                 'pending_testing': [], 'pending_stable': []}
         tags = {}  # tag -> release lookup
-        for release in DBSession.query(cls).all():
+        releases = {}  # name -> detached release
+        columns = [prop.key for prop in class_mapper(cls).column_attrs]
+        for release in db.query(cls).all():
             for key in data:
                 tag = getattr(release, '%s_tag' % key)
                 data[key].append(tag)
                 tags[tag] = release.name
-        cls._tag_cache = (data, tags)
-        return cls._tag_cache
-    _tag_cache = None
+            copy = cls(**dict((key, getattr(release, key)) for key in columns))
+            make_transient_to_detached(copy)
+            releases[release.name] = copy
+        return {'version': version, 'tags': (data, tags), 'releases': releases}
 
     @classmethod
-    def from_tags(cls, tags, db):
-        tag_types, tag_rels = cls.get_tags()
-        for tag in tags:
-            release = db.query(cls).filter_by(name=tag_rels[tag]).first()
-            if release:
-                return release
+    def _from_registry(cls, name, db):
+        """Return the named release attached to db, without querying it."""
+        cached = cls._get_registry(db)['releases'].get(name)
+        if cached is None:
+            return
+        key = class_mapper(cls).identity_key_from_primary_key([cached.id])
+        release = db.identity_map.get(key)
+        if release is None:
+            release = db.merge(cached, load=False)
+        return release
+
+
+@event.listens_for(Release, 'after_insert')
+@event.listens_for(Release, 'after_update')
+@event.listens_for(Release, 'after_delete')
+def invalidate_release_registry(mapper, connection, target):
+    """Have every process reload its release registry when one changes"""
+    bump_cache_version(connection, u'releases')
+    Release._tag_cache = None
 
 
 class TestCase(Base):
@@ -356,6 +487,9 @@ class Package(Base):
 
     stack_id = Column(Integer, ForeignKey('stacks.id'))
 
+    # When the test cases were last fetched from the wiki
+    test_cases_synced = Column(DateTime)
+
     def get_pkg_pushers(self, branch, settings):
         """ Pull users who can commit and are watching a package.
 
@@ -364,70 +498,31 @@ class Package(Base):
         * The first list of the tuple is for committers. The second is for
           watchers.
         """
-        watchers = []
-        committers = []
-        watchergroups = []
-        committergroups = []
-
-        from pkgdb2client import PkgDB
-        pkgdb = PkgDB(settings.get('pkgdb_url'))
-        acls = pkgdb.get_package(self.name, branches=branch)
-
-        for package in acls['packages']:
-            for acl in package.get('acls', []):
-                if acl['status'] == 'Approved':
-                    if acl['acl'] == 'watchcommits':
-                        name = acl['fas_name']
-                        if name.startswith('group::'):
-                            watchergroups.append(name.split('::')[1])
-                        else:
-                            watchers.append(name)
-                    elif acl['acl'] == 'commit':
-                        name = acl['fas_name']
-                        if name.startswith('group::'):
-                            committergroups.append(name.split('::')[1])
-                        else:
-                            committers.append(name)
+        return fetch_pkgdb_acls(self.name, branch, settings)
 
-        return (committers, watchers), (committergroups, watchergroups)
+    @classmethod
+    def fetch_test_cases_of(cls, names):
+        """
+        Get the test cases of the named packages that weren't synced with the
+        wiki lately, as a background job.
+        """
+        if not asbool(config.get('query_wiki_test_cases')):
+            return
+        db = DBSession()
+        interval = int(config.get('wiki.sync_interval', 86400))
+        cutoff = datetime.utcnow() - timedelta(seconds=interval)
+        packages = db.query(cls).filter(cls.name.in_(names)).filter(or_(
+            cls.test_cases_synced == None,
+            cls.test_cases_synced < cutoff)).all()
+        if packages:
+            sync_test_cases(db, packages)
+            mark_changed(db)
 
     def fetch_test_cases(self, db):
         """ Get a list of test cases from the wiki """
         if not asbool(config.get('query_wiki_test_cases')):
             return
-
-        from simplemediawiki import MediaWiki
-        wiki = MediaWiki(config.get('wiki_url', 'https://fedoraproject.org/w/api.php'))
-        cat_page = 'Category:Package %s test cases' % self.name
-
-        def list_categorymembers(wiki, cat_page, limit=10):
-            # Build query arguments and call wiki
-            query = dict(action='query', list='categorymembers', cmtitle=cat_page)
-            response = wiki.call(query)
-            members = [entry['title'] for entry in
-                       response.get('query',{}).get('categorymembers',{})
-                       if 'title' in entry]
-
-            # Determine whether we need to recurse
-            idx = 0
-            while True:
-                if idx >= len(members) or limit <= 0:
-                    break
-                # Recurse?
-                if members[idx].startswith('Category:') and limit > 0:
-                    members.extend(list_categorymembers(wiki, members[idx], limit-1))
-                    members.remove(members[idx]) # remove Category from list
-                else:
-                    idx += 1
-
-            return members
-
-        for test in list_categorymembers(wiki, cat_page):
-            case = db.query(TestCase).filter_by(name=test).first()
-            if not case:
-                case = TestCase(name=test, package=self)
-                db.add(case)
-                db.flush()
+        sync_test_cases(db, [self])
 
     def __str__(self):
         x = header(self.name)
@@ -534,7 +629,8 @@ def generate_alias(context):
 
     http://docs.sqlalchemy.org/en/latest/core/defaults.html#context-sensitive-default-functions
     """
-    return Update.generate_alias(context.current_parameters)
+    return Update.generate_alias(context.current_parameters,
+                                 context.connection)
 
 
 class Update(Base):
@@ -625,9 +721,6 @@ class Update(Base):
                 db.add(package)
                 db.flush()
 
-            # Fetch test cases from the wiki
-            package.fetch_test_cases(db)
-
             build = Build.get(nvr, db)
 
             if build is None:
@@ -643,31 +736,36 @@ class Update(Base):
         assert len(releases) == 1, "TODO: multi-release updates"
         data['release'] = list(releases)[0]
 
-        critical = False
-        critpath_pkgs = get_critpath_pkgs(data['release'].name.lower())
-        if critpath_pkgs:
-            for build in data['builds']:
-                if build.package.name in critpath_pkgs:
-                    critical = True
-                    break
-
-        data['critpath'] = critical
-
-        # Create the Bug entities
-        bugs = []
-        for bug_num in data['bugs']:
-            bug = db.query(Bug).filter_by(bug_id=bug_num).first()
-            if not bug:
-                bug = Bug(bug_id=bug_num)
-                bug.update_details()
-                db.add(bug)
-                if bug.security:
-                    data['type'] = UpdateType.security
-            bugs.append(bug)
-            bugtracker.comment(bug_num, config['initial_bug_msg'] % (
-                       data['title'], data['release'].long_name, bug.url))
+        data['critpath'] = critpath.any(
+            [build.package.name for build in data['builds']],
+            data['release'].name.lower())
+
+        # Create the Bug entities, fetching the details of the new ones from
+        # the bug tracker in a single call
+        known = {}
+        if data['bugs']:
+            known = dict((bug.bug_id, bug) for bug in db.query(Bug).filter(
+                Bug.bug_id.in_(data['bugs'])))
+        new_ids = sorted(set(data['bugs']) - set(known))
+        for bug_num, details in zip(new_ids, bugtracker.getbugs(new_ids)
+                                    if new_ids else []):
+            bug = known[bug_num] = Bug(bug_id=bug_num)
+            bug.update_details(details)
+            db.add(bug)
+            if bug.security:
+                data['type'] = UpdateType.security
+        bugs = [known[bug_num] for bug_num in data['bugs']]
         data['bugs'] = bugs
 
+        # Commenting on the bugs and looking for test cases on the wiki take
+        # a while, so they happen in the background once the update is saved
+        jobs.defer(comment_on_bugs, [
+            (bug.bug_id, config['initial_bug_msg'] % (
+                data['title'], data['release'].long_name, bug.url))
+            for bug in bugs])
+        jobs.defer(Package.fetch_test_cases_of, sorted(set(
+            build.package.name for build in data['builds'])))
+
         # If no requirements are provided, then gather some defaults from the
         # packages of the associated builds.
         # See https://github.com/fedora-infra/bodhi/issues/101
@@ -741,15 +839,9 @@ class Update(Base):
                 up.builds.remove(b)
                 db.delete(b)
 
-        critical = False
-        critpath_pkgs = get_critpath_pkgs(up.release.name.lower())
-        if critpath_pkgs:
-            for build in up.builds:
-                if build.package.name in critpath_pkgs:
-                    critical = True
-                    break
-
-        data['critpath'] = critical
+        data['critpath'] = critpath.any(
+            [build.package.name for build in up.builds],
+            up.release.name.lower())
 
         del(data['builds'])
 
@@ -769,9 +861,10 @@ class Update(Base):
 
         new_bugs = up.update_bugs(data['bugs'])
         del(data['bugs'])
-        for bug in new_bugs:
-            bug.add_comment(up, config['initial_bug_msg'] % (
+        jobs.defer(comment_on_bugs, [
+            (bug.bug_id, config['initial_bug_msg'] % (
                 data['title'], data['release'].long_name, up.url))
+            for bug in new_bugs])
 
         req = data.pop("request", None)
         if req is not None:
@@ -795,16 +888,30 @@ class Update(Base):
         """
         db = request.db
         buildinfo = request.buildinfo
+
+        # Look up the pending/testing builds of our packages all at once
+        candidates = defaultdict(list)
+        for oldBuild in db.query(Build).join(Update.builds).filter(
+            and_(Build.package_id.in_([b.package_id for b in self.builds]),
+                 Build.nvr.notin_([b.nvr for b in self.builds]),
+                 Update.request == None,
+                 Update.release == self.release,
+                 or_(Update.status == UpdateStatus.testing,
+                     Update.status == UpdateStatus.pending))
+        ).options(contains_eager(Build.update), lazyload('update.comments'),
+                  lazyload('update.bugs'), lazyload('update.cves'))\
+                .order_by(Build.id):
+            candidates[oldBuild.package_id].append(oldBuild)
+
+        pkgs = set(b.package.name for b in self.builds)
         for build in self.builds:
-            for oldBuild in db.query(Build).join(Update.builds).filter(
-                and_(Build.nvr != build.nvr,
-                     Update.request == None,
-                     Update.release == self.release,
-                     or_(Update.status == UpdateStatus.testing,
-                         Update.status == UpdateStatus.pending))
-            ).all():
+            nvr = buildinfo[build.nvr]['nvr']
+            for oldBuild in candidates[build.package_id]:
+                if oldBuild.update.status is UpdateStatus.obsolete:
+                    # Already obsoleted through another of its builds
+                    continue
+
                 obsoletable = False
-                nvr = buildinfo[build.nvr]['nvr']
                 if rpm.labelCompare(get_nvr(oldBuild.nvr), nvr) < 0:
                     log.debug("%s is newer than %s" % (nvr, oldBuild.nvr))
                     obsoletable = True
@@ -820,7 +927,6 @@ class Update(Base):
 
                 # Ensure that all of the packages in the old update are
                 # present in the new one.
-                pkgs = [b.package.name for b in self.builds]
                 for _build in oldBuild.update.builds:
                     if _build.package.name not in pkgs:
                         obsoletable = False
@@ -901,48 +1007,95 @@ class Update(Base):
         return good, bad * -1
 
     @classmethod
-    def generate_alias(cls, params):
+    def generate_alias(cls, params, connection=None):
         """Return the next available update ID.
 
-        This function finds the next number in the sequence of pushed updates
-        for this release, increments it and prefixes it with the id_prefix of
-        the release and the year (ie FEDORA-2007-0001).
+        This function atomically increments the update counter for the
+        id_prefix of the release and the current year, and returns the new
+        number prefixed with both (ie FEDORA-2007-0001).  The counter row is
+        locked until the surrounding transaction ends, so concurrent
+        submissions can never be handed the same ID.
         """
-        release = DBSession.query(Release).get(params['release_id'])
-        releases = DBSession.query(Release)\
-                            .filter_by(id_prefix=release.id_prefix)\
-                            .all()
-        subquery = DBSession.query(Update.date_submitted).filter(
-                                   or_(*[Update.release == release
-                                         for release in releases]))\
-                          .order_by(Update.date_submitted.desc())\
-                          .group_by(Update.date_submitted)\
-                          .limit(1)
-
-        update = DBSession.query(Update).filter(
-             Update.date_submitted.in_(subquery.subquery())
-        ).all()
-
-        if not update:
-            id = 1
-        else:
-            aliases = []
-            for upd in update:
-                split = upd.alias.split('-')
-                year, id = split[-2:]
-                aliases.append((int(year), int(id)))
-
-            year, id = max(aliases)
-            if int(year) != time.localtime()[0]:  # new year
-                id = 0
-            id = int(id) + 1
-
-        alias = u'%s-%s-%0.4d' % (release.id_prefix, time.localtime()[0], id)
+        if connection is None:
+            connection = DBSession.connection()
+        releases = Release.__table__
+        id_prefix = connection.execute(
+            select([releases.c.id_prefix])
+            .where(releases.c.id == params['release_id'])).scalar()
+        year = time.localtime()[0]
+
+        id = cls._next_alias_id(connection, id_prefix, year)
+
+        alias = u'%s-%s-%0.4d' % (id_prefix, year, id)
         log.debug('Setting alias for %s to %s' % (params['title'], alias))
         return alias
 
-    def set_request(self, action, username):
-        """ Attempt to request an action for this update """
+    @classmethod
+    def _next_alias_id(cls, connection, id_prefix, year):
+        """Increment and return the update counter for id_prefix and year."""
+        sequences = update_alias_sequence_table
+        match = and_(sequences.c.id_prefix == id_prefix,
+                     sequences.c.year == year)
+        # We may be running on a branch of the flushing connection, which
+        # would otherwise autocommit our half of the transaction.
+        increment = sequences.update().where(match)\
+                             .values(last_id=sequences.c.last_id + 1)\
+                             .execution_options(autocommit=False)
+
+        if not connection.execute(increment).rowcount:
+            cls._create_alias_sequence(connection, id_prefix, year)
+            connection.execute(increment)
+
+        return connection.execute(
+            select([sequences.c.last_id]).where(match)).scalar()
+
+    @classmethod
+    def _create_alias_sequence(cls, connection, id_prefix, year):
+        """Create the update counter for id_prefix and year, seeding it from
+        any aliases that already exist for that year.
+        """
+        insert = update_alias_sequence_table.insert().values(
+            id_prefix=id_prefix, year=year,
+            last_id=cls._max_alias_id(connection, id_prefix, year))
+
+        if connection.dialect.name == 'sqlite':
+            # SQLite serializes writers, so nobody can beat us to it.
+            connection.execute(insert.execution_options(autocommit=False))
+            return
+
+        # Like a real sequence, the counter lives outside of our transaction
+        # so that concurrent submissions all see it as soon as it exists.
+        seeder = connection.engine.connect()
+        try:
+            seeder.execute(insert)
+        except IntegrityError:
+            log.debug('%s-%s counter already created' % (id_prefix, year))
+        finally:
+            seeder.close()
+
+    @classmethod
+    def _max_alias_id(cls, connection, id_prefix, year):
+        """Return the highest update number already used for id_prefix and
+        year, or 0 if there are none.
+        """
+        updates = cls.__table__
+        prefix = u'%s-%s-' % (id_prefix, year)
+        aliases = connection.execute(
+            select([updates.c.alias])
+            .where(updates.c.alias.like(prefix + u'%')))
+        ids = [0]
+        for alias, in aliases:
+            id = alias[len(prefix):]
+            if id.isdigit():
+                ids.append(int(id))
+        return max(ids)
+
+    def set_request(self, action, username, koji=None):
+        """ Attempt to request an action for this update
+
+        The koji tags are added in a multicall of their own, unless the
+        multicall `koji` session is given.
+        """
         log.debug('Attempting to set request %s' % action)
         notes = []
         if isinstance(action, basestring):
@@ -1029,16 +1182,16 @@ class Update(Base):
         # Add the appropriate 'pending' koji tag to this update, so tools like
         # AutoQA can mash repositories of them for testing.
         if action is UpdateRequest.testing:
-            self.add_tag(self.release.pending_testing_tag)
+            self.add_tag(self.release.pending_testing_tag, koji)
         elif action is UpdateRequest.stable:
-            self.add_tag(self.release.pending_stable_tag)
+            self.add_tag(self.release.pending_stable_tag, koji)
 
         # If an obsolete/unpushed build is being re-submitted, return
         # it to the pending state, and make sure it's tagged as a candidate
         if self.status in (UpdateStatus.obsolete, UpdateStatus.unpushed):
             self.status = UpdateStatus.pending
             if not self.release.candidate_tag in self.get_tags():
-                self.add_tag(self.release.candidate_tag)
+                self.add_tag(self.release.candidate_tag, koji)
 
         self.request = action
         self.pushed = False
@@ -1055,14 +1208,17 @@ class Update(Base):
         # FIXME: track date pushed to testing & stable in different fields
         self.date_pushed = None
 
-    def add_tag(self, tag):
+    def add_tag(self, tag, koji=None):
         """ Add a koji tag to all builds in this update """
         log.debug('Adding tag %s to %s' % (tag, self.title))
-        koji = buildsys.get_session()
-        koji.multicall = True
+        return_multicall = not koji
+        if not koji:
+            koji = buildsys.get_session()
+            koji.multicall = True
         for build in self.builds:
             koji.tagBuild(tag, build.nvr, force=True)
-        return koji.multiCall()
+        if return_multicall:
+            return koji.multiCall()
 
     def remove_tag(self, tag, koji=None):
         """ Remove a koji tag from all builds in this update """
@@ -1259,17 +1415,24 @@ class Update(Base):
                     log.debug("Destroying stray Bugzilla #%d" % bug.bug_id)
                     session.delete(bug)
             session.flush()
-        for bug_id in bugs:
-            bug = session.query(Bug).filter_by(bug_id=bug_id).first()
-            if not bug:
-                if fetchdetails:
-                    newbug = bugtracker.getbug(bug_id)
-                    bug = Bug(bug_id=newbug.bug_id)
-                    bug.update_details(newbug)
-                    bug.modified()
-                else:
-                    bug = Bug(bug_id=int(bug_id))
-                session.add(bug)
+        bug_ids = [int(bug_id) for bug_id in bugs]
+        known = {}
+        if bug_ids:
+            known = dict((bug.bug_id, bug) for bug in session.query(Bug)
+                         .filter(Bug.bug_id.in_(bug_ids)))
+        new_ids = sorted(set(bug_ids) - set(known))
+        if new_ids and fetchdetails:
+            details = bugtracker.getbugs(new_ids)
+        else:
+            details = [None] * len(new_ids)
+        for bug_id, newbug in zip(new_ids, details):
+            bug = known[bug_id] = Bug(bug_id=bug_id)
+            if fetchdetails:
+                bug.update_details(newbug)
+                bug.modified()
+            session.add(bug)
+        for bug_id in bug_ids:
+            bug = known[bug_id]
             if bug not in self.bugs:
                 self.bugs.append(bug)
                 new.append(bug)
@@ -1381,7 +1544,9 @@ class Update(Base):
             session.add(user)
             session.flush()
 
-        user.comments.append(comment)
+        # Setting the user doesn't load all of their comments, which for the
+        # bodhi user is a lot
+        comment.user = user
         self.comments.append(comment)
         session.flush()
 
@@ -1476,12 +1641,12 @@ class Update(Base):
         Return a list of people that have commit access to all of the packages
         that are contained within this update.
         """
-        people = set()
-        for build in self.builds:
-            if build.package.committers:
-                for committer in build.package.committers:
-                    people.add(committer.name)
-        return list(people)
+        names = [build.package.name for build in self.builds]
+        if not names:
+            return []
+        people = DBSession().query(User.name).join(User.packages)\
+            .filter(Package.name.in_(names)).distinct()
+        return [name for name, in people]
 
     def check_requirements(self, session, settings):
         """ Check that an update meets its self-prescribed policy to be pushed
@@ -1490,34 +1655,15 @@ class Update(Base):
         and reason is a string.
         """
 
-        requirements = tokenize(self.requirements or '')
-        requirements = list(requirements)
+        requirements = list(tokenize(self.requirements or ''))
 
         try:
-            results = bodhi.util.taskotron_results(settings, title=self.title)
+            results = list(get_resultsdb(settings).get('results',
+                                                        title=self.title))
         except IOError as e:
             return False, "Failed to talk to taskotron: %r" % e.message
 
-        for testcase in requirements:
-            relevant = [result for result in results
-                        if result['testcase']['name'] == testcase]
-
-            if not relevant:
-                return False, 'No result found for required %s' % testcase
-
-            by_arch = defaultdict(list)
-            for r in relevant:
-                by_arch[r['result_data'].get('arch', ['noarch'])[0]].append(r)
-
-            for arch, results in by_arch.items():
-                latest = results[0]  # TODO - do these need to be sorted still?
-                if latest['outcome'] not in ['PASSED', 'INFO']:
-                    return False, "Required task %s returned %s" % (
-                        latest['testcase']['name'], latest['outcome'])
-
-        # TODO - check require_bugs and require_testcases also?
-
-        return True, "All checks pass."
+        return evaluate_requirements(requirements, results)
 
     def check_karma_thresholds(self, username):
         """Check if we have reached either karma threshold, and call set_request if necessary"""
@@ -1688,6 +1834,185 @@ class Update(Base):
         return tag
 
 
+def _stats_key(update, history=False):
+    """Return the (release_id, type, status) an update is counted under.
+
+    With history=True, return the values it had before this flush.
+    """
+    key = []
+    for attr in ('release_id', 'type', 'status'):
+        value = getattr(update, attr)
+        if history:
+            deleted = get_history(update, attr).deleted
+            if deleted:
+                value = deleted[0]
+        if isinstance(value, EnumSymbol):
+            value = value.value
+        key.append(value)
+    if None in key:
+        return None
+    return tuple(key)
+
+
+def _count_update(connection, key, delta):
+    if key is None:
+        return
+    stats = release_stats_table
+    release_id, type, status = key
+    where = and_(stats.c.release_id == release_id, stats.c.type == type,
+                 stats.c.status == status)
+    update = stats.update().where(where).values(count=stats.c.count + delta)
+    if connection.execute(update).rowcount:
+        return
+    insert = stats.insert().values(release_id=release_id, type=type,
+                                   status=status, count=delta)
+    if connection.dialect.name == 'sqlite':
+        # SQLite serializes writers, so nobody can beat us to it.
+        connection.execute(insert)
+        return
+
+    # Another transaction may be creating the same row, in which case our
+    # insert fails and the row it created gets updated instead
+    savepoint = connection.begin_nested()
+    try:
+        connection.execute(insert)
+    except IntegrityError:
+        savepoint.rollback()
+        connection.execute(update)
+    else:
+        savepoint.commit()
+
+
+@event.listens_for(Update, 'after_insert')
+def count_new_update(mapper, connection, target):
+    _count_update(connection, _stats_key(target), 1)
+
+
+@event.listens_for(Update, 'after_update')
+def recount_update(mapper, connection, target):
+    old, new = _stats_key(target, history=True), _stats_key(target)
+    if old != new:
+        _count_update(connection, old, -1)
+        _count_update(connection, new, 1)
+
+
+@event.listens_for(Update, 'after_delete')
+def uncount_update(mapper, connection, target):
+    _count_update(connection, _stats_key(target, history=True), -1)
+
+
+def refresh_release_stats(db):
+    """Rebuild the release statistics with a single GROUP BY over updates"""
+    updates = Update.__table__
+    counts = db.execute(select([
+        updates.c.release_id, updates.c.type, updates.c.status,
+        func.count(updates.c.id)]).where(updates.c.release_id != None)
+        .group_by(updates.c.release_id, updates.c.type, updates.c.status))
+    rows = [dict(release_id=release_id, type=type.value, status=status.value,
+                 count=count) for release_id, type, status, count in counts]
+    db.execute(release_stats_table.delete())
+    if rows:
+        db.execute(release_stats_table.insert(), rows)
+    return len(rows)
+
+
+def version_key(version):
+    """Return a key sorting release versions naturally, e.g. 7 before 22a."""
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', version or u'')]
+
+
+def get_release_stats(db, status=None, names=None):
+    """Return a {release name: {status: {type: count}}} dict of statistics,
+    ordered by release version.
+
+    Only releases matching the `names` LIKE pattern are included when it is
+    given.  Every release appears, even those without any update yet.
+    """
+    stats = release_stats_table
+    releases = Release.__table__
+    join = [stats.c.release_id == releases.c.id]
+    if isinstance(status, EnumSymbol):
+        status = status.value
+    if status is not None:
+        join.append(stats.c.status == status)
+    query = select([releases.c.name, releases.c.version, stats.c.status,
+                    stats.c.type, stats.c.count]).select_from(
+                        releases.outerjoin(stats, and_(*join)))
+    if names is not None:
+        query = query.where(releases.c.name.like(names))
+    result, versions = {}, {}
+    for name, version, row_status, type, count in db.execute(query):
+        result.setdefault(name, {})
+        versions[name] = version_key(version)
+        if row_status is not None:
+            result[name].setdefault(row_status, {})[type] = count
+    return OrderedDict(sorted(result.items(),
+                              key=lambda (name, counts): versions[name]))
+
+
+def recompute_critpath(db, release):
+    """Reset the critpath flag of all of a release's updates in bulk, from
+    its current critical path packages.  Returns how many updates changed.
+    """
+    critpath_pkgs = critpath.get(release.name.lower())
+    flags = {}
+    rows = db.query(Update.id, Update.critpath, Package.name)\
+        .join(Update.builds).join(Build.package)\
+        .filter(Update.release_id == release.id)
+    for update_id, flag, name in rows:
+        current, critical = flags.get(update_id, (flag, False))
+        flags[update_id] = (current, critical or name in critpath_pkgs)
+
+    changed = {True: [], False: []}
+    for update_id, (current, critical) in flags.items():
+        if bool(current) != critical:
+            changed[critical].append(update_id)
+
+    updates = Update.__table__
+    for critical, ids in changed.items():
+        # Keep clear of the bind parameter limits of some databases
+        for i in range(0, len(ids), 500):
+            db.execute(updates.update()
+                       .where(updates.c.id.in_(ids[i:i + 500]))
+                       .values(critpath=critical))
+    return sum(len(ids) for ids in changed.values())
+
+
+def sync_test_cases(db, packages):
+    """Store the test cases the wiki lists for each of the packages, inserting
+    all the new ones at once.  Returns how many test cases were added.
+    """
+    found = [(package, wiki.test_cases(package.name)) for package in packages]
+    names = list(set(name for package, test_cases in found
+                     for name in test_cases))
+    existing = set()
+    # Keep clear of the bind parameter limits of some databases
+    for i in range(0, len(names), 500):
+        existing.update(name for name, in db.query(TestCase.name)
+                        .filter(TestCase.name.in_(names[i:i + 500])))
+
+    for package in packages:
+        if package.id is None:
+            db.add(package)
+    db.flush()
+
+    rows = []
+    for package, test_cases in found:
+        for name in test_cases:
+            if name not in existing:
+                existing.add(name)
+                rows.append({'name': name, 'package_id': package.id})
+    if rows:
+        db.execute(TestCase.__table__.insert(), rows)
+
+    now = datetime.utcnow()
+    for package in packages:
+        package.test_cases_synced = now
+        db.expire(package, ['test_cases'])
+    return len(rows)
+
+
 # Used for many-to-many relationships between karma and a bug
 class BugKarma(Base):
     __tablename__ = 'comment_bug_assoc'
@@ -14,10 +14,14 @@
 
 import fedmsg
 import fedmsg.config
+import fedmsg.encoding
 
 import bodhi
 import bodhi.config
 
+from bodhi.jobs import jobs
+from bodhi.metrics import metrics
+
 
 def init():
     if not bodhi.config.config.get('fedmsg_enabled'):
@@ -34,5 +38,13 @@ def publish(topic, msg):
         bodhi.log.warn("fedmsg disabled.  not sending %r" % topic)
         return
 
+    if jobs.collecting:
+        # Encode the message while its models can still be loaded
+        msg = fedmsg.encoding.loads(fedmsg.encoding.dumps(msg))
+    jobs.later(_publish, topic, msg)
+
+
+def _publish(topic, msg):
     bodhi.log.debug("fedmsg sending %r" % topic)
-    fedmsg.publish(topic=topic, msg=msg)
+    with metrics.in_progress('bodhi_queue_depth', queue='fedmsg'):
+        fedmsg.publish(topic=topic, msg=msg)
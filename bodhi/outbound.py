@@ -0,0 +1,204 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+The HTTP client used for every call bodhi makes to other services.
+
+Each host gets its own ``requests.Session``, which keeps up to
+``outbound.pool_size`` connections alive.  Requests time out after
+``outbound.timeout`` seconds.  Idempotent requests that fail to connect, time
+out or get a 5xx response are retried ``outbound.retries`` times, waiting
+``outbound.backoff`` seconds before the first retry and twice as long before
+each of the next ones.
+
+After ``outbound.breaker_failures`` failures in a row a host's circuit opens,
+and calls to it fail straight away with a `CircuitOpenError` for
+``outbound.breaker_reset`` seconds, after which one call is let through to
+find out whether the host is back::
+
+    outbound.timeout = 10
+    outbound.retries = 2
+    outbound.backoff = 0.5
+    outbound.pool_size = 10
+    outbound.breaker_failures = 5
+    outbound.breaker_reset = 30
+
+The latency of every host is recorded as ``bodhi_outbound_seconds``.
+"""
+
+import threading
+import time
+import urlparse
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from bodhi import log
+from bodhi.config import config
+from bodhi.metrics import metrics
+
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """ Raised instead of calling a host that keeps failing """
+
+
+class Circuit(object):
+    """ Counts the consecutive failures of one host """
+
+    def __init__(self):
+        self.failures = 0
+        self.opened = None
+        self.lock = threading.Lock()
+
+    def allow(self, reset):
+        with self.lock:
+            if self.opened is None:
+                return True
+            if time.time() - self.opened >= reset:
+                # Half-open: let this call through, and reopen on failure
+                self.opened = time.time()
+                return True
+            return False
+
+    def succeeded(self):
+        with self.lock:
+            self.failures = 0
+            self.opened = None
+
+    def failed(self, threshold):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= threshold:
+                self.opened = time.time()
+                return True
+        return False
+
+
+class OutboundClient(object):
+    """ Pools connections to other hosts, and guards the calls made to them """
+
+    def __init__(self, settings=None):
+        self._settings = settings
+        self.sessions = {}
+        self.circuits = {}
+        self.lock = threading.Lock()
+
+    def setting(self, name, default):
+        settings = config if self._settings is None else self._settings
+        return type(default)(settings.get('outbound.' + name, default))
+
+    def session(self, host):
+        """ Return the pooled session of a host """
+        with self.lock:
+            session = self.sessions.get(host)
+            if session is None:
+                size = self.setting('pool_size', 10)
+                adapter = HTTPAdapter(
+                    pool_connections=1, pool_maxsize=size)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self.sessions[host] = session
+            return session
+
+    def circuit(self, host):
+        with self.lock:
+            return self.circuits.setdefault(host, Circuit())
+
+    def request(self, method, url, idempotent=None, **kwargs):
+        """ Send a request through the host's pool, and return the response
+
+        Raises a `requests.RequestException`, which is an IOError, when the
+        host can't be reached.  Responses with an error status are returned
+        like any other once the retries are exhausted.
+        """
+        method = method.upper()
+        host = urlparse.urlsplit(url).netloc
+        session = self.session(host)
+        circuit = self.circuit(host)
+        kwargs.setdefault('timeout', self.setting('timeout', 10.0))
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = self.setting('retries', 2) if idempotent else 0
+        backoff = self.setting('backoff', 0.5)
+
+        attempt = 0
+        while True:
+            if not circuit.allow(self.setting('breaker_reset', 30.0)):
+                metrics.inc('bodhi_outbound_rejected_total', host=host)
+                raise CircuitOpenError('The circuit to %s is open' % host)
+            start = time.time()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error, response = e, None
+            else:
+                error = None
+            metrics.observe('bodhi_outbound_seconds', time.time() - start,
+                            host=host)
+
+            if error is None and response.status_code not in RETRY_STATUSES:
+                circuit.succeeded()
+                return response
+
+            metrics.inc('bodhi_outbound_errors_total', host=host)
+            if circuit.failed(self.setting('breaker_failures', 5)):
+                log.warning('Opening the circuit to %s' % host)
+            if attempt >= retries:
+                if error is not None:
+                    raise error
+                return response
+            delay = backoff * 2 ** attempt
+            log.debug('Retrying %s %s in %0.1fs' % (method, url, delay))
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def json(self, method, url, **kwargs):
+        """ Send a request and return its decoded JSON body
+
+        Raises an IOError when the server errored out or didn't return JSON.
+        Client errors that come with a JSON body are left for the caller to
+        interpret.
+        """
+        response = self.request(method, url, **kwargs)
+        if response.status_code >= 500:
+            raise requests.HTTPError('%s returned %s' % (
+                url, response.status_code), response=response)
+        try:
+            return response.json()
+        except ValueError:
+            raise IOError('%s returned %s without JSON' % (
+                url, response.status_code))
+
+    def reset(self):
+        """ Close every pooled connection, and forget the hosts' failures """
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions.clear()
+            self.circuits.clear()
+
+
+# The pools shared by the whole process
+outbound = OutboundClient()
@@ -0,0 +1,167 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Opt-in profiling of the SQL queries run by each request.
+
+When enabled, every request gets its queries counted and timed, requests
+that run too many queries or spend too long in the database are logged along
+with their slowest statements, and the aggregate numbers are available to
+admins at ``/admin/sql``::
+
+    profiling.sql = true
+    # Log requests running more queries, or more seconds of SQL, than this
+    profiling.sql.max_queries = 50
+    profiling.sql.slow_request = 0.5
+    # Statements slower than this are kept in the aggregate stats
+    profiling.sql.slow_query = 0.1
+    # How many of the slowest statements to keep
+    profiling.sql.top = 20
+"""
+
+import heapq
+import threading
+import time
+
+from collections import defaultdict
+
+from sqlalchemy import event
+
+from bodhi import log
+
+
+class RequestStats(object):
+    """ The queries run by a single request """
+
+    def __init__(self, top):
+        self.top = top
+        self.queries = 0
+        self.db_time = 0.0
+        self.slowest = []
+
+    def add(self, statement, duration):
+        self.queries += 1
+        self.db_time += duration
+        entry = (duration, statement)
+        if len(self.slowest) < self.top:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+
+class QueryProfiler(object):
+    """
+    Listens to the engine's cursor events, and attributes each statement to
+    the request being handled by the current thread.
+    """
+
+    def __init__(self, engine, settings):
+        self.max_queries = int(settings.get('profiling.sql.max_queries', 50))
+        self.slow_request = float(settings.get(
+            'profiling.sql.slow_request', 0.5))
+        self.slow_query = float(settings.get('profiling.sql.slow_query', 0.1))
+        self.top = int(settings.get('profiling.sql.top', 20))
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.reset()
+        self.listen(engine)
+
+    def listen(self, engine):
+        event.listen(engine, 'before_cursor_execute', self.before_execute)
+        event.listen(engine, 'after_cursor_execute', self.after_execute)
+
+    def reset(self):
+        with self.lock:
+            self.started = time.time()
+            self.routes = defaultdict(lambda: {
+                'requests': 0, 'queries': 0, 'db_time': 0.0,
+                'max_queries': 0, 'slow_requests': 0})
+            self.slow_queries = []
+
+    def before_execute(self, conn, cursor, statement, parameters, context,
+                       executemany):
+        conn.info.setdefault('query_start_time', []).append(time.time())
+
+    def after_execute(self, conn, cursor, statement, parameters, context,
+                      executemany):
+        duration = time.time() - conn.info['query_start_time'].pop()
+        stats = getattr(self.local, 'stats', None)
+        if stats is not None:
+            stats.add(statement, duration)
+
+    def start(self):
+        self.local.stats = RequestStats(self.top)
+
+    def stop(self, route, url):
+        """ Record the queries of the current request, and return them """
+        stats, self.local.stats = self.local.stats, None
+        slow = (stats.queries > self.max_queries or
+                stats.db_time > self.slow_request)
+        if slow:
+            log.warn('%s ran %d queries in %0.3fs; slowest: %s' % (
+                url, stats.queries, stats.db_time, '; '.join(
+                    '%0.3fs %s' % entry for entry in
+                    sorted(stats.slowest, reverse=True)[:3])))
+
+        with self.lock:
+            totals = self.routes[route]
+            totals['requests'] += 1
+            totals['queries'] += stats.queries
+            totals['db_time'] += stats.db_time
+            totals['max_queries'] = max(totals['max_queries'], stats.queries)
+            totals['slow_requests'] += int(slow)
+            for duration, statement in stats.slowest:
+                if duration < self.slow_query:
+                    continue
+                entry = (duration, statement, route)
+                if len(self.slow_queries) < self.top:
+                    heapq.heappush(self.slow_queries, entry)
+                else:
+                    heapq.heappushpop(self.slow_queries, entry)
+        return stats
+
+    def stats(self):
+        """ Return the aggregate stats of every request since the reset """
+        with self.lock:
+            routes = {}
+            for route, totals in self.routes.items():
+                routes[route] = dict(totals, avg_queries=float(
+                    totals['queries']) / totals['requests'])
+            return {
+                'since': self.started,
+                'routes': routes,
+                'slow_queries': [
+                    {'duration': duration, 'statement': statement,
+                     'route': route}
+                    for duration, statement, route in
+                    sorted(self.slow_queries, reverse=True)],
+            }
+
+
+def sql_profiling_tween_factory(handler, registry):
+    """ Profile the queries of each request, if profiling.sql is enabled """
+    profiler = getattr(registry, 'sql_profiler', None)
+    if profiler is None:
+        return handler
+
+    def sql_profiling_tween(request):
+        profiler.start()
+        try:
+            return handler(request)
+        finally:
+            route = request.matched_route
+            request.sql_stats = profiler.stop(
+                route.name if route else None, request.path_url)
+
+    return sql_profiling_tween
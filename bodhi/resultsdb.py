@@ -0,0 +1,125 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+A client for the taskotron results database.
+
+All requests go through the pooled `bodhi.outbound` client and time out
+after ``resultsdb.timeout`` seconds.  The names of the known testcases are cached
+for ``resultsdb.testcases_ttl`` seconds, after which they are refreshed in a
+background thread while the old catalogue stays in use::
+
+    resultsdb_api_url = https://taskotron.fedoraproject.org/resultsdb_api
+    resultsdb.timeout = 10
+    resultsdb.testcases_ttl = 3600
+"""
+
+import threading
+import time
+
+import requests
+
+from bodhi import log
+from bodhi.metrics import metrics
+from bodhi.outbound import outbound
+
+
+class ResultsDB(object):
+    """ Talks to one resultsdb instance """
+
+    def __init__(self, settings):
+        self.url = settings['resultsdb_api_url'].rstrip('/') + '/api/v1.0/'
+        self.timeout = float(settings.get('resultsdb.timeout', 10))
+        self.testcases_ttl = int(settings.get('resultsdb.testcases_ttl', 3600))
+        self.http = outbound
+        self.catalogue = None
+        self.refreshing = False
+        self.lock = threading.Lock()
+
+    def get(self, entity, **params):
+        """
+        Yield every item of the given entity, following the pagination.
+        Raises an IOError when resultsdb can't be reached.
+        """
+        url = self.url + entity
+        while url:
+            log.debug("Grabbing %r" % url)
+            try:
+                with metrics.timer('bodhi_external_seconds',
+                                   service='resultsdb', method=entity):
+                    response = self.http.get(url, params=params,
+                                             timeout=self.timeout)
+            except requests.RequestException as e:
+                raise IOError("Unable to reach %r: %s" % (url, e))
+            if response.status_code != 200:
+                raise IOError("status code was %r" % response.status_code)
+            try:
+                json = response.json()
+            except ValueError as e:
+                raise IOError("Invalid response from %r: %s" % (url, e))
+            # The next page's URL already contains our parameters
+            url, params = json['next'], None
+            for datum in json['data']:
+                yield datum
+
+    def testcases(self):
+        """
+        Return a frozenset of the names of all the testcases.  A stale
+        catalogue is used while resultsdb is unavailable, but an IOError is
+        raised if it has never been fetched.
+        """
+        catalogue = self.catalogue
+        if catalogue is None:
+            return self.refresh_testcases()
+        fetched, names = catalogue
+        if time.time() - fetched > self.testcases_ttl:
+            self.refresh_testcases_in_background()
+        return names
+
+    def refresh_testcases(self):
+        names = frozenset(testcase['name'] for testcase in self.get('testcases'))
+        self.catalogue = (time.time(), names)
+        return names
+
+    def refresh_testcases_in_background(self):
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+
+        def work():
+            try:
+                self.refresh_testcases()
+            except IOError:
+                log.exception('Unable to refresh the testcases')
+            finally:
+                self.refreshing = False
+
+        thread = threading.Thread(target=work)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_resultsdb(settings):
+    """ Return the shared client of the resultsdb configured in `settings` """
+    url = settings['resultsdb_api_url']
+    with _clients_lock:
+        if url not in _clients:
+            _clients[url] = ResultsDB(settings)
+        return _clients[url]
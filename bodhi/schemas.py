@@ -140,7 +140,7 @@ class SaveCommentSchema(CSRFProtectedSchema, colander.MappingSchema):
     )
 
 
-class SaveUpdateSchema(CSRFProtectedSchema, colander.MappingSchema):
+class UpdateSchema(colander.MappingSchema):
     builds = Builds(colander.Sequence(accept_scalar=True),
                     preparer=[splitter])
 
@@ -206,6 +206,20 @@ class SaveUpdateSchema(CSRFProtectedSchema, colander.MappingSchema):
     )
 
 
+class SaveUpdateSchema(CSRFProtectedSchema, UpdateSchema):
+    pass
+
+
+class UpdateItems(colander.SequenceSchema):
+    # Each item is validated against the UpdateSchema on its own, so that
+    # one bad update doesn't reject the whole batch
+    update = colander.SchemaNode(colander.Mapping(unknown='preserve'))
+
+
+class SaveUpdatesSchema(CSRFProtectedSchema, colander.MappingSchema):
+    updates = UpdateItems(validator=colander.Length(min=1, max=100))
+
+
 class Cosmetics(colander.MappingSchema):
     display_user = colander.SchemaNode(
         colander.Boolean(true_choices=('true', '1')),
@@ -532,6 +546,14 @@ class UpdateRequestSchema(CSRFProtectedSchema, colander.MappingSchema):
     )
 
 
+class UpdatesRequestSchema(UpdateRequestSchema):
+    updates = Updates(
+        colander.Sequence(accept_scalar=True),
+        preparer=[splitter],
+        validator=colander.Length(min=1, max=100),
+    )
+
+
 class ListCommentSchema(PaginatedSchema, SearchableSchema):
     updates = Updates(
         colander.Sequence(accept_scalar=True),
@@ -0,0 +1,379 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Fill an empty bodhi database with a large, synthetic but realistic dataset.
+
+The data is entirely determined by the random seed, and is written with
+bulk Core inserts rather than through the ORM, so that hundreds of
+thousands of updates can be generated in minutes::
+
+    python -m bodhi.scripts.generate_data development.ini --updates 300000
+"""
+
+import logging
+import optparse
+import random
+import sys
+
+from bisect import bisect
+from datetime import datetime, timedelta
+
+from pyramid.paster import get_appsettings, setup_logging
+from sqlalchemy import engine_from_config
+
+from ..models import (
+    Base, Release, ReleaseState, Package, Build, Update, UpdateType,
+    UpdateStatus, UpdateRequest, UpdateSeverity, Comment, Bug, CVE, User,
+    Group, BuildrootOverride, Stack, user_group_table, user_package_table,
+    update_bug_table, update_cve_table, stack_user_table, stack_group_table,
+    update_alias_sequence_table, refresh_release_stats, bump_cache_version,
+)
+
+log = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+PACKAGE_PREFIXES = [(u'', 40), (u'python-', 20), (u'perl-', 15),
+                    (u'rubygem-', 8), (u'golang-', 7), (u'nodejs-', 6),
+                    (u'php-', 4)]
+UPDATE_TYPES = [(UpdateType.bugfix, 55), (UpdateType.enhancement, 25),
+                (UpdateType.security, 10), (UpdateType.newpackage, 10)]
+UPDATE_STATUSES = [(UpdateStatus.stable, 70), (UpdateStatus.obsolete, 12),
+                   (UpdateStatus.testing, 8), (UpdateStatus.pending, 5),
+                   (UpdateStatus.unpushed, 5)]
+BUILDS_PER_UPDATE = [(1, 85), (2, 6), (3, 4), (5, 3), (10, 2)]
+KARMA = [(0, 60), (1, 30), (-1, 10)]
+
+
+class Generator(object):
+    """ Draws every piece of synthetic data from a single seeded RNG """
+
+    def __init__(self, connection, seed=0):
+        self.connection = connection
+        self.random = random.Random(seed)
+        self.counts = {}
+
+    def weighted(self, choices):
+        total = sum(weight for value, weight in choices)
+        point = self.random.uniform(0, total)
+        for value, weight in choices:
+            point -= weight
+            if point <= 0:
+                return value
+        return choices[-1][0]
+
+    def insert(self, table, rows):
+        """ Insert rows with executemany, BATCH_SIZE at a time """
+        table = getattr(table, '__table__', table)
+        for start in xrange(0, len(rows), BATCH_SIZE):
+            self.connection.execute(table.insert(),
+                                    rows[start:start + BATCH_SIZE])
+        self.counts[table.name] = self.counts.get(table.name, 0) + len(rows)
+
+    def generate(self, releases=4, packages=5000, users=2000, updates=20000,
+                 comments=5, stacks=10):
+        """
+        Generate the whole dataset.  `comments` is the average number of
+        comments per update.
+        """
+        rels = self.releases(releases)
+        people = self.users(users)
+        pkgs = self.packages(packages, people, stacks)
+
+        # Package popularity roughly follows Zipf's law
+        cumulative, total = [], 0.0
+        for rank in range(1, len(pkgs) + 1):
+            total += 1.0 / rank ** 1.1
+            cumulative.append(total)
+
+        def popular_package():
+            return pkgs[bisect(cumulative, self.random.uniform(0, total))
+                        % len(pkgs)]
+
+        self.updates(updates, rels, people, popular_package, comments)
+        return self.counts
+
+    def releases(self, num):
+        rows = []
+        for i in range(num):
+            version = 23 - num + i
+            if i == num - 1:
+                state = ReleaseState.pending
+            elif i >= num - 3:
+                state = ReleaseState.current
+            else:
+                state = ReleaseState.archived
+            rows.append(dict(
+                id=i + 1, name=u'F%d' % version,
+                long_name=u'Fedora %d' % version, version=unicode(version),
+                id_prefix=u'FEDORA', branch=u'f%d' % version,
+                dist_tag=u'f%d' % version,
+                stable_tag=u'f%d-updates' % version,
+                testing_tag=u'f%d-updates-testing' % version,
+                candidate_tag=u'f%d-updates-candidate' % version,
+                pending_testing_tag=u'f%d-updates-testing-pending' % version,
+                pending_stable_tag=u'f%d-updates-pending' % version,
+                override_tag=u'f%d-override' % version, state=state,
+                # Not a column; when the release was branched
+                start=datetime(2015, 1, 1) + timedelta(days=182 * i)))
+        self.insert(Release, [dict((k, v) for k, v in row.items()
+                                   if k != 'start') for row in rows])
+        return rows
+
+    def users(self, num):
+        groups = [u'packager', u'provenpackager', u'proventesters',
+                  u'qa', u'releng']
+        self.insert(Group, [dict(id=i + 1, name=name)
+                            for i, name in enumerate(groups)])
+        people = [dict(id=1, name=u'bodhi'), dict(id=2, name=u'anonymous')]
+        people += [dict(id=i + 3, name=u'user%05d' % i) for i in range(num)]
+        self.insert(User, people)
+
+        memberships = []
+        for user in people[2:]:
+            memberships.append(dict(user_id=user['id'], group_id=1))
+            for group_id, share in ((2, 0.03), (3, 0.05), (4, 0.05),
+                                    (5, 0.01)):
+                if self.random.random() < share:
+                    memberships.append(dict(user_id=user['id'],
+                                            group_id=group_id))
+        self.insert(user_group_table, memberships)
+        return people
+
+    def packages(self, num, people, num_stacks):
+        stacks = [dict(id=i + 1, name=u'stack%d' % i,
+                       description=u'Synthetic stack %d' % i,
+                       requirements=u'rpmlint')
+                  for i in range(num_stacks)]
+        self.insert(Stack, stacks)
+
+        pkgs, committers = [], []
+        for i in range(num):
+            stack_id = None
+            if stacks and self.random.random() < 0.02:
+                stack_id = self.random.choice(stacks)['id']
+            pkgs.append(dict(id=i + 1, stack_id=stack_id, requirements=None,
+                             name=u'%spackage%05d' % (
+                                 self.weighted(PACKAGE_PREFIXES), i)))
+            for user in self.random.sample(people[2:], min(
+                    len(people) - 2, self.weighted([(1, 70), (2, 20),
+                                                    (3, 10)]))):
+                committers.append(dict(user_id=user['id'],
+                                       package_id=i + 1))
+        self.insert(Package, pkgs)
+        self.insert(user_package_table, committers)
+
+        self.insert(stack_user_table, [dict(
+            stack_id=stack['id'], user_id=self.random.choice(people[2:])['id'])
+            for stack in stacks])
+        self.insert(stack_group_table, [dict(stack_id=stack['id'], group_id=1)
+                                        for stack in stacks])
+        return pkgs
+
+    def updates(self, num, releases, people, popular_package, avg_comments):
+        """
+        Generate the updates along with their builds, comments, bugs, CVEs
+        and overrides.  The rows are inserted in chunks as they pile up, so
+        that memory use doesn't grow with the size of the dataset.
+        """
+        updates, builds, comments, overrides = [], [], [], []
+        bugs, update_bugs, cves, update_cves = [], [], [], []
+        # The number of rows generated so far, which are also the last ids
+        num_builds = num_comments = num_overrides = num_bugs = num_cves = 0
+        bug_ids = set()
+        aliases = {}  # year -> last alias number
+        versions = {}  # package id -> last version number
+        now = max(release['start'] for release in releases) + \
+            timedelta(days=182)
+
+        for i in range(num):
+            update_id = i + 1
+            release = releases[i * len(releases) / num]
+            submitted = release['start'] + timedelta(
+                seconds=self.random.randint(0, 365 * 86400))
+            submitter = self.random.choice(people[2:])
+            type = self.weighted(UPDATE_TYPES)
+            status = self.weighted(UPDATE_STATUSES)
+
+            # Builds
+            nvrs = []
+            packages = set()
+            for j in range(self.weighted(BUILDS_PER_UPDATE)):
+                package = popular_package()
+                if package['id'] in packages:
+                    continue
+                packages.add(package['id'])
+                version = versions[package['id']] = \
+                    versions.get(package['id'], 0) + 1
+                nvr = u'%s-%d.0-1.fc%s' % (package['name'], version,
+                                           release['version'])
+                nvrs.append(nvr)
+                num_builds += 1
+                builds.append(dict(id=num_builds, nvr=nvr,
+                                   inherited=False,
+                                   package_id=package['id'],
+                                   release_id=release['id'],
+                                   update_id=update_id))
+                if self.random.random() < 0.02:
+                    expiration = submitted + timedelta(days=7)
+                    num_overrides += 1
+                    overrides.append(dict(
+                        id=num_overrides, build_id=num_builds,
+                        submitter_id=submitter['id'],
+                        notes=u'Needed to build the rest of the stack',
+                        submission_date=submitted,
+                        expiration_date=expiration,
+                        expired_date=expiration if expiration < now
+                        else None))
+
+            # Comments and karma
+            karma = 0
+            timestamp = submitted
+            for j in range(int(self.random.expovariate(1.0 / avg_comments))):
+                timestamp += timedelta(
+                    seconds=self.random.randint(60, 3 * 86400))
+                anonymous = self.random.random() < 0.1
+                value = self.weighted(KARMA)
+                if not anonymous:
+                    karma += value
+                num_comments += 1
+                comments.append(dict(
+                    id=num_comments, karma=value, karma_critpath=0,
+                    text=u'Works for me.' if value > 0 else
+                    u'Breaks my system.' if value < 0 else u'Looks fine.',
+                    anonymous=anonymous, timestamp=timestamp,
+                    update_id=update_id,
+                    user_id=people[1]['id'] if anonymous
+                    else self.random.choice(people[2:])['id']))
+            if status in (UpdateStatus.testing, UpdateStatus.stable):
+                for text, days in (('testing', 1), ('stable', 8)):
+                    num_comments += 1
+                    comments.append(dict(
+                        id=num_comments, karma=0, karma_critpath=0,
+                        text=u'This update has been pushed to %s' % text,
+                        anonymous=False, update_id=update_id,
+                        timestamp=submitted + timedelta(days=days),
+                        user_id=people[0]['id']))
+                    if status is UpdateStatus.testing:
+                        break
+
+            # Bugs, with the occasional bug shared between updates
+            for j in range(self.weighted([(0, 40), (1, 40), (2, 12),
+                                          (5, 8)])):
+                if num_bugs and self.random.random() < 0.05:
+                    # Like random.choice, over every bug generated so far
+                    bug = int(self.random.random() * num_bugs) + 1
+                else:
+                    bug_id = self.random.randint(1000000, 9999999)
+                    while bug_id in bug_ids:
+                        bug_id += 1
+                    bug_ids.add(bug_id)
+                    num_bugs += 1
+                    bug = num_bugs
+                    bugs.append(dict(id=bug, bug_id=bug_id,
+                                     title=u'Synthetic bug %d' % bug_id,
+                                     security=type is UpdateType.security,
+                                     parent=False))
+                update_bugs.append(dict(update_id=update_id, bug_id=bug))
+            if type is UpdateType.security:
+                for j in range(self.weighted([(1, 80), (2, 20)])):
+                    num_cves += 1
+                    cves.append(dict(id=num_cves, cve_id=u'CVE-%d-%04d'
+                                     % (submitted.year, num_cves)))
+                    update_cves.append(dict(update_id=update_id,
+                                            cve_id=num_cves))
+
+            year = submitted.year
+            aliases[year] = aliases.get(year, 0) + 1
+            updates.append(dict(
+                id=update_id, title=u','.join(nvrs),
+                alias=u'FEDORA-%d-%0.4d' % (year, aliases[year]),
+                karma=karma, stable_karma=3, unstable_karma=-3,
+                requirements=u'rpmlint', require_bugs=False,
+                require_testcases=False, type=type, status=status,
+                request=UpdateRequest.stable if status is UpdateStatus.testing
+                and karma >= 3 else None,
+                severity=UpdateSeverity.unspecified,
+                notes=u'Synthetic update %d' % update_id,
+                locked=False, pushed=status in (UpdateStatus.stable,
+                                                UpdateStatus.testing),
+                critpath=self.random.random() < 0.05, close_bugs=True,
+                date_submitted=submitted, date_modified=timestamp,
+                date_pushed=submitted + timedelta(days=1)
+                if status in (UpdateStatus.stable, UpdateStatus.testing)
+                else None, release_id=release['id'],
+                user_id=submitter['id']))
+
+            # Every row of an update is in the same chunk as the update, and
+            # the parents of each chunk are inserted before their children
+            chunk = [(Update, updates), (Bug, bugs), (CVE, cves),
+                     (Build, builds), (Comment, comments),
+                     (update_bug_table, update_bugs),
+                     (update_cve_table, update_cves),
+                     (BuildrootOverride, overrides)]
+            if i == num - 1 or any(len(rows) >= BATCH_SIZE
+                                   for table, rows in chunk):
+                for table, rows in chunk:
+                    self.insert(table, rows)
+                    del rows[:]
+
+        # Hand out aliases after the ones we generated
+        self.insert(update_alias_sequence_table, [
+            dict(id_prefix=u'FEDORA', year=year, last_id=last_id)
+            for year, last_id in sorted(aliases.items())])
+
+
+def generate(connection, seed=0, **kw):
+    """
+    Generate a synthetic dataset in the empty database behind `connection`,
+    and return the number of rows inserted in each table.
+    """
+    counts = Generator(connection, seed).generate(**kw)
+    refresh_release_stats(connection)
+    bump_cache_version(connection, u'releases')
+    return counts
+
+
+def main(argv=sys.argv):
+    parser = optparse.OptionParser(usage='%prog [options] <config_uri>')
+    parser.add_option('--seed', type='int', default=0)
+    parser.add_option('--releases', type='int', default=4)
+    parser.add_option('--packages', type='int', default=5000)
+    parser.add_option('--users', type='int', default=2000)
+    parser.add_option('--updates', type='int', default=20000)
+    parser.add_option('--comments', type='float', default=5,
+                      help='Average number of comments per update')
+    parser.add_option('--stacks', type='int', default=10)
+    opts, args = parser.parse_args(argv[1:])
+    if len(args) != 1:
+        parser.error('A config file is required')
+
+    config_uri = args[0]
+    setup_logging(config_uri)
+    settings = get_appsettings(config_uri)
+    engine = engine_from_config(settings, 'sqlalchemy.')
+    Base.metadata.create_all(engine)
+
+    with engine.begin() as connection:
+        counts = generate(connection, seed=opts.seed,
+                          releases=opts.releases, packages=opts.packages,
+                          users=opts.users, updates=opts.updates,
+                          comments=opts.comments, stacks=opts.stacks)
+    for table, count in sorted(counts.items()):
+        log.info('%s: %d rows' % (table, count))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import logging
+import os
+import sys
+
+from pyramid.paster import get_appsettings, setup_logging
+from sqlalchemy import engine_from_config
+import transaction
+from zope.sqlalchemy import mark_changed
+
+from ..models import DBSession, Release, ReleaseState, recompute_critpath
+
+
+def usage(argv):
+    cmd = os.path.basename(argv[0])
+    print('usage: %s <config_uri>\n'
+          '(example: "%s development.ini")' % (cmd, cmd))
+    sys.exit(1)
+
+
+def main(argv=sys.argv):
+    """ Reflag the updates of active releases from the current critpath """
+    if len(argv) != 2:
+        usage(argv)
+
+    config_uri = argv[1]
+
+    setup_logging(config_uri)
+    log = logging.getLogger(__name__)
+
+    settings = get_appsettings(config_uri)
+    engine = engine_from_config(settings, 'sqlalchemy.')
+    DBSession.configure(bind=engine)
+
+    with transaction.manager:
+        db = DBSession()
+        releases = db.query(Release).filter(Release.state.in_(
+            (ReleaseState.pending, ReleaseState.current)))
+        for release in releases:
+            changed = recompute_critpath(db, release)
+            log.info("Reflagged %d %s updates", changed, release.name)
+        mark_changed(db)
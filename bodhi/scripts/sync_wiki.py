@@ -0,0 +1,69 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import logging
+import os
+import sys
+
+from datetime import datetime, timedelta
+
+from pyramid.paster import get_appsettings, setup_logging
+from sqlalchemy import engine_from_config, or_
+import transaction
+from zope.sqlalchemy import mark_changed
+
+from ..models import DBSession, Package, sync_test_cases
+
+
+def usage(argv):
+    cmd = os.path.basename(argv[0])
+    print('usage: %s <config_uri>\n'
+          '(example: "%s development.ini")' % (cmd, cmd))
+    sys.exit(1)
+
+
+def main(argv=sys.argv):
+    """ Fetch the wiki test cases of the packages that weren't synced lately """
+    if len(argv) != 2:
+        usage(argv)
+
+    config_uri = argv[1]
+
+    setup_logging(config_uri)
+    log = logging.getLogger(__name__)
+
+    settings = get_appsettings(config_uri)
+    engine = engine_from_config(settings, 'sqlalchemy.')
+    DBSession.configure(bind=engine)
+
+    interval = int(settings.get('wiki.sync_interval', 86400))
+    cutoff = datetime.utcnow() - timedelta(seconds=interval)
+    with transaction.manager:
+        names = [name for name, in DBSession().query(Package.name).filter(or_(
+            Package.test_cases_synced == None,
+            Package.test_cases_synced < cutoff))]
+
+    for i in range(0, len(names), 100):
+        try:
+            with transaction.manager:
+                db = DBSession()
+                packages = db.query(Package).filter(
+                    Package.name.in_(names[i:i + 100])).all()
+                added = sync_test_cases(db, packages)
+                mark_changed(db)
+        except IOError:
+            log.exception('Unable to sync the test cases of %s',
+                          ', '.join(names[i:i + 100]))
+            continue
+        log.info('Added %d test cases for %d packages', added, len(packages))
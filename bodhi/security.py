@@ -42,13 +42,26 @@ def packagers_allowed_acl(request):
 
 def package_maintainers_only_acl(request):
     """An ACL that only allows package maintainers for a given package"""
-    update = Update.get(request.matchdict['id'], request.db)
+    update = Update.get_for_request(request.matchdict['id'], request)
+    return update_maintainers_acl(request, update)
+
+
+def update_maintainers_acl(request, update):
+    """An ACL that only allows the maintainers of an update's packages"""
     acl = admin_only_acl(request)
     for committer in update.get_maintainers():
         acl.insert(0, (Allow, committer, ALL_PERMISSIONS))
     return acl
 
 
+class UpdateContext(object):
+    """The context of one of the updates handled by a request"""
+
+    def __init__(self, request, update):
+        self.update = update
+        self.__acl__ = update_maintainers_acl(request, update)
+
+
 #
 # OpenID views
 #
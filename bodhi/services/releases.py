@@ -14,12 +14,16 @@
 
 import math
 
+from collections import defaultdict, OrderedDict
+
 from cornice import Service
 from pyramid.exceptions import HTTPNotFound
-from sqlalchemy.sql import or_
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload, lazyload, load_only
+from sqlalchemy.sql import or_, extract
 
 from bodhi import log
-from bodhi.models import Update, Build, Package, Release
+from bodhi.models import Update, Build, Package, Release, get_release_stats
 import bodhi.schemas
 import bodhi.security
 from bodhi.validators import (
@@ -36,40 +40,68 @@ release = Service(name='release', path='/releases/{name}',
 releases = Service(name='releases', path='/releases/',
                    description='Fedora Releases')
 
+def monthly_update_counts(db, release):
+    """
+    Return a sorted list of the 'YYYY/MM' months in which updates were
+    submitted to this release, along with the number of updates of each type
+    submitted in each of these months, as computed by a single GROUP BY.
+    """
+    year = extract('year', Update.date_submitted)
+    month = extract('month', Update.date_submitted)
+    rows = db.query(year, month, Update.type, func.count(Update.id))\
+             .filter(Update.release_id == release.id)\
+             .filter(Update.date_submitted != None)\
+             .group_by(year, month, Update.type).all()
+
+    dates = sorted(set('%d/%02d' % (int(y), int(m)) for y, m, t, n in rows))
+    date_commits = {}
+    for y, m, type, num in rows:
+        counts = date_commits.setdefault(type.description, OrderedDict(
+            (yearmonth, 0) for yearmonth in dates))
+        counts['%d/%02d' % (int(y), int(m))] += num
+    return dates, date_commits
+
+
 @release.get(accept="text/html", renderer="release.html")
 def get_release_html(request):
     id = request.matchdict.get('name')
-    release = Release.get(id, request.db)
+    db = request.db
+    release = Release.get(id, db)
     if not release:
         request.errors.add('body', 'name', 'No such release')
         request.errors.status = HTTPNotFound.code
-    updates = request.db.query(Update).filter(
-        Update.release==release).order_by(
-            Update.date_submitted.desc())
-
-    updates_count = request.db.query(Update.date_submitted, Update.type).filter(
-        Update.release==release).order_by(
-            Update.date_submitted.desc())
+        return
 
-    date_commits = {}
-    dates = set()
-
-    for update in updates_count.all():
-        d = update.date_submitted
-        yearmonth = str(d.year) + '/' + str(d.month).zfill(2)
-        dates.add(yearmonth)
-        if not update.type.description in date_commits:
-            date_commits[update.type.description] = {}
-        if yearmonth in date_commits[update.type.description]:
-            date_commits[update.type.description][yearmonth] += 1
-        else:
-            date_commits[update.type.description][yearmonth] = 0
+    # The release statistics tell us how many updates of each type there
+    # are, which both gives us the total and tells us when the cached
+    # histogram is out of date.
+    types = defaultdict(int)
+    stats = get_release_stats(db, names=release.name).get(release.name, {})
+    for counts in stats.values():
+        for type, num in counts.items():
+            types[type] += num
+    signature = ' '.join('%s=%d' % item for item in sorted(types.items()))
+
+    @request.cache.cache_on_arguments(namespace='release_histogram')
+    def work(name, signature):
+        return monthly_update_counts(db, release)
+
+    dates, date_commits = work(release.name, signature)
+
+    # Only load what the update table needs for the latest updates
+    latest_updates = db.query(Update)\
+        .options(load_only('title', 'date_submitted', 'status',
+                           'release_id', 'user_id'),
+                 lazyload('*'), joinedload('user'))\
+        .filter(Update.release_id == release.id)\
+        .order_by(Update.date_submitted.desc())\
+        .limit(25).all()
 
     return dict(release=release,
-                latest_updates=updates.limit(25).all(),
-                count=updates.count(),
+                latest_updates=latest_updates,
+                count=sum(types.values()),
                 date_commits=date_commits,
-                dates = sorted(dates))
+                dates=dates)
 
 @release.get(accept=('application/json', 'text/json'), renderer='json')
 @release.get(accept=('application/javascript'), renderer='jsonp')
@@ -14,12 +14,16 @@
 
 import math
 
+import colander
 from cornice import Service
+from cornice.errors import Errors
 from pyramid.security import has_permission
 from sqlalchemy.sql import or_
 
-from bodhi import log
+from bodhi import buildsys, log
 from bodhi.exceptions import BodhiException, LockedUpdateException
+from bodhi.gating import gating
+from bodhi.jobs import jobs
 from bodhi.models import Update, Build, Bug, CVE, Package, UpdateRequest
 import bodhi.schemas
 import bodhi.security
@@ -34,7 +38,10 @@ from bodhi.validators import (
     validate_releases,
     validate_username,
     validate_update_id,
+    validate_updates,
     validate_requirements,
+    prefetch_acls,
+    prefetch_build_tags,
 )
 
 
@@ -52,10 +59,18 @@ updates = Service(name='updates', path='/updates/',
                   acl=bodhi.security.packagers_allowed_acl,
                   description='Update submission service')
 
+updates_batch = Service(name='updates_batch', path='/updates/batch/',
+                        acl=bodhi.security.packagers_allowed_acl,
+                        description='Bulk update submission service')
+
 update_request = Service(name='update_request', path='/updates/{id}/request',
                          description='Update request service',
                          acl=bodhi.security.package_maintainers_only_acl)
 
+update_requests = Service(name='update_requests', path='/updates/requests/',
+                          description='Bulk update request service',
+                          acl=bodhi.security.packagers_allowed_acl)
+
 
 @update.get(accept=('application/json', 'text/json'), renderer='json')
 @update.get(accept=('application/javascript'), renderer='jsonp')
@@ -106,6 +121,61 @@ def set_request(request):
     return dict(update=update)
 
 
+@update_requests.post(schema=bodhi.schemas.UpdatesRequestSchema,
+                      validators=(validate_enums, validate_updates),
+                      permission='create', renderer='json')
+def set_requests(request):
+    """Sets the same :class:`bodhi.models.UpdateRequest` on many updates
+
+    The requirements of stable requests are checked in parallel, the koji
+    tags of all the updates are added in a single multicall, and the mail
+    and fedmsg messages are sent in the background once the changes are
+    committed.  The response lists the outcome of each update, in order.
+    """
+    updates = request.validated['updates']
+    action = request.validated['request']
+    username = request.user.name
+
+    errors = {}
+    for update in updates:
+        context = bodhi.security.UpdateContext(request, update)
+        if not has_permission('edit', context, request):
+            errors[update.title] = "%s does not have commit access to %s" % (
+                username, update.title)
+        elif update.locked:
+            errors[update.title] = "Can't change request on a locked update"
+
+    if action is UpdateRequest.stable:
+        outcomes = gating.check_updates(
+            [update for update in updates if update.title not in errors])
+        for title, (result, reason) in outcomes.items():
+            if not result:
+                errors[title] = 'Requirement not met %s' % reason
+
+    koji = buildsys.get_session()
+    koji.multicall = True
+    with jobs.collect():
+        for update in updates:
+            if update.title in errors:
+                continue
+            try:
+                update.set_request(action, username, koji=koji)
+            except (BodhiException, LockedUpdateException) as e:
+                errors[update.title] = e.message
+        for result in koji.multiCall():
+            if isinstance(result, dict):
+                log.error('Unable to tag a build: %s' % result.get('faultString'))
+
+    results = []
+    for update in updates:
+        if update.title in errors:
+            results.append(dict(title=update.title,
+                                error=errors[update.title]))
+        else:
+            results.append(dict(title=update.title, update=update))
+    return dict(updates=results)
+
+
 @updates.get(schema=bodhi.schemas.ListUpdateSchema,
              accept=('application/json', 'text/json'), renderer='json',
              validators=(validate_releases, validate_enums, validate_username))
@@ -221,12 +291,15 @@ def query_updates(request):
     )
 
 
+# The validators of each update that is created or edited
+save_update_validators = (
+    validate_nvrs, validate_version, validate_builds, validate_uniqueness,
+    validate_build_tags, validate_acls, validate_enums, validate_requirements)
+
+
 @updates.post(schema=bodhi.schemas.SaveUpdateSchema,
               permission='create', renderer='json',
-              validators=(
-                  validate_nvrs, validate_version, validate_builds,
-                  validate_uniqueness, validate_build_tags, validate_acls,
-                  validate_enums, validate_requirements))
+              validators=save_update_validators)
 def new_update(request):
     """ Save an update.
 
@@ -241,6 +314,11 @@ def new_update(request):
     # it since the models don't care about a csrf argument.
     data.pop('csrf_token')
 
+    return save_update(request, data)
+
+
+def save_update(request, data):
+    """ Create or edit an update, adding any failure to the request errors """
     try:
         if data.get('edited'):
             log.info('Editing update: %s' % data['edited'])
@@ -262,3 +340,100 @@ def new_update(request):
     up.obsolete_older_updates(request)
 
     return up
+
+
+class BatchItem(object):
+    """
+    Stands in for the request while one update of a batch is validated and
+    saved.  It has its own validated data and errors, and shares everything
+    else with the request, like the user and the buildinfo cache.
+    """
+
+    def __init__(self, request, validated=None):
+        self.request = request
+        self.validated = validated or {}
+        self.errors = Errors(request)
+
+    def __getattr__(self, name):
+        return getattr(self.request, name)
+
+
+def prefetch_batch(request, items):
+    """
+    Look up the koji tags and the ACLs of the builds of all the items at
+    once, so that validating each update only hits the caches.
+    """
+    builds = sum([item.validated['builds'] for item in items], [])
+    try:
+        prefetch_build_tags(request, builds)
+        if request.registry.settings.get('acl_system') == 'pkgdb':
+            prefetch_acls(BatchItem(request, dict(builds=builds)))
+    except Exception:
+        # Whatever is missing gets looked up, and reported, for each update
+        log.exception('Unable to prefetch the builds of the batch')
+
+
+def save_batch_item(item):
+    """ Validate and save one update of a batch, returning it if it worked """
+    if not item.errors:
+        try:
+            # validate_nvrs already ran before the prefetch
+            for validator in save_update_validators[1:]:
+                validator(item)
+        except Exception as e:
+            log.exception(e)
+            item.errors.add('body', 'builds', 'Unable to validate update')
+
+    # Each update is saved before the next one is validated, so a build
+    # can't end up in two updates of the batch
+    if not item.errors:
+        return save_update(item, item.validated)
+
+
+@updates_batch.post(schema=bodhi.schemas.SaveUpdatesSchema,
+                    permission='create', renderer='json')
+def new_updates(request):
+    """ Save a batch of updates.
+
+    Each item of ``updates`` takes the same parameters as a single update and
+    is validated and saved on its own, in a savepoint of the request's
+    transaction.  The response lists either the update or the errors of each
+    item, in order.
+    """
+    items = []
+    for data in request.validated['updates']:
+        item = BatchItem(request)
+        try:
+            item.validated.update(
+                bodhi.schemas.UpdateSchema().deserialize(data))
+        except colander.Invalid as e:
+            for name, description in e.asdict().items():
+                item.errors.add('body', name, description)
+        else:
+            validate_nvrs(item)
+        items.append(item)
+
+    prefetch_batch(request, [item for item in items if not item.errors])
+
+    results = []
+    for item in items:
+        # Each update is saved in a savepoint of its own, so that a failure
+        # leaves neither half-created rows nor jobs behind, and the session
+        # remains usable for the rest of the batch
+        savepoint = request.db.begin_nested()
+        try:
+            with jobs.hold() as held, jobs.collect():
+                up = save_batch_item(item)
+        except:
+            savepoint.rollback()
+            raise
+
+        if up is None:
+            savepoint.rollback()
+            results.append(dict(errors=item.errors))
+        else:
+            savepoint.commit()
+            jobs.release(held)
+            results.append(dict(update=up))
+
+    return dict(updates=results)
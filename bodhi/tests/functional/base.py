@@ -24,6 +24,7 @@ from bodhi.tests import populate
 from bodhi.models import (
     Base,
     DBSession,
+    setup_savepoints,
 )
 
 FAITOUT = 'http://209.132.184.152/faitout/'
@@ -79,6 +80,7 @@ class BaseWSGICase(unittest.TestCase):
 
     def setUp(self):
         engine = create_engine(DB_PATH)
+        setup_savepoints(engine)
         DBSession.configure(bind=engine)
         log.debug('Creating all models for %s' % engine)
         Base.metadata.create_all(engine)
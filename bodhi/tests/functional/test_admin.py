@@ -0,0 +1,106 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+
+from webtest import TestApp
+
+from bodhi import main
+from bodhi.metrics import metrics
+from bodhi.tests.functional.base import BaseWSGICase
+
+
+class TestAdminService(BaseWSGICase):
+
+    def test_admin(self):
+        res = self.app.get('/admin/')
+        self.assertEquals(res.json_body['user'], 'guest')
+
+    def test_sql_stats_disabled(self):
+        self.app.get('/admin/sql', status=404)
+
+
+class TestSQLProfiling(BaseWSGICase):
+
+    def setUp(self):
+        super(TestSQLProfiling, self).setUp()
+        settings = self.app_settings.copy()
+        settings.update({
+            'profiling.sql': 'true',
+            'profiling.sql.max_queries': '1',
+            'profiling.sql.slow_query': '0',
+        })
+        self.app = TestApp(main({}, testing=u'guest', **settings))
+        # Our session is still bound to the engine created by BaseWSGICase
+        self.app.app.registry.sql_profiler.listen(self.db.get_bind())
+
+    def test_sql_stats(self):
+        with mock.patch('bodhi.profiling.log') as log:
+            self.app.get('/updates/', headers={'Accept': 'application/json'})
+            self.app.get('/updates/', headers={'Accept': 'application/json'})
+        self.assertEquals(log.warn.call_count, 2)
+        self.assertIn('/updates/ ran', log.warn.call_args[0][0])
+
+        stats = self.app.get('/admin/sql').json_body
+        route = stats['routes']['updates']
+        self.assertEquals(route['requests'], 2)
+        self.assertEquals(route['slow_requests'], 2)
+        self.assertGreater(route['max_queries'], 1)
+        self.assertEquals(route['queries'], route['avg_queries'] * 2)
+        self.assertTrue(stats['slow_queries'])
+        self.assertEquals(stats['slow_queries'][0]['route'], 'updates')
+
+    def test_reset_sql_stats(self):
+        self.app.get('/updates/', headers={'Accept': 'application/json'})
+        stats = self.app.delete('/admin/sql').json_body
+        self.assertEquals(stats['routes']['updates']['requests'], 1)
+        stats = self.app.get('/admin/sql').json_body
+        self.assertEquals(stats['routes'].keys(), ['admin_sql'])
+
+
+class TestMetrics(BaseWSGICase):
+
+    def setUp(self):
+        super(TestMetrics, self).setUp()
+        settings = self.app_settings.copy()
+        settings['metrics'] = 'true'
+        self.app = TestApp(main({}, testing=u'guest', **settings))
+
+    def tearDown(self):
+        super(TestMetrics, self).tearDown()
+        metrics.configure({})
+
+    def test_metrics(self):
+        self.app.get('/updates/', headers={'Accept': 'application/json'})
+        self.app.get('/updates/', headers={'Accept': 'text/html'})
+        self.app.get('/updates/', headers={'Accept': 'application/rss'})
+        self.app.get('/nonexistent', status=404)
+        res = self.app.get('/admin/metrics')
+        self.assertEquals(res.content_type, 'text/plain')
+        self.assertIn('bodhi_request_seconds_count'
+                      '{renderer="json",route="updates"} 1', res.body)
+        self.assertIn('bodhi_request_seconds_count'
+                      '{renderer="html",route="updates"} 1', res.body)
+        self.assertIn('bodhi_request_seconds_count'
+                      '{renderer="rss",route="updates"} 1', res.body)
+        self.assertIn('bodhi_responses_total'
+                      '{route="updates",status="2xx"} 3.0', res.body)
+        self.assertIn('bodhi_responses_total'
+                      '{route="notfound",status="4xx"} 1.0', res.body)
+        self.assertIn('bodhi_request_db_seconds_count{route="updates"} 3',
+                      res.body)
+
+    def test_metrics_disabled(self):
+        metrics.configure({})
+        self.app.get('/admin/metrics', status=404)
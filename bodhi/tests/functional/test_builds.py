@@ -107,6 +107,15 @@ class TestBuildsService(bodhi.tests.functional.base.BaseWSGICase):
         self.assertEquals(res.json_body['errors'][0]['description'],
                           'Invalid releases specified: WinXP')
 
+    def test_list_builds_by_several_releases(self):
+        res = self.app.get('/builds/', {"releases": "F17,WinXP,17,Vista"},
+                           status=400)
+        self.assertEquals(res.json_body['errors'][0]['description'],
+                          'Invalid releases specified: WinXP, Vista')
+
+        res = self.app.get('/builds/', {"releases": "F17,17"})
+        self.assertEquals(len(res.json_body['builds']), 1)
+
     def test_list_builds_by_nvr(self):
         res = self.app.get('/builds/', {"nvr": "bodhi-2.0-1.fc17"})
         up = res.json_body['builds'][0]
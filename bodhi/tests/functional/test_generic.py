@@ -12,10 +12,13 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+from nose.tools import eq_
+
 import bodhi.tests.functional.base
 
 from bodhi.security import remember_me
-from bodhi.models import DBSession, User, Group
+from bodhi.views.search import PackageIndex
+from bodhi.models import DBSession, User, Group, Release
 
 from pyramid.testing import DummyRequest
 
@@ -162,3 +165,49 @@ class TestGenericViews(bodhi.tests.functional.base.BaseWSGICase):
     def test_metrics(self):
         res = self.app.get('/metrics')
         self.assertIn('$.plot', res)
+
+    def test_metrics_release_order(self):
+        """Releases are ordered by version, whatever their names look like"""
+        session = DBSession()
+        for name, version in [(u'F22a', u'22'), (u'F7', u'7')]:
+            session.add(Release(
+                name=name, long_name=u'Fedora %s' % name, id_prefix=u'FEDORA',
+                version=version, dist_tag=u'%s-dist' % name,
+                stable_tag=u'%s-stable' % name,
+                testing_tag=u'%s-testing' % name,
+                candidate_tag=u'%s-candidate' % name,
+                pending_testing_tag=u'%s-pending-testing' % name,
+                pending_stable_tag=u'%s-pending' % name,
+                override_tag=u'%s-override' % name))
+        session.flush()
+        res = self.app.get('/metrics')
+        self.assertIn('[[0, "F7"], [1, "F17"], [2, "F22a"]]', res)
+
+    def test_search_packages(self):
+        res = self.app.get('/search/packages', {'term': 'hack'}, status=200)
+        self.assertEquals(res.json_body, [
+            {'id': 'nethack', 'label': 'nethack', 'value': 'nethack'}])
+
+
+class TestPackageIndex(object):
+
+    def setUp(self):
+        self.index = PackageIndex()
+        self.index.build(['kernel-tools', 'abrt', 'python-kerneloops',
+                          'kernel', 'ke', 'libkeyutils', 'kernel'])
+
+    def test_prefix_then_substring(self):
+        eq_(self.index.search('kern'), ['kernel', 'kernel-tools',
+                                        'python-kerneloops'])
+
+    def test_short_term(self):
+        eq_(self.index.search('ke'), ['ke', 'kernel', 'kernel-tools',
+                                      'libkeyutils', 'python-kerneloops'])
+
+    def test_limit(self):
+        eq_(self.index.search('ke', limit=2), ['ke', 'kernel'])
+        eq_(self.index.search('ker', limit=3), ['kernel', 'kernel-tools',
+                                                'python-kerneloops'])
+
+    def test_no_match(self):
+        eq_(self.index.search('nethack'), [])
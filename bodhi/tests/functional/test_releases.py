@@ -12,6 +12,8 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+from datetime import datetime
+
 import bodhi.tests.functional.base
 
 from bodhi.models import (
@@ -19,6 +21,7 @@ from bodhi.models import (
     Release,
     ReleaseState,
     Update,
+    UpdateType,
 )
 
 
@@ -187,6 +190,30 @@ class TestReleasesService(bodhi.tests.functional.base.BaseWSGICase):
         self.assertEquals(res.content_type, 'text/html')
         self.assertIn('f17-updates-testing', res)
 
+    def test_get_single_release_html_histogram(self):
+        session = DBSession()
+        update = session.query(Update).one()
+        update.type = UpdateType.security
+        session.add(Update(
+            title=u'bodhi-2.0-2.fc17', user=update.user,
+            notes=u'More details', release=update.release,
+            date_submitted=datetime(1985, 1, 5), type=UpdateType.bugfix,
+            stable_karma=3, unstable_karma=-3))
+        session.flush()
+
+        from bodhi.services.releases import monthly_update_counts
+        dates, date_commits = monthly_update_counts(session, update.release)
+        self.assertEquals(dates, ['1984/11', '1985/01'])
+        self.assertEquals(date_commits, {
+            'security': {'1984/11': 1, '1985/01': 0},
+            'bugfix': {'1984/11': 0, '1985/01': 1},
+        })
+        self.assertEquals(date_commits['security'].keys(), dates)
+
+        res = self.app.get('/releases/f17', headers={'Accept': 'text/html'})
+        self.assertIn('labels : ["1984/11", "1985/01"]', res)
+        self.assertIn('bodhi-2.0-2.fc17', res)
+
     def test_get_non_existent_release_html(self):
         self.app.get('/releases/x', headers={'Accept': 'text/html'}, status=404)
 
@@ -46,7 +46,7 @@ mock_valid_requirements = {
 }
 
 mock_taskotron_results = {
-    'target': 'bodhi.util.taskotron_results',
+    'target': 'bodhi.resultsdb.ResultsDB.get',
     'return_value': [{
         "outcome": "PASSED",
         "result_data": {},
@@ -55,7 +55,7 @@ mock_taskotron_results = {
 }
 
 mock_failed_taskotron_results = {
-    'target': 'bodhi.util.taskotron_results',
+    'target': 'bodhi.resultsdb.ResultsDB.get',
     'return_value': [{
         "outcome": "FAILED",
         "result_data": {},
@@ -64,7 +64,7 @@ mock_failed_taskotron_results = {
 }
 
 mock_absent_taskotron_results = {
-    'target': 'bodhi.util.taskotron_results',
+    'target': 'bodhi.resultsdb.ResultsDB.get',
     'return_value': [],
 }
 
@@ -103,6 +103,87 @@ class TestUpdatesService(bodhi.tests.functional.base.BaseWSGICase):
             topic='update.request.testing', msg=mock.ANY)
 
 
+    @mock.patch(**mock_valid_requirements)
+    @mock.patch('bodhi.validators.rpm', create=True)
+    @mock.patch('bodhi.models.models.jobs')
+    def test_new_update_defers_bug_comments(self, jobs, rpm, *args):
+        rpm.labelCompare.return_value = 1
+        update = self.get_update('bodhi-2.0.0-2.fc17')
+        update['bugs'] = [12345, 1234]
+        self.app.post_json('/updates/', update)
+
+        from bodhi.bugs import comment_on_bugs
+        from bodhi.models import Package
+        calls = dict((call[0][0], call[0][1])
+                     for call in jobs.defer.call_args_list)
+        eq_(sorted(bug_id for bug_id, text in calls[comment_on_bugs]),
+            [1234, 12345])
+        eq_(calls[Package.fetch_test_cases_of], [u'bodhi'])
+
+    @mock.patch(**mock_valid_requirements)
+    @mock.patch('bodhi.validators.rpm', create=True)
+    @mock.patch('bodhi.models.models.jobs')
+    def test_new_updates_batch(self, jobs, rpm, *args):
+        rpm.labelCompare.return_value = 1
+        updates = [self.get_update(u'bodhi-2.0.0-2.fc17'),
+                   self.get_update(u'bodhi-2.0.0-3.fc17,invalidbuild-1.0'),
+                   self.get_update(u'TurboGears-2.0.0-1.fc17'),
+                   self.get_update(u'bodhi-2.0.0-2.fc17')]
+        updates[2]['notes'] = u'too short'
+        res = self.app.post_json('/updates/batch/', dict(
+            updates=updates, csrf_token=self.get_csrf_token()))
+        results = res.json_body['updates']
+        eq_(len(results), 4)
+        eq_(results[0]['update']['title'], u'bodhi-2.0.0-2.fc17')
+        assert 'Build not in name-version-release format' in \
+            results[1]['errors'][0]['description']
+        eq_(results[2]['errors'][0]['name'], 'notes')
+        eq_(results[3]['errors'][0]['description'],
+            'Update for bodhi-2.0.0-2.fc17 already exists')
+        eq_(DBSession().query(Update).filter_by(
+            title=u'bodhi-2.0.0-2.fc17').count(), 1)
+
+    @mock.patch(**mock_valid_requirements)
+    @mock.patch('bodhi.validators.rpm', create=True)
+    @mock.patch('bodhi.jobs.transaction')
+    def test_new_updates_batch_failed_save(self, transaction, rpm, *args):
+        """Test that an update failing to save leaves nothing behind"""
+        set_request = Update.set_request
+
+        def fail(update, *args, **kw):
+            if update.title == u'nethack-3.6.0-1.fc17':
+                raise ValueError('boom')
+            return set_request(update, *args, **kw)
+
+        rpm.labelCompare.return_value = 1
+        updates = [self.get_update(u'nethack-3.6.0-1.fc17'),
+                   self.get_update(u'TurboGears-2.0.0-1.fc17')]
+        with mock.patch.object(Update, 'set_request', autospec=True,
+                               side_effect=fail):
+            res = self.app.post_json('/updates/batch/', dict(
+                updates=updates, csrf_token=self.get_csrf_token()))
+        results = res.json_body['updates']
+        eq_(results[0]['errors'][0]['description'], 'Unable to create update')
+        eq_(results[1]['update']['title'], u'TurboGears-2.0.0-1.fc17')
+
+        session = DBSession()
+        eq_(session.query(Package).filter_by(name=u'nethack').count(), 0)
+        eq_(session.query(Build).filter_by(
+            nvr=u'nethack-3.6.0-1.fc17').count(), 0)
+        eq_(session.query(Update).filter_by(
+            title=u'TurboGears-2.0.0-1.fc17').count(), 1)
+        # Only the jobs of the saved update are deferred
+        deferred = [call[1]['args'] for call in
+                    transaction.get().addAfterCommitHook.call_args_list]
+        eq_([args[0] for func, args, kw in deferred
+             if func == Package.fetch_test_cases_of], [[u'TurboGears']])
+
+    @mock.patch(**mock_valid_requirements)
+    def test_new_updates_batch_empty(self, *args):
+        res = self.app.post_json('/updates/batch/', dict(
+            updates=[], csrf_token=self.get_csrf_token()), status=400)
+        eq_(res.json_body['errors'][0]['name'], 'updates')
+
     # FIXME: make it easy to tweak the tag of an update in our buildsys during unit tests
     #def test_invalid_tag(self):
     #    session = DBSession()
@@ -321,6 +402,26 @@ class TestUpdatesService(bodhi.tests.functional.base.BaseWSGICase):
         res = app.post_json('/updates/', update, status=400)
         assert "Unable to access the Package Database. Please try again later." in res, res
 
+    @mock.patch(**mock_valid_requirements)
+    @mock.patch('bodhi.validators.rpm', create=True)
+    def test_pkgdb_acls(self, rpm, *args):
+        "Test that the pkgdb ACLs are looked up once, and cached"
+        settings = self.app_settings.copy()
+        settings['acl_system'] = 'pkgdb'
+        settings['dogpile.cache.backend'] = 'bodhi.lru'
+        settings['dogpile.cache.expiration_time.acls'] = '3600'
+        app = TestApp(main({}, testing=u'guest', **settings))
+        rpm.labelCompare.return_value = 1
+        fetch = app.app.registry.acls.fetch = mock.Mock(
+            return_value=((['guest'], []), ([], [])))
+        update = self.get_update(u'bodhi-2.0-2.fc17')
+        update['csrf_token'] = app.get('/csrf').json_body['csrf_token']
+        app.post_json('/updates/', update)
+        update = self.get_update(u'bodhi-2.0-3.fc17')
+        update['csrf_token'] = app.get('/csrf').json_body['csrf_token']
+        app.post_json('/updates/', update)
+        fetch.assert_called_once_with(u'bodhi', u'f17')
+
     @mock.patch(**mock_valid_requirements)
     def test_invalid_acl_system(self, *args):
         settings = self.app_settings.copy()
@@ -1389,6 +1490,52 @@ class TestUpdatesService(bodhi.tests.functional.base.BaseWSGICase):
         eq_(resp.json['update']['request'], 'testing')
         self.assertEquals(publish.call_args_list, [])
 
+    @mock.patch(**mock_valid_requirements)
+    @mock.patch('bodhi.validators.rpm', create=True)
+    @mock.patch('bodhi.notifications.publish')
+    def test_testing_requests(self, publish, rpm, *args):
+        """Test submitting a testing request for several updates at once"""
+        rpm.labelCompare.return_value = 1
+        args = self.get_update('bodhi-2.0.0-3.fc17')
+        self.app.post_json('/updates/', args)
+        session = DBSession()
+        locked = session.query(Update).filter_by(
+            title=u'bodhi-2.0-1.fc17').one()
+        locked.locked = True
+        up = session.query(Update).filter_by(title=args['builds']).one()
+        up.request = None
+        session.flush()
+        publish.reset_mock()
+        resp = self.app.post_json('/updates/requests/', {
+            'updates': [args['builds'], u'bodhi-2.0-1.fc17'],
+            'request': 'testing', 'csrf_token': self.get_csrf_token()})
+        results = resp.json['updates']
+        eq_(results[0]['update']['request'], 'testing')
+        eq_(results[1], {'title': u'bodhi-2.0-1.fc17',
+                         'error': "Can't change request on a locked update"})
+        publish.assert_called_with(
+            topic='update.request.testing', msg=mock.ANY)
+
+    @mock.patch(**mock_failed_taskotron_results)
+    @mock.patch(**mock_valid_requirements)
+    def test_stable_requests_failed_taskotron_results(self, *args):
+        """Test submitting stable requests with bad taskotron results"""
+        from bodhi.gating import gating
+        gating.invalidate()
+        resp = self.app.post_json('/updates/requests/', {
+            'updates': u'bodhi-2.0-1.fc17',
+            'request': 'stable', 'csrf_token': self.get_csrf_token()})
+        eq_(resp.json['updates'][0]['error'],
+            'Requirement not met Required task rpmlint returned FAILED')
+
+    def test_requests_for_unknown_updates(self):
+        resp = self.app.post_json('/updates/requests/', {
+            'updates': u'bodhi-2.0-1.fc17 nope-1.0-1.fc17',
+            'request': 'testing', 'csrf_token': self.get_csrf_token()},
+            status=400)
+        eq_(resp.json['errors'][0]['description'],
+            'Invalid updates specified: nope-1.0-1.fc17')
+
     @mock.patch(**mock_taskotron_results)
     @mock.patch(**mock_valid_requirements)
     def test_invalid_stable_request(self, *args):
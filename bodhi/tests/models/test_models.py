@@ -17,17 +17,23 @@
 """Test suite for the Bodhi models"""
 
 import time
+import shutil
+import tempfile
+import threading
 import cornice
 import mock
 
 from nose.tools import eq_, raises
 from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
 from pyramid.testing import DummyRequest
 
 from bodhi import models as model, buildsys, mail
 from bodhi.models import (UpdateStatus, UpdateType, UpdateRequest,
                           UpdateSeverity, UpdateSuggestion)
+from bodhi.models.models import _count_update
 from bodhi.tests.models import ModelTest
 from bodhi.config import config
 from bodhi.exceptions import BodhiException
@@ -58,19 +64,55 @@ class TestRelease(ModelTest):
     def test_version_int(self):
         eq_(self.obj.version_int, 11)
 
+    def test_get_tags(self):
+        tag_types, tag_rels = model.Release.get_tags(model.DBSession())
+        eq_(tag_types['candidate'], [u'dist-f11-updates-candidate'])
+        eq_(tag_rels[u'dist-f11-updates-testing'], u'F11')
 
-class MockWiki(object):
-    """ Mocked simplemediawiki.MediaWiki class. """
-    def __init__(self, response):
-        self.response = response
-        self.query = None
+    def test_from_tags_without_queries(self):
+        db = model.DBSession()
+        eq_(model.Release.from_tags([u'dist-f11-updates'], db), self.obj)
 
-    def __call__(self, *args, **kwargs):
-        return self
+        statements = []
+        def track(conn, cursor, statement, param, ctx, many):
+            statements.append(statement)
+        engine = db.get_bind()
+        event.listen(engine, 'before_cursor_execute', track)
+        try:
+            for tag in (u'dist-f11-updates', u'dist-f11-updates-candidate'):
+                eq_(model.Release.from_tags([tag], db), self.obj)
+        finally:
+            event.remove(engine, 'before_cursor_execute', track)
+        eq_(statements, [])
+
+    def test_registry_invalidated_on_save(self):
+        db = model.DBSession()
+        tag_types, tag_rels = model.Release.get_tags(db)
+        assert u'dist-f11-updates-candidate' in tag_rels
+
+        self.obj.candidate_tag = u'f11-updates-candidate'
+        db.flush()
+
+        tag_types, tag_rels = model.Release.get_tags(db)
+        eq_(tag_types['candidate'], [u'f11-updates-candidate'])
+        assert u'dist-f11-updates-candidate' not in tag_rels
+
+    def test_registry_invalidated_by_other_processes(self):
+        db = model.DBSession()
+        model.Release.get_tags(db)
+        version = model.get_cache_version(db, u'releases')
+
+        # Simulate another process editing the release
+        db.execute(model.Release.__table__.update().values(
+            candidate_tag=u'f11-updates-candidate'))
+        model.bump_cache_version(db, u'releases')
+        # ... and the next request starting a fresh transaction
+        db.info.pop('release_registry')
+        db.expire_all()
 
-    def call(self, query):
-        self.query = query
-        return self.response
+        eq_(model.get_cache_version(db, u'releases'), version + 1)
+        tag_types, tag_rels = model.Release.get_tags(db)
+        eq_(tag_types['candidate'], [u'f11-updates-candidate'])
 
 
 class TestPackage(ModelTest):
@@ -86,8 +128,7 @@ class TestPackage(ModelTest):
     def test_wiki_test_cases(self):
         """Test querying the wiki for test cases"""
 
-        # Mock out mediawiki so we don't do network calls in our tests
-        import simplemediawiki
+        # Mock out the wiki so we don't do network calls in our tests
         response = {
             'query': {
                 'categorymembers': [{
@@ -95,18 +136,34 @@ class TestPackage(ModelTest):
                 }],
             }
         }
-        original = simplemediawiki.MediaWiki
-        simplemediawiki.MediaWiki = MockWiki(response)
 
-        # Now, our actual test.
-        try:
+        with mock.patch('bodhi.wiki.outbound') as outbound:
+            outbound.json.return_value = response
             config['query_wiki_test_cases'] = True
             pkg = model.Package(name=u'gnome-shell')
             pkg.fetch_test_cases(model.DBSession())
             assert pkg.test_cases
-        finally:
-            # Restore things
-            simplemediawiki.MediaWiki = original
+            assert pkg.test_cases_synced
+        eq_(outbound.json.call_args[1]['data']['cmtitle'],
+            'Category:Package gnome-shell test cases')
+
+    def test_sync_test_cases(self):
+        db = model.DBSession()
+        other = model.Package(name=u'gnome-shell')
+        db.add(model.TestCase(name=u'Shared test case', package=other))
+        db.flush()
+        test_cases = {
+            u'TurboGears': [u'Shared test case', u'TG test case'],
+            u'gnome-shell': [u'Shared test case', u'Shell test case'],
+        }
+        with mock.patch('bodhi.models.models.wiki') as wiki:
+            wiki.test_cases.side_effect = test_cases.get
+            eq_(model.sync_test_cases(db, [self.obj, other]), 2)
+            eq_(sorted(case.name for case in self.obj.test_cases),
+                [u'TG test case'])
+            eq_(sorted(case.name for case in other.test_cases),
+                [u'Shared test case', u'Shell test case'])
+            eq_(model.sync_test_cases(db, [self.obj, other]), 0)
 
     def test_committers(self):
         assert self.obj.committers[0].name == u'lmacken'
@@ -196,6 +253,123 @@ class TestUpdate(ModelTest):
             ))
         return self.klass(**attrs)
 
+    def test_release_stats(self):
+        db = model.DBSession()
+        eq_(model.get_release_stats(db),
+            {u'F11': {u'pending': {u'security': 1}}})
+
+        self.obj.status = UpdateStatus.stable
+        db.flush()
+        eq_(model.get_release_stats(db, status=UpdateStatus.stable),
+            {u'F11': {u'stable': {u'security': 1}}})
+        eq_(model.get_release_stats(db),
+            {u'F11': {u'pending': {u'security': 0},
+                      u'stable': {u'security': 1}}})
+
+        release = model.Release(name=u'F12', long_name=u'Fedora 12',
+                                id_prefix=u'FEDORA', version=u'12',
+                                dist_tag=u'dist-f12', stable_tag=u'f12',
+                                testing_tag=u'f12-testing',
+                                candidate_tag=u'f12-candidate',
+                                pending_testing_tag=u'f12-pending-testing',
+                                pending_stable_tag=u'f12-pending',
+                                override_tag=u'f12-override')
+        self.obj.release = release
+        db.flush()
+        eq_(model.get_release_stats(db, status=UpdateStatus.stable,
+                                    names=u'F1%'),
+            {u'F11': {u'stable': {u'security': 0}},
+             u'F12': {u'stable': {u'security': 1}}})
+
+        db.delete(self.obj)
+        db.flush()
+        eq_(model.get_release_stats(db, names=u'F12'),
+            {u'F12': {u'stable': {u'security': 0}}})
+
+    def test_release_stats_concurrent_insert(self):
+        """A stats row created by another transaction gets updated"""
+        connection = mock.Mock()
+        connection.dialect.name = 'postgresql'
+        connection.execute.side_effect = [
+            mock.Mock(rowcount=0),
+            IntegrityError('INSERT', {}, Exception('duplicate key')),
+            mock.Mock(rowcount=1),
+        ]
+        _count_update(connection, (1, u'security', u'pending'), 1)
+
+        update, insert, retry = [call[0][0] for call
+                                 in connection.execute.call_args_list]
+        eq_(str(retry), str(update))
+        assert str(insert).startswith('INSERT'), insert
+        connection.begin_nested.return_value.rollback.assert_called_once_with()
+
+    def test_refresh_release_stats(self):
+        db = model.DBSession()
+        db.execute(model.release_stats_table.delete())
+        eq_(model.get_release_stats(db), {u'F11': {}})
+
+        eq_(model.refresh_release_stats(db), 1)
+        eq_(model.get_release_stats(db),
+            {u'F11': {u'pending': {u'security': 1}}})
+
+    def test_recompute_critpath(self):
+        db = model.DBSession()
+        release = self.obj.release
+        with mock.patch('bodhi.critpath.critpath.cache', {
+                u'f11': (time.time(), frozenset([u'TurboGears']))}):
+            eq_(model.recompute_critpath(db, release), 1)
+            db.expire_all()
+            eq_(self.obj.critpath, True)
+            eq_(model.recompute_critpath(db, release), 0)
+
+    def test_get_for_request(self):
+        db = model.DBSession()
+        self.obj.alias = u'FEDORA-2009-0001'
+        db.flush()
+        req = DummyRequest(db=db, entities={})
+        with mock.patch.object(model.Update, 'get',
+                               wraps=model.Update.get) as get:
+            eq_(model.Update.get_for_request(self.obj.title, req), self.obj)
+            eq_(model.Update.get_for_request(self.obj.title, req), self.obj)
+            eq_(model.Update.get_for_request(u'FEDORA-2009-0001', req),
+                self.obj)
+            eq_(model.Update.get_for_request(u'nope', req), None)
+            eq_(get.call_count, 2)
+
+    @mock.patch('bodhi.models.models.rpm', create=True)
+    @mock.patch('bodhi.notifications.publish')
+    def test_obsolete_older_updates(self, publish, rpm):
+        rpm.labelCompare.return_value = -1
+        db = model.DBSession()
+        self.obj.status = UpdateStatus.testing
+        self.obj.request = None
+        release = self.obj.release
+        other = model.Update(
+            title=u'nethack-3.4.3-1.fc11', notes=u'other package',
+            type=UpdateType.bugfix, status=UpdateStatus.testing,
+            release=release, user=self.obj.user, builds=[model.Build(
+                nvr=u'nethack-3.4.3-1.fc11', release=release,
+                package=model.Package(name=u'nethack'))])
+        db.add(other)
+        newer = self.get_update(u'TurboGears-1.0.8-4.fc11')
+        newer.user = self.obj.user
+        db.add(newer)
+        db.flush()
+
+        req = DummyRequest(db=db, buildinfo={u'TurboGears-1.0.8-4.fc11': {
+            'nvr': (u'TurboGears', u'1.0.8', u'4.fc11')}})
+        newer.obsolete_older_updates(req)
+
+        # Only the builds of the same package are compared
+        rpm.labelCompare.assert_called_once_with(
+            [u'TurboGears', u'1.0.8', u'3.fc11'],
+            (u'TurboGears', u'1.0.8', u'4.fc11'))
+        eq_(self.obj.status, UpdateStatus.obsolete)
+        eq_(other.status, UpdateStatus.testing)
+        eq_(newer.comments[-1].text,
+            u'This update has obsoleted TurboGears-1.0.8-3.fc11, '
+            u'and has inherited its bugs and notes.')
+
     def test_builds(self):
         eq_(len(self.obj.builds), 1)
         eq_(self.obj.builds[0].nvr, u'TurboGears-1.0.8-3.fc11')
@@ -245,7 +419,8 @@ class TestUpdate(ModelTest):
         eq_(update.alias, u'%s-%s-0003' % (update.release.id_prefix, year))
 
         ## 10k bug
-        update.alias = u'FEDORA-%s-9999' % year
+        sequences = model.update_alias_sequence_table
+        model.DBSession.execute(sequences.update().values(last_id=9999))
         newupdate = self.get_update(name=u'nethack-2.5.6-1.fc10')
         newupdate.release = otherrel
         model.DBSession.add(update)
@@ -297,6 +472,70 @@ class TestUpdate(ModelTest):
         eq_(update.alias, u'%s-%s-0002' % (release.id_prefix,
                                            time.localtime()[0]))
 
+    def test_alias_seeded_from_existing_updates(self):
+        """ The first update of a year continues after any existing IDs """
+        year = time.localtime()[0]
+        sequences = model.update_alias_sequence_table
+        model.DBSession.execute(sequences.delete())
+        self.obj.alias = u'FEDORA-%s-0042' % year
+        model.DBSession.flush()
+
+        update = self.get_update(name=u'TurboGears-0.4.4-8.fc11')
+        model.DBSession.add(update)
+        model.DBSession.flush()
+        eq_(update.alias, u'FEDORA-%s-0043' % year)
+
+    def test_concurrent_aliases(self):
+        """ Make sure parallel submissions never share an update ID """
+        tmpdir = tempfile.mkdtemp()
+        try:
+            engine = create_engine('sqlite:///%s/bodhi.db' % tmpdir,
+                                   connect_args={'timeout': 60})
+            model.Base.metadata.create_all(engine)
+            Session = sessionmaker(bind=engine)
+
+            session = Session()
+            release = model.Release(**TestRelease.attrs)
+            session.add(release)
+            session.commit()
+            release_id = release.id
+            session.close()
+
+            errors = []
+
+            def submit(thread):
+                session = Session()
+                try:
+                    for i in range(5):
+                        session.add(model.Update(
+                            title=u'pkg%d-%d-1.fc11' % (thread, i),
+                            notes=u'concurrent', type=UpdateType.bugfix,
+                            release_id=release_id))
+                        session.commit()
+                except Exception as e:
+                    errors.append(e)
+                    session.rollback()
+                finally:
+                    session.close()
+
+            threads = [threading.Thread(target=submit, args=(i,))
+                       for i in range(20)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            eq_(errors, [])
+            aliases = [alias for alias, in
+                       engine.execute(model.Update.__table__.select()
+                                      .with_only_columns(
+                                          [model.Update.__table__.c.alias]))]
+            year = time.localtime()[0]
+            eq_(sorted(aliases), [u'FEDORA-%s-%0.4d' % (year, i)
+                                  for i in range(1, 101)])
+        finally:
+            shutil.rmtree(tmpdir)
+
     @raises(IntegrityError)
     def test_dupe(self):
         self.get_update()
@@ -0,0 +1,137 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import threading
+
+import mock
+
+from nose.tools import eq_, raises
+
+from bodhi.acls import ACLStore, call_pkgdb, parse_acls
+from bodhi.cache import make_cacheregion
+
+
+class FakePkgDB(object):
+    """ Answers get_package calls like pkgdb, and records them """
+
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_package(self, name, branches):
+        with self.lock:
+            self.calls.append((name, branches))
+        return {'packages': [{'acls': [
+            {'fas_name': 'lmacken', 'acl': 'commit', 'status': 'Approved'},
+            {'fas_name': 'group::provenpackager', 'acl': 'commit',
+             'status': 'Approved'},
+            {'fas_name': 'ralph', 'acl': 'commit', 'status': 'Awaiting Review'},
+            {'fas_name': 'ralph', 'acl': 'watchcommits', 'status': 'Approved'},
+            {'fas_name': 'group::qa', 'acl': 'watchcommits',
+             'status': 'Approved'},
+        ]}]}
+
+    def fetch(self, package, branch):
+        return parse_acls(self.get_package(package, branches=branch))
+
+
+class TestACLStore(object):
+
+    def setUp(self):
+        self.pkgdb = FakePkgDB()
+        self.region = make_cacheregion({
+            'dogpile.cache.backend': 'bodhi.lru',
+            'dogpile.cache.expiration_time.acls': '3600',
+        })
+        self.store = ACLStore(self.region, {'acls.refresh_after': '600'},
+                              fetch=self.pkgdb.fetch)
+
+    def test_parse_acls(self):
+        eq_(self.pkgdb.fetch('bodhi', 'f23'),
+            ((['lmacken'], ['ralph']), (['provenpackager'], ['qa'])))
+
+    def test_get(self):
+        acls = self.store.get('bodhi', 'f23')
+        eq_(acls[0][0], ['lmacken'])
+        eq_(self.store.get('bodhi', 'f23'), acls)
+        eq_(self.pkgdb.calls, [('bodhi', 'f23')])
+        eq_(self.region.stats()['acls'], {'hits': 1, 'misses': 1})
+
+    def test_get_many(self):
+        self.store.get('bodhi', 'f23')
+        acls = self.store.get_many(['bodhi', 'kernel', 'nethack'], 'f23')
+        eq_(sorted(acls), ['bodhi', 'kernel', 'nethack'])
+        eq_(sorted(self.pkgdb.calls), [
+            ('bodhi', 'f23'), ('kernel', 'f23'), ('nethack', 'f23')])
+
+        self.store.get_many(['kernel', 'nethack'], 'f22')
+        eq_(len(self.pkgdb.calls), 5)
+
+    def test_background_refresh(self):
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            self.store.get('bodhi', 'f23')
+            now.return_value = 1700
+            with mock.patch('threading.Thread') as thread:
+                eq_(self.store.get('bodhi', 'f23')[0][0], ['lmacken'])
+        eq_(self.pkgdb.calls, [('bodhi', 'f23')])
+
+        # Run the refresh that was started in the background
+        eq_(self.store.refreshing, set([('bodhi', 'f23')]))
+        thread.call_args[1]['target']()
+        eq_(self.pkgdb.calls, [('bodhi', 'f23')] * 2)
+        eq_(self.store.refreshing, set())
+
+    def test_expiration(self):
+        """ The ACLs outlive the region's default expiration time """
+        region = make_cacheregion({
+            'dogpile.cache.backend': 'bodhi.lru',
+            'dogpile.cache.expiration_time': '100',
+        })
+        store = ACLStore(region, {'acls.refresh_after': '600'},
+                         fetch=self.pkgdb.fetch)
+        eq_(store.expiration_time, 86400)
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            store.get('bodhi', 'f23')
+            now.return_value = 1500
+            store.get('bodhi', 'f23')
+        eq_(self.pkgdb.calls, [('bodhi', 'f23')])
+
+        eq_(ACLStore(self.region, {'acls.refresh_after': '7200'}).
+            expiration_time, 14400)
+
+    def test_invalidate(self):
+        self.store.get('bodhi', 'f23')
+        self.store.invalidate('bodhi', 'f23')
+        self.store.get('bodhi', 'f23')
+        eq_(len(self.pkgdb.calls), 2)
+
+
+class TestCallPkgDB(object):
+
+    @mock.patch('bodhi.acls.outbound')
+    def test_call(self, outbound):
+        outbound.json.return_value = {'pkgs': {'f23': ['kernel']}}
+        eq_(call_pkgdb('https://pkgdb.example.com/', '/critpath/',
+                       branches='f23'), {'pkgs': {'f23': ['kernel']}})
+        outbound.json.assert_called_once_with(
+            'GET', 'https://pkgdb.example.com/api/critpath/',
+            params={'branches': 'f23'})
+
+    @raises(IOError)
+    @mock.patch('bodhi.acls.outbound')
+    def test_error(self, outbound):
+        outbound.json.return_value = {'error': 'No package found'}
+        call_pkgdb('https://pkgdb.example.com', '/package/', pkgname='nope')
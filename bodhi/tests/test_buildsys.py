@@ -0,0 +1,118 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+
+from nose.tools import eq_
+
+from bodhi.buildsys import DevBuildsys, SimulatedBuildsys, list_tags
+from bodhi.metrics import InstrumentedProxy
+
+
+class TestSimulatedBuildsys(object):
+
+    def setUp(self):
+        SimulatedBuildsys.configure({
+            'buildsystem.latency': '0.5',
+            'buildsystem.task_duration': '10',
+            'buildsystem.tags': 'f23-updates-candidate f23',
+            'buildsystem.builds_per_tag': '1000',
+            'buildsystem.rpms_per_build': '3',
+        })
+        self.koji = SimulatedBuildsys()
+        self.sleep = mock.patch('time.sleep').start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+        SimulatedBuildsys.clear()
+
+    def test_populate(self):
+        builds = self.koji.listTagged('f23')
+        eq_(len(builds), 1000)
+        eq_(builds[0]['nvr'], 'simulated00999-1.0-1.fc23')
+        eq_(len(self.koji.listBuildRPMs(builds[0]['id'])), 3)
+        eq_([tag['name'] for tag in self.koji.listTags(builds[0]['nvr'])],
+            ['f23', 'f23-updates-candidate'])
+
+    def test_latency(self):
+        self.koji.getBuild('simulated00001-1.0-1.fc23')
+        self.koji.listTags('simulated00001-1.0-1.fc23')
+        eq_(self.sleep.call_args_list, [mock.call(0.5)] * 2)
+        eq_(SimulatedBuildsys.round_trips, 2)
+
+    def test_list_tags(self):
+        builds = ['simulated00001-1.0-1.fc23', 'simulated00002-1.0-1.fc23']
+        eq_(list_tags(self.koji, builds),
+            [['f23', 'f23-updates-candidate']] * 2)
+        eq_(SimulatedBuildsys.round_trips, 1)
+
+    def test_list_tags_dev(self):
+        koji = DevBuildsys()
+        builds = ['bodhi-2.0-1.fc17', 'TurboGears-1.0-1']
+        eq_(list_tags(koji, builds),
+            [[tag['name'] for tag in koji.listTags(build)] for build in builds])
+
+    def test_list_tags_instrumented_dev(self):
+        """ The DevBuildsys is recognized behind the metrics proxy """
+        koji = DevBuildsys()
+        proxy = InstrumentedProxy(koji, 'koji', mock.MagicMock())
+        builds = ['bodhi-2.0-1.fc17', 'TurboGears-1.0-1']
+        eq_(list_tags(proxy, builds),
+            [[tag['name'] for tag in koji.listTags(build)] for build in builds])
+        eq_(koji.multicall, False)
+
+    def test_multicall(self):
+        self.koji.multicall = True
+        for i in range(100):
+            eq_(self.koji.listTagged('f23', package='simulated%05d' % i,
+                                     latest=True), None)
+        self.koji.getTag('f24', strict=True)
+        results = self.koji.multiCall()
+
+        eq_(self.sleep.call_count, 1)
+        eq_(SimulatedBuildsys.round_trips, 1)
+        eq_(self.koji.multicall, False)
+        eq_(len(results), 101)
+        eq_(results[1][0][0]['nvr'], 'simulated00001-1.0-1.fc23')
+        assert 'faultString' in results[-1]
+
+    def test_latest(self):
+        self.koji.tagBuild('f23', 'simulated00001-1.1-1.fc23')
+        builds = self.koji.listTagged('f23', package='simulated00001')
+        eq_([b['nvr'] for b in builds],
+            ['simulated00001-1.1-1.fc23', 'simulated00001-1.0-1.fc23'])
+        builds = self.koji.getLatestBuilds('f23', package='simulated00001')
+        eq_([b['nvr'] for b in builds], ['simulated00001-1.1-1.fc23'])
+
+    def test_unknown_build(self):
+        build = self.koji.getBuild('bodhi-2.0-1.fc23')
+        eq_(build['name'], 'bodhi')
+        eq_([tag['name'] for tag in self.koji.listTags('bodhi-2.0-1.fc23')],
+            ['f23-updates-candidate'])
+        eq_(self.koji.listPackages()[-1]['package_name'], 'bodhi')
+
+    def test_tasks(self):
+        nvr = 'simulated00001-1.0-1.fc23'
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            task = self.koji.moveBuild('f23-updates-candidate',
+                                       'f23-updates-testing', nvr)
+            eq_(self.koji.taskFinished(task), False)
+            now.return_value = 1010
+            eq_(self.koji.taskFinished(task), True)
+
+        eq_([tag['name'] for tag in self.koji.listTags(nvr)],
+            ['f23', 'f23-updates-testing'])
+        self.koji.untagBuild('f23', nvr)
+        eq_(len(self.koji.listTagged('f23')), 999)
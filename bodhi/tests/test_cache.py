@@ -0,0 +1,79 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+
+from nose.tools import eq_
+
+from dogpile.cache.api import NO_VALUE
+
+from bodhi.cache import make_cacheregion
+
+
+class TestCacheRegion(object):
+
+    def setUp(self):
+        self.region = make_cacheregion({
+            'dogpile.cache.backend': 'bodhi.lru',
+            'dogpile.cache.arguments.max_size': '2',
+            'dogpile.cache.expiration_time': '1',
+            'dogpile.cache.expiration_time.short': '20',
+        })
+
+    def test_hits_and_misses(self):
+        calls = []
+
+        @self.region.cache_on_arguments(namespace='home')
+        def work(arg):
+            calls.append(arg)
+            return arg * 2
+
+        eq_(work(1), 2)
+        eq_(work(1), 2)
+        eq_(work(2), 4)
+        eq_(calls, [1, 2])
+        eq_(self.region.stats(), {'home': {'hits': 1, 'misses': 2}})
+
+    def test_namespaced_keys(self):
+        @self.region.cache_on_arguments(namespace='avatar')
+        def work(username, size):
+            return username
+
+        work('lmacken', 24)
+        eq_(self.region.get('avatar|lmacken 24'), 'lmacken')
+
+    def test_namespace_expiration(self):
+        @self.region.cache_on_arguments(namespace='short')
+        def work():
+            return 1
+
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            eq_(work(), 1)
+            now.return_value = 1010
+            eq_(work(), 1)
+        eq_(self.region.stats()['short'], {'hits': 1, 'misses': 1})
+
+        self.region.expiration_times['short'] = 5
+        with mock.patch('time.time') as now:
+            now.return_value = 1020
+            eq_(work(), 1)
+        eq_(self.region.stats()['short'], {'hits': 1, 'misses': 2})
+
+    def test_lru_eviction(self):
+        for key in ('a', 'b', 'a', 'c'):
+            self.region.set(key, key)
+        eq_(self.region.get('b'), NO_VALUE)
+        eq_(self.region.get('a'), 'a')
+        eq_(self.region.get('c'), 'c')
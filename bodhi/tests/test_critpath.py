@@ -0,0 +1,74 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+
+from nose.tools import eq_
+
+from bodhi.critpath import CritpathStore
+
+
+class TestCritpathStore(object):
+
+    def setUp(self):
+        self.fetch = mock.Mock(return_value=frozenset(['kernel', 'glibc']))
+        self.store = CritpathStore(fetch=self.fetch)
+
+    def test_get(self):
+        eq_(self.store.get('f23'), frozenset(['kernel', 'glibc']))
+        eq_(self.store.get('f23'), frozenset(['kernel', 'glibc']))
+        self.store.get('f22')
+        eq_(self.fetch.call_args_list, [mock.call('f23'), mock.call('f22')])
+
+    def test_filter(self):
+        eq_(self.store.filter(['kernel', 'bodhi', 'glibc'], 'f23'),
+            set(['kernel', 'glibc']))
+        eq_(self.store.any(['bodhi', 'glibc'], 'f23'), True)
+        eq_(self.store.any(['bodhi'], 'f23'), False)
+        eq_(self.store.any([], 'f23'), False)
+
+    def test_ttl(self):
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            self.store.get('f23')
+            now.return_value = 2000
+            self.store.get('f23')
+            eq_(self.fetch.call_count, 1)
+
+            self.fetch.return_value = frozenset(['kernel'])
+            now.return_value = 5000
+            with mock.patch('threading.Thread') as thread:
+                # The stale list is used while the new one is fetched
+                eq_(self.store.get('f23'), frozenset(['kernel', 'glibc']))
+                self.store.get('f23')
+            eq_(thread.call_count, 1)
+            thread.call_args[1]['target']()
+            eq_(self.store.get('f23'), frozenset(['kernel']))
+        eq_(self.store.refreshing, set())
+
+    def test_failed_refresh(self):
+        self.store.get('f23')
+        self.fetch.side_effect = IOError
+        with mock.patch('threading.Thread') as thread:
+            self.store.refresh_in_background('f23')
+        thread.call_args[1]['target']()
+        eq_(self.store.get('f23'), frozenset(['kernel', 'glibc']))
+
+    def test_invalidate(self):
+        self.store.get('f23')
+        self.store.invalidate('f23')
+        self.store.get('f23')
+        self.store.invalidate()
+        self.store.get('f23')
+        eq_(self.fetch.call_count, 3)
@@ -0,0 +1,146 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+import requests
+
+from nose.tools import eq_
+
+from bodhi.gating import Gating, evaluate_requirements
+from bodhi.resultsdb import get_resultsdb
+
+
+def result(testcase, outcome='PASSED', arch=None):
+    return {
+        'outcome': outcome,
+        'result_data': {'arch': [arch]} if arch else {},
+        'testcase': {'name': testcase},
+    }
+
+
+def response(data, next=None):
+    resp = mock.Mock(status_code=200)
+    resp.json.return_value = {'data': data, 'next': next}
+    return resp
+
+
+class FakeUpdate(object):
+    def __init__(self, title, requirements):
+        self.title = title
+        self.requirements = requirements
+
+
+class TestEvaluateRequirements(object):
+
+    def test_pass(self):
+        eq_(evaluate_requirements(['rpmlint', 'depcheck'],
+                                  [result('rpmlint'), result('depcheck')]),
+            (True, 'All checks pass.'))
+
+    def test_absent(self):
+        eq_(evaluate_requirements(['rpmlint', 'depcheck'],
+                                  [result('rpmlint')]),
+            (False, 'No result found for required depcheck'))
+
+    def test_failed_arch(self):
+        eq_(evaluate_requirements(['depcheck'], [
+            result('depcheck', arch='x86_64'),
+            result('depcheck', 'FAILED', arch='i386'),
+        ]), (False, 'Required task depcheck returned FAILED'))
+
+
+class TestGating(object):
+
+    def setUp(self):
+        settings = {
+            'gating.workers': '4',
+            'resultsdb_api_url': 'https://resultsdb.example.com/',
+        }
+        self.gating = Gating(settings)
+        self.results = {
+            'bodhi-2.0-1.fc23': [result('rpmlint'), result('depcheck')],
+            'kernel-4.2-1.fc23': [result('rpmlint', 'FAILED')],
+            'glibc-2.22-1.fc23': [],
+        }
+        self.patcher = mock.patch.object(get_resultsdb(settings), 'http')
+        self.http = self.patcher.start()
+        self.http.get.side_effect = lambda url, params, timeout: response(
+            self.results[params['title']])
+
+    def tearDown(self):
+        self.patcher.stop()
+
+    def test_check_updates(self):
+        outcomes = self.gating.check_updates([
+            FakeUpdate('bodhi-2.0-1.fc23', 'rpmlint depcheck'),
+            FakeUpdate('kernel-4.2-1.fc23', 'rpmlint'),
+            FakeUpdate('glibc-2.22-1.fc23', 'rpmlint'),
+            FakeUpdate('nethack-3.6-1.fc23', ''),
+        ])
+        eq_(outcomes, {
+            'bodhi-2.0-1.fc23': (True, 'All checks pass.'),
+            'kernel-4.2-1.fc23': (False, 'Required task rpmlint returned FAILED'),
+            'glibc-2.22-1.fc23': (False, 'No result found for required rpmlint'),
+            'nethack-3.6-1.fc23': (True, 'All checks pass.'),
+        })
+        # Updates without requirements don't need their results
+        eq_(self.http.get.call_count, 3)
+
+    def test_cache(self):
+        update = FakeUpdate('bodhi-2.0-1.fc23', 'rpmlint')
+        self.gating.check_updates([update])
+        update.requirements = 'rpmlint depcheck'
+        self.gating.check_updates([update])
+        eq_(self.http.get.call_count, 1)
+
+    def test_absent_results_are_not_cached(self):
+        update = FakeUpdate('glibc-2.22-1.fc23', 'rpmlint')
+        eq_(self.gating.check_updates([update])[update.title][0], False)
+        self.results[update.title] = [result('rpmlint')]
+        eq_(self.gating.check_updates([update])[update.title][0], True)
+        eq_(self.http.get.call_count, 2)
+
+    def test_ttl(self):
+        update = FakeUpdate('bodhi-2.0-1.fc23', 'rpmlint')
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            self.gating.check_updates([update])
+            now.return_value = 1200
+            self.gating.check_updates([update])
+            eq_(self.http.get.call_count, 1)
+
+            self.results[update.title] = [result('rpmlint', 'FAILED')]
+            now.return_value = 1400
+            eq_(self.gating.check_updates([update])[update.title][0], False)
+        eq_(self.http.get.call_count, 2)
+        eq_(len(self.gating.cache), 1)
+
+    def test_outage(self):
+        self.http.get.side_effect = requests.ConnectionError('timed out')
+        update = FakeUpdate('bodhi-2.0-1.fc23', 'rpmlint')
+        outcome, reason = self.gating.check_updates([update])[update.title]
+        eq_(outcome, False)
+        assert reason.startswith('Failed to talk to taskotron: '), reason
+        assert 'timed out' in reason, reason
+
+    def test_partial_outage(self):
+        """ Results are not cached when resultsdb fails between pages """
+        self.http.get.side_effect = [
+            response([result('rpmlint')], next='https://resultsdb.example.com/'
+                     'api/v1.0/results?page=1'),
+            requests.ConnectionError('timed out'),
+        ]
+        update = FakeUpdate('bodhi-2.0-1.fc23', 'rpmlint')
+        eq_(self.gating.check_updates([update])[update.title][0], False)
+        eq_(self.gating.cache, {})
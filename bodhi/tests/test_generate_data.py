@@ -0,0 +1,89 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+
+from nose.tools import eq_
+from sqlalchemy import create_engine
+
+from bodhi.models import (Base, DBSession, Update, Release, Comment,
+                          get_release_stats)
+from bodhi.scripts.generate_data import generate
+
+
+class TestGenerateData(object):
+
+    def generate(self, seed=0):
+        engine = create_engine('sqlite://')
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            counts = generate(connection, seed=seed, releases=2,
+                              packages=50, users=20, updates=200)
+        DBSession.configure(bind=engine)
+        return counts
+
+    def tearDown(self):
+        DBSession.remove()
+
+    def test_deterministic(self):
+        counts = self.generate()
+        titles = [u.title for u in DBSession().query(Update).order_by(
+            Update.id)]
+        DBSession.remove()
+
+        eq_(self.generate(), counts)
+        eq_([u.title for u in DBSession().query(Update).order_by(Update.id)],
+            titles)
+        DBSession.remove()
+
+        assert self.generate(seed=1) != counts
+
+    def test_chunks(self):
+        """ Inserting the updates in small chunks gives the same data """
+        counts = self.generate()
+        comments = [(c.id, c.update_id, c.text) for c in
+                    DBSession().query(Comment).order_by(Comment.id)]
+        DBSession.remove()
+
+        with mock.patch('bodhi.scripts.generate_data.BATCH_SIZE', 7):
+            eq_(self.generate(), counts)
+        eq_([(c.id, c.update_id, c.text) for c in
+             DBSession().query(Comment).order_by(Comment.id)], comments)
+
+    def test_consistent(self):
+        counts = self.generate()
+        db = DBSession()
+        eq_(counts['updates'], 200)
+        eq_(db.query(Comment).count(), counts['comments'])
+
+        update = db.query(Update).get(1)
+        eq_(update.title, u','.join(b.nvr for b in update.builds))
+        eq_(update.karma, sum(c.karma for c in update.comments
+                              if not c.anonymous))
+        assert update.alias.startswith(u'FEDORA-')
+
+        stats = get_release_stats(db)
+        eq_(sorted(stats), sorted(r.name for r in db.query(Release)))
+        eq_(sum(n for release in stats.values() for types in release.values()
+                for n in types.values()), 200)
+
+        # New updates carry on from the generated aliases
+        alias = update.alias
+        year = int(alias.split('-')[1])
+        last = db.query(Update).filter(Update.alias.like(
+            u'FEDORA-%d-%%' % year)).count()
+        with mock.patch('time.localtime', return_value=(year,)):
+            alias = Update.generate_alias(dict(
+                release_id=update.release_id, title=u'wat'), db.connection())
+        eq_(alias, u'FEDORA-%d-%04d' % (year, last + 1))
@@ -0,0 +1,99 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import threading
+
+import mock
+import transaction
+
+from nose.tools import eq_
+
+from bodhi.jobs import JobQueue
+
+
+class TestJobQueue(object):
+
+    def setUp(self):
+        self.jobs = JobQueue()
+        self.calls = []
+        self.done = threading.Event()
+
+    def job(self, *args, **kw):
+        self.calls.append((args, kw))
+        self.done.set()
+
+    def test_after_commit(self):
+        with mock.patch.dict('bodhi.config.config', {'jobs.workers': '0'}):
+            transaction.begin()
+            self.jobs.defer(self.job, 1, 2, a=3)
+            eq_(self.calls, [])
+            transaction.commit()
+        eq_(self.calls, [((1, 2), {'a': 3})])
+
+    def test_abort(self):
+        with mock.patch.dict('bodhi.config.config', {'jobs.workers': '0'}):
+            transaction.begin()
+            self.jobs.defer(self.job)
+            transaction.abort()
+            transaction.begin()
+            transaction.commit()
+        eq_(self.calls, [])
+
+    def test_pool(self):
+        with mock.patch.dict('bodhi.config.config', {'jobs.workers': '2'}):
+            self.jobs.submit(self.job, 'bodhi')
+            assert self.done.wait(5)
+        eq_(self.calls, [(('bodhi',), {})])
+        self.jobs.pool.close()
+
+    def test_failure(self):
+        def fail():
+            raise IOError
+        with mock.patch.dict('bodhi.config.config', {'jobs.workers': '0'}):
+            self.jobs.submit(fail)
+            self.jobs.submit(self.job)
+        eq_(len(self.calls), 1)
+
+    def test_collect(self):
+        def fail():
+            raise IOError
+        eq_(self.jobs.later(self.job, 'now'), None)
+        eq_(self.calls, [(('now',), {})])
+        with mock.patch.dict('bodhi.config.config', {'jobs.workers': '0'}):
+            transaction.begin()
+            with self.jobs.collect():
+                assert self.jobs.collecting
+                with self.jobs.collect():
+                    self.jobs.later(self.job, 1)
+                self.jobs.later(fail)
+                self.jobs.later(self.job, 2)
+            assert not self.jobs.collecting
+            eq_(len(self.calls), 1)
+            transaction.commit()
+        eq_(self.calls[1:], [((1,), {}), ((2,), {})])
+
+    def test_hold(self):
+        with mock.patch.dict('bodhi.config.config', {'jobs.workers': '0'}):
+            transaction.begin()
+            with self.jobs.hold() as dropped:
+                self.jobs.defer(self.job, 1)
+            with self.jobs.hold() as outer:
+                with self.jobs.hold() as inner:
+                    self.jobs.defer(self.job, 2)
+                self.jobs.release(inner)
+            eq_(len(dropped), 1)
+            eq_(len(outer), 1)
+            self.jobs.release(outer)
+            transaction.commit()
+        eq_(self.calls, [((2,), {})])
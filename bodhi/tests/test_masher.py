@@ -27,6 +27,7 @@ from pyramid.paster import bootstrap
 
 from bodhi import buildsys, log
 from bodhi.config import config
+from bodhi.gating import gating
 from bodhi.masher import Masher, MasherThread
 from bodhi.models import (DBSession, Base, Update, User, Release,
                           Build, UpdateRequest, UpdateType,
@@ -41,7 +42,7 @@ mock_exc.side_effect = Exception
 
 
 mock_taskotron_results = {
-    'target': 'bodhi.util.taskotron_results',
+    'target': 'bodhi.resultsdb.ResultsDB.get',
     'return_value': [{
         "outcome": "PASSED",
         "result_data": {},
@@ -50,7 +51,7 @@ mock_taskotron_results = {
 }
 
 mock_failed_taskotron_results = {
-    'target': 'bodhi.util.taskotron_results',
+    'target': 'bodhi.resultsdb.ResultsDB.get',
     'return_value': [{
         "outcome": "FAILED",
         "result_data": {},
@@ -59,7 +60,7 @@ mock_failed_taskotron_results = {
 }
 
 mock_absent_taskotron_results = {
-    'target': 'bodhi.util.taskotron_results',
+    'target': 'bodhi.resultsdb.ResultsDB.get',
     'return_value': [],
 }
 
@@ -131,6 +132,7 @@ class TestMasher(unittest.TestCase):
         engine = create_engine(db_path)
         DBSession.configure(bind=engine)
         Base.metadata.create_all(engine)
+        gating.invalidate()
         self.db_factory = transactional_session_maker
 
         with self.db_factory() as session:
@@ -0,0 +1,130 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import json
+import os
+import shutil
+import tempfile
+
+import mock
+
+from nose.tools import eq_
+
+from bodhi.metrics import Metrics
+
+
+class TestMetrics(object):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.metrics = Metrics()
+        self.metrics.configure({'metrics': 'true',
+                                'metrics.dir': self.directory,
+                                'metrics.buckets': '0.1 1'})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_disabled(self):
+        self.metrics.configure({})
+        self.metrics.inc('bodhi_test_total')
+        self.metrics.observe('bodhi_test_seconds', 1)
+        eq_(self.metrics.render(), '\n')
+        obj = object()
+        assert self.metrics.instrument(obj, 'koji') is obj
+
+    def test_render(self):
+        self.metrics.inc('bodhi_responses_total', route='home', status='2xx')
+        self.metrics.inc('bodhi_responses_total', route='home', status='2xx')
+        self.metrics.set('bodhi_queue_depth', 3, queue='mail')
+        for value in (0.05, 0.5, 5):
+            self.metrics.observe('bodhi_request_seconds', value, route='home')
+        eq_(self.metrics.render().splitlines(), [
+            '# TYPE bodhi_responses_total counter',
+            'bodhi_responses_total{route="home",status="2xx"} 2.0',
+            '# TYPE bodhi_queue_depth gauge',
+            'bodhi_queue_depth{queue="mail"} 3.0',
+            '# TYPE bodhi_request_seconds histogram',
+            'bodhi_request_seconds_bucket{route="home",le="0.1"} 1',
+            'bodhi_request_seconds_bucket{route="home",le="1.0"} 2',
+            'bodhi_request_seconds_bucket{route="home",le="+Inf"} 3',
+            'bodhi_request_seconds_sum{route="home"} 5.55',
+            'bodhi_request_seconds_count{route="home"} 3',
+        ])
+
+    def test_merge_workers(self):
+        self.metrics.inc('bodhi_responses_total', route='home')
+        self.metrics.set('bodhi_queue_depth', 1, queue='mail')
+        self.metrics.observe('bodhi_request_seconds', 0.5)
+        snapshot = self.metrics.snapshot()
+
+        # Pretend that another worker, a worker that exited, and an earlier
+        # worker whose pid was reused by the other one flushed the same
+        # samples
+        for mtime, pid, token in ((2000, 1001, 'a'), (2000, 1002, 'b'),
+                                  (1000, 1001, 'c')):
+            path = self.metrics.path(pid, token)
+            with open(path, 'w') as f:
+                json.dump(dict(snapshot, pid=pid, token=token), f)
+            os.utime(path, (mtime, mtime))
+
+        with mock.patch('bodhi.metrics.pid_alive', lambda pid: pid == 1001):
+            merged = self.metrics.collect()
+        eq_(merged['counters']['bodhi_responses_total']['route="home"'], 4)
+        eq_(merged['gauges']['bodhi_queue_depth']['queue="mail"'], 2)
+        eq_(merged['histograms']['bodhi_request_seconds'][''],
+            {'buckets': [0, 4], 'sum': 2.0, 'count': 4})
+
+    def test_token(self):
+        token = self.metrics.token
+        eq_(self.metrics.token, token)
+        # A forked worker doesn't inherit the token of its parent
+        with mock.patch('os.getpid', return_value=os.getpid() + 1):
+            assert self.metrics.token != token
+
+    def test_flush(self):
+        self.metrics.inc('bodhi_responses_total')
+        self.metrics.maybe_flush()
+        eq_(os.listdir(self.directory), [])
+
+        self.metrics.flush_interval = 0
+        self.metrics.maybe_flush()
+        eq_(os.listdir(self.directory), ['bodhi-%d-%s.json' % (
+            os.getpid(), self.metrics.token)])
+        with open(self.metrics.path()) as f:
+            eq_(json.load(f)['counters'], {'bodhi_responses_total': {'': 1}})
+
+        # Our own file isn't counted twice
+        eq_(self.metrics.collect()['counters']['bodhi_responses_total'][''], 1)
+
+    def test_collector(self):
+        self.metrics.register_collector(lambda: [
+            ('bodhi_cache_hits_total', {'namespace': 'home'}, 5)])
+        eq_(self.metrics.snapshot()['counters'],
+            {'bodhi_cache_hits_total': {'namespace="home"': 5}})
+
+    def test_instrument(self):
+        session = mock.Mock()
+        session.getBuild.return_value = 'build'
+        proxy = self.metrics.instrument(session, 'koji')
+        proxy.multicall = True
+        eq_(proxy.getBuild('bodhi-2.0-1.fc23'), 'build')
+        eq_(session.multicall, True)
+        histogram = self.metrics.histograms['bodhi_external_seconds']
+        eq_(histogram['method="getBuild",service="koji"']['count'], 1)
+
+    def test_in_progress(self):
+        with self.metrics.in_progress('bodhi_queue_depth', queue='fedmsg'):
+            eq_(self.metrics.gauges['bodhi_queue_depth']['queue="fedmsg"'], 1)
+        eq_(self.metrics.gauges['bodhi_queue_depth']['queue="fedmsg"'], 0)
@@ -0,0 +1,124 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+import requests
+
+from nose.tools import eq_, raises
+
+from bodhi.outbound import CircuitOpenError, OutboundClient
+
+
+def response(status_code=200, json=None):
+    resp = mock.Mock(status_code=status_code)
+    if json is None:
+        resp.json.side_effect = ValueError
+    else:
+        resp.json.return_value = json
+    return resp
+
+
+class TestOutboundClient(object):
+
+    def setUp(self):
+        self.client = OutboundClient({
+            'outbound.retries': '2',
+            'outbound.backoff': '1',
+            'outbound.breaker_failures': '5',
+            'outbound.breaker_reset': '30',
+        })
+        self.session = mock.Mock()
+        self.session.request.return_value = response(json={'ok': True})
+        self.client.sessions['pkgdb.example.com'] = self.session
+        self.sleep = mock.patch('time.sleep').start()
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_pools_per_host(self):
+        client = OutboundClient({})
+        eq_(client.session('a.example.com') is client.session('a.example.com'),
+            True)
+        eq_(client.session('a.example.com') is client.session('b.example.com'),
+            False)
+
+    def test_timeout(self):
+        self.client.get('https://pkgdb.example.com/api/', params={'a': 1})
+        self.session.request.assert_called_once_with(
+            'GET', 'https://pkgdb.example.com/api/', params={'a': 1},
+            timeout=10.0)
+
+    def test_retries(self):
+        self.session.request.side_effect = [
+            requests.ConnectionError, response(503), response(json={})]
+        eq_(self.client.get('https://pkgdb.example.com/').status_code, 200)
+        eq_(self.sleep.call_args_list, [mock.call(1.0), mock.call(2.0)])
+
+    @raises(requests.Timeout)
+    def test_retries_exhausted(self):
+        self.session.request.side_effect = requests.Timeout
+        try:
+            self.client.get('https://pkgdb.example.com/')
+        finally:
+            eq_(self.session.request.call_count, 3)
+
+    def test_no_retries_when_not_idempotent(self):
+        self.session.request.return_value = response(502)
+        eq_(self.client.post('https://pkgdb.example.com/').status_code, 502)
+        eq_(self.session.request.call_count, 1)
+        self.client.post('https://pkgdb.example.com/', idempotent=True)
+        eq_(self.session.request.call_count, 4)
+
+    def test_circuit_breaker(self):
+        self.client._settings['outbound.breaker_failures'] = '3'
+        self.session.request.side_effect = requests.ConnectionError
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            try:
+                self.client.get('https://pkgdb.example.com/')
+            except requests.ConnectionError:
+                pass
+            eq_(self.session.request.call_count, 3)
+
+            # Calls fail straight away while the circuit is open
+            try:
+                self.client.get('https://pkgdb.example.com/', idempotent=False)
+                assert False, 'The circuit should be open'
+            except CircuitOpenError as e:
+                assert isinstance(e, IOError)
+            eq_(self.session.request.call_count, 3)
+
+            # Then one call is let through to see whether the host is back
+            now.return_value = 1031
+            self.session.request.side_effect = None
+            self.client.get('https://pkgdb.example.com/')
+            eq_(self.session.request.call_count, 4)
+            eq_(self.client.circuit('pkgdb.example.com').opened, None)
+
+    def test_json(self):
+        eq_(self.client.json('GET', 'https://pkgdb.example.com/'),
+            {'ok': True})
+        self.session.request.return_value = response(404, {'error': 'gone'})
+        eq_(self.client.json('GET', 'https://pkgdb.example.com/'),
+            {'error': 'gone'})
+
+    @raises(IOError)
+    def test_json_server_error(self):
+        self.session.request.return_value = response(500, {'error': 'oops'})
+        self.client.json('GET', 'https://pkgdb.example.com/')
+
+    @raises(IOError)
+    def test_json_invalid(self):
+        self.session.request.return_value = response(200)
+        self.client.json('GET', 'https://pkgdb.example.com/')
@@ -0,0 +1,106 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+import requests
+
+from nose.tools import eq_, raises
+
+from bodhi.resultsdb import ResultsDB, get_resultsdb
+
+URL = 'https://resultsdb.example.com/api/v1.0/'
+
+
+def response(data, next=None, status_code=200):
+    resp = mock.Mock(status_code=status_code)
+    resp.json.return_value = {'data': data, 'next': next}
+    return resp
+
+
+class TestResultsDB(object):
+
+    def setUp(self):
+        self.resultsdb = ResultsDB({
+            'resultsdb_api_url': 'https://resultsdb.example.com/',
+            'resultsdb.testcases_ttl': '100',
+        })
+        self.resultsdb.http = mock.Mock()
+        self.get = self.resultsdb.http.get
+        self.get.side_effect = lambda url, **kw: response(
+            [{'name': 'depcheck'}, {'name': 'upgradepath'}])
+
+    def test_pagination(self):
+        self.get.side_effect = [
+            response([{'name': 'depcheck'}], next=URL + 'testcases?page=1'),
+            response([{'name': 'rpmlint'}]),
+        ]
+        eq_([testcase['name'] for testcase
+             in self.resultsdb.get('testcases', limit=1)],
+            ['depcheck', 'rpmlint'])
+        eq_(self.get.call_args_list, [
+            mock.call(URL + 'testcases', params={'limit': 1}, timeout=10.0),
+            mock.call(URL + 'testcases?page=1', params=None, timeout=10.0),
+        ])
+
+    @raises(IOError)
+    def test_bad_status(self):
+        self.get.side_effect = None
+        self.get.return_value = response([], status_code=500)
+        list(self.resultsdb.get('results'))
+
+    @raises(IOError)
+    def test_connection_error(self):
+        self.get.side_effect = requests.ConnectionError
+        list(self.resultsdb.get('results'))
+
+    def test_testcases(self):
+        eq_(self.resultsdb.testcases(),
+            frozenset(['depcheck', 'upgradepath']))
+        self.resultsdb.testcases()
+        eq_(self.get.call_count, 1)
+
+    def test_ttl(self):
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            self.resultsdb.testcases()
+            self.get.side_effect = lambda url, **kw: response(
+                [{'name': 'rpmlint'}])
+            now.return_value = 1200
+            with mock.patch('threading.Thread') as thread:
+                # The stale catalogue is used while the new one is fetched
+                eq_(self.resultsdb.testcases(),
+                    frozenset(['depcheck', 'upgradepath']))
+                self.resultsdb.testcases()
+            eq_(thread.call_count, 1)
+            thread.call_args[1]['target']()
+            eq_(self.resultsdb.testcases(), frozenset(['rpmlint']))
+        eq_(self.resultsdb.refreshing, False)
+
+    def test_outage(self):
+        self.resultsdb.testcases()
+        self.get.side_effect = requests.ConnectionError
+        with mock.patch('threading.Thread') as thread:
+            self.resultsdb.refresh_testcases_in_background()
+        thread.call_args[1]['target']()
+        eq_(self.resultsdb.testcases(),
+            frozenset(['depcheck', 'upgradepath']))
+
+    @raises(IOError)
+    def test_never_fetched(self):
+        self.get.side_effect = requests.ConnectionError
+        self.resultsdb.testcases()
+
+    def test_shared_clients(self):
+        settings = {'resultsdb_api_url': 'https://resultsdb.example.org'}
+        eq_(get_resultsdb(settings) is get_resultsdb(dict(settings)), True)
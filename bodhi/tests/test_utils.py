@@ -12,9 +12,11 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+import mock
+
 from bodhi.models import Update
 from bodhi.util import (get_db_from_config, get_critpath_pkgs, markup,
-                        get_rpm_header, cmd)
+                        markup_cache, get_rpm_header, cmd)
 from bodhi.config import config
 
 
@@ -40,6 +42,25 @@ class TestUtils(object):
         html = markup(None, text)
         assert html == '<p>--RAW HTML NOT ALLOWED--bold--RAW HTML NOT ALLOWED--</p>', html
 
+    def test_markup_cache(self):
+        """Ensure the same text is only rendered once"""
+        with mock.patch('markdown.markdown', side_effect=lambda text, **kw:
+                        '<p>%s</p>' % text) as render:
+            assert markup(None, u'cached') == '<p>cached</p>'
+            assert markup(None, u'cached') == '<p>cached</p>'
+            assert markup(None, u'c\xe4ched') == u'<p>c\xe4ched</p>'
+            assert render.call_count == 2, render.call_count
+
+    def test_markup_cache_eviction(self):
+        """Ensure the least recently rendered text is evicted at the limit"""
+        with mock.patch.object(markup_cache.backend, 'max_size', 2), \
+                mock.patch('markdown.markdown', side_effect=lambda text, **kw:
+                           '<p>%s</p>' % text) as render:
+            for text in (u'first', u'second', u'third', u'third', u'first'):
+                markup(None, text)
+            assert len(markup_cache.backend._cache) == 2
+            assert render.call_count == 4, render.call_count
+
     def test_rpm_header(self):
         h = get_rpm_header('')
         assert h['name'] == 'libseccomp', h
@@ -0,0 +1,87 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+import mock
+
+from nose.tools import eq_
+
+from bodhi.wiki import WikiCrawler
+
+
+class FakeWiki(object):
+    """ Answers categorymembers queries two members at a time """
+
+    def __init__(self, categories):
+        self.categories = categories
+        self.queries = []
+
+    def json(self, method, url, data, idempotent):
+        self.queries.append(dict(data))
+        members = self.categories.get(data['cmtitle'], [])
+        start = int(data.get('cmcontinue') or 0)
+        response = {'query': {'categorymembers': [
+            {'title': title} for title in members[start:start + 2]]}}
+        if start + 2 < len(members):
+            response['continue'] = {'cmcontinue': str(start + 2),
+                                    'continue': '-||'}
+        return response
+
+
+class TestWikiCrawler(object):
+
+    def setUp(self):
+        self.wiki = FakeWiki({
+            'Category:Package kernel test cases': [
+                'QA:Boot', 'Category:Kernel', 'QA:Suspend', 'QA:Hibernate',
+                'Category:Graphics'],
+            'Category:Kernel': ['QA:Boot', 'QA:Modules', 'Category:Graphics'],
+            'Category:Graphics': ['QA:Modesetting', 'Category:Kernel'],
+        })
+        patcher = mock.patch('bodhi.wiki.outbound', self.wiki)
+        patcher.start()
+        self.crawler = WikiCrawler({'wiki_url': 'https://wiki.example.com'})
+
+    def tearDown(self):
+        mock.patch.stopall()
+
+    def test_continuation(self):
+        eq_(self.crawler.members('Category:Package kernel test cases'), [
+            'QA:Boot', 'Category:Kernel', 'QA:Suspend', 'QA:Hibernate',
+            'Category:Graphics'])
+        eq_(len(self.wiki.queries), 3)
+        eq_(self.wiki.queries[0]['cmlimit'], 'max')
+        eq_(self.wiki.queries[2]['cmcontinue'], '4')
+
+    def test_test_cases(self):
+        eq_(self.crawler.test_cases('kernel'), [
+            'QA:Boot', 'QA:Suspend', 'QA:Hibernate', 'QA:Modules',
+            'QA:Modesetting'])
+        # Each category is only fetched once, even though they refer to each
+        # other
+        eq_(len(self.wiki.queries), 6)
+
+    def test_depth(self):
+        eq_(self.crawler.test_cases('kernel', depth=0),
+            ['QA:Boot', 'QA:Suspend', 'QA:Hibernate'])
+
+    def test_cache(self):
+        with mock.patch('time.time') as now:
+            now.return_value = 1000
+            self.crawler.test_cases('kernel')
+            now.return_value = 4000
+            self.crawler.test_cases('kernel')
+            eq_(len(self.wiki.queries), 6)
+            now.return_value = 5000
+            self.crawler.test_cases('kernel')
+            eq_(len(self.wiki.queries), 12)
@@ -24,13 +24,10 @@ import urllib
 import shutil
 import tempfile
 import markdown
-import requests
 import subprocess
 import libravatar
 import hashlib
-import collections
 import pkg_resources
-import functools
 
 
 from os.path import isdir, join, dirname, basename, isfile
@@ -42,8 +39,11 @@ from pyramid.i18n import TranslationStringFactory
 from pyramid.settings import asbool
 
 from . import log, buildsys
+from .cache import make_cacheregion
 from .exceptions import RepodataException
 from .config import config
+from .critpath import critpath
+from .resultsdb import get_resultsdb
 
 try:
     import rpm
@@ -137,38 +137,6 @@ def link(href, text):
     return '<a href="%s">%s</a>' % (href, text)
 
 
-class memoized(object):
-    '''Decorator. Caches a function's return value each time it is called.  If
-    called later with the same arguments, the cached value is returned (not
-    reevaluated).
-
-    http://wiki.python.org/moin/PythonDecoratorLibrary#Memoize
-    '''
-    def __init__(self, func):
-        self.func = func
-        self.cache = {}
-
-    def __call__(self, *args):
-        if not isinstance(args, collections.Hashable):
-            # uncacheable. a list, for instance.
-            # better to not cache than blow up.
-            return self.func(*args)
-        if args in self.cache:
-            return self.cache[args]
-        else:
-            value = self.func(*args)
-            self.cache[args] = value
-            return value
-
-    def __repr__(self):
-        '''Return the function's docstring.'''
-        return self.func.__doc__
-
-    def __get__(self, obj, objtype):
-        '''Support instance methods.'''
-        return functools.partial(self.__call__, obj)
-
-
 def get_db_from_config(dev=False):
     from .models import DBSession, Base
     if dev:
@@ -182,20 +150,9 @@ def get_db_from_config(dev=False):
     return DBSession()
 
 
-@memoized
 def get_critpath_pkgs(collection='master'):
-    """Return a list of critical path packages for a given collection"""
-    critpath_pkgs = []
-    critpath_type = config.get('critpath.type')
-    if critpath_type == 'pkgdb':
-        from pkgdb2client import PkgDB
-        pkgdb = PkgDB(config.get('pkgdb_url'))
-        results = pkgdb.get_critpath_packages(branches=collection)
-        if collection in results['pkgs']:
-            critpath_pkgs = results['pkgs'][collection]
-    else:
-        critpath_pkgs = config.get('critpath_pkgs', '').split()
-    return critpath_pkgs
+    """Return a frozenset of critical path packages for a given collection"""
+    return critpath.get(collection)
 
 
 class Singleton(object):
@@ -252,7 +209,7 @@ def avatar(context, username, size):
     request = context['request']
     https = request.registry.settings.get('prefer_ssl'),
 
-    @request.cache.cache_on_arguments()
+    @request.cache.cache_on_arguments(namespace='avatar')
     def work(username, size):
         openid = "http://%s.id.fedoraproject.org/" % username
         if asbool(config.get('libravatar_enabled', True)):
@@ -282,11 +239,37 @@ def hostname(context):
     return socket.gethostname()
 
 
+# The HTML of the comments and notes only depends on their text, so it is
+# kept in a bounded LRU of this process, by a hash of the text, rather than
+# in the request cache
+MARKUP_CACHE_SIZE = 10000
+markup_cache = make_cacheregion({
+    'dogpile.cache.backend': 'bodhi.lru',
+    'dogpile.cache.arguments.max_size': MARKUP_CACHE_SIZE,
+})
+
+
+def content_key_generator(namespace, fn, **kw):
+    """ Key the cached values by a hash of the text they are made from """
+    return lambda text: '%s|%s' % (
+        namespace, hashlib.sha1(text.encode('utf-8')).hexdigest())
+
+
 def markup(context, text):
+    """ Render some markdown text as HTML, caching the result """
+    return cached_markdown(text)
+
+
+def render_markdown(text):
     return markdown.markdown(text, safe_mode="replace",
                              html_replacement_text="--RAW HTML NOT ALLOWED--")
 
 
+cached_markdown = markup_cache.cache_on_arguments(
+    namespace='markup', function_key_generator=content_key_generator)(
+        render_markdown)
+
+
 def status2html(context, status):
     status = unicode(status)
     cls = {
@@ -533,20 +516,8 @@ def tokenize(string):
 
 def taskotron_results(settings, entity='results', **kwargs):
     """ Given an update object, yield resultsdb results. """
-    url = settings['resultsdb_api_url'] + "/api/v1.0/" + entity
-    if kwargs:
-        url = url + "?" + urllib.urlencode(kwargs)
-    data = True
-
     try:
-        while data:
-            log.debug("Grabbing %r" % url)
-            response = requests.get(url)
-            if response.status_code != 200:
-                raise IOError("status code was %r" % response.status_code)
-            json = response.json()
-            url, data = json['next'], json['data']
-            for datum in data:
-                yield datum
-    except Exception:
-        log.exception("Problem talking to %r" % url)
+        for datum in get_resultsdb(settings).get(entity, **kwargs):
+            yield datum
+    except IOError:
+        log.exception("Problem talking to resultsdb")
@@ -12,6 +12,7 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from sqlalchemy.sql import or_
@@ -26,7 +27,9 @@ from .models import (Release, Package, Build, Update, UpdateStatus,
                      UpdateRequest, UpdateSeverity, UpdateType,
                      UpdateSuggestion, User, Group, Comment,
                      Bug, TestCase, ReleaseState, Stack)
-from .util import get_nvr, tokenize, taskotron_results
+from .buildsys import list_tags
+from .resultsdb import get_resultsdb
+from .util import get_nvr, tokenize
 
 try:
     import rpm
@@ -86,9 +89,20 @@ def validate_builds(request):
             return
 
 
+def prefetch_build_tags(request, builds):
+    """
+    Ask koji about the tags of all the builds that aren't in the
+    request.buildinfo yet, in a single multicall.
+    """
+    missing = [build for build in builds
+               if 'tags' not in request.buildinfo[build]]
+    for build, tags in zip(missing, list_tags(request.koji, missing)):
+        request.buildinfo[build]['tags'] = tags
+
+
 def validate_build_tags(request):
     """ Ensure that all of the builds are tagged as candidates """
-    tag_types, tag_rels = Release.get_tags()
+    tag_types, tag_rels = Release.get_tags(request.db)
     edited = request.validated.get('edited')
     release = None
     if edited:
@@ -99,11 +113,11 @@ def validate_build_tags(request):
                          .release
     else:
         valid_tags = tag_types['candidate']
-    for build in request.validated.get('builds', []):
+    builds = request.validated.get('builds', [])
+    prefetch_build_tags(request, builds)
+    for build in builds:
         valid = False
-        tags = request.buildinfo[build]['tags'] = [
-            tag['name'] for tag in request.koji.listTags(build)
-        ]
+        tags = request.buildinfo[build]['tags']
 
         # Disallow adding builds for a different release
         if edited:
@@ -125,7 +139,7 @@ def validate_build_tags(request):
 
 def validate_tags(request):
     """Ensure that all the tags are valid Koji tags"""
-    tag_types, tag_rels = Release.get_tags()
+    tag_types, tag_rels = Release.get_tags(request.db)
 
     for tag_type in tag_types:
         tag_name = request.validated.get("%s_tag" % tag_type)
@@ -141,6 +155,25 @@ def validate_tags(request):
             request.errors.add('body', "%s_tag" % tag_type,
                                'Invalid tag: %s' % tag_name)
 
+def prefetch_acls(request):
+    """
+    Look up the ACLs of every build's package at once, so that pkgdb is only
+    asked about the packages missing from our ACL cache, concurrently.
+    Returns a dict of {branch: {package: acls}}.
+    """
+    packages = defaultdict(set)
+    for build in request.validated.get('builds', []):
+        buildinfo = request.buildinfo[build]
+        try:
+            release = Release.from_tags(buildinfo['tags'], request.db)
+        except KeyError:
+            continue
+        if release:
+            packages[release.branch].add(buildinfo['nvr'][0])
+    return dict((branch, request.registry.acls.get_many(list(names), branch))
+                for branch, names in packages.items())
+
+
 def validate_acls(request):
     """Ensure this user has commit privs to these builds or is an admin"""
     db = request.db
@@ -150,6 +183,16 @@ def validate_acls(request):
     watchers = []
     groups = []
     notify_groups = []
+    acl_system = settings.get('acl_system')
+
+    if acl_system == 'pkgdb':
+        try:
+            acls = prefetch_acls(request)
+        except Exception, e:
+            log.exception(e)
+            request.errors.add('body', 'builds', "Unable to access the Package "
+                               "Database. Please try again later.")
+            return
 
     for build in request.validated.get('builds', []):
         buildinfo = request.buildinfo[build]
@@ -178,17 +221,10 @@ def validate_acls(request):
             request.errors.add('body', 'builds', msg)
             return
 
-        acl_system = settings.get('acl_system')
         if acl_system == 'pkgdb':
-            try:
-                people, groups = package.get_pkg_pushers(release.branch, settings)
-                committers, watchers = people
-                groups, notify_groups = groups
-            except Exception, e:
-                log.exception(e)
-                request.errors.add('body', 'builds', "Unable to access the Package "
-                                   "Database. Please try again later.")
-                return
+            people, groups = acls[release.branch][package_name]
+            committers, watchers = people
+            groups, notify_groups = groups
         elif acl_system == 'dummy':
             people = (['ralph', 'guest'], ['guest'])
             groups = (['ralph', 'guest'], ['guest'])
@@ -279,23 +315,33 @@ def validate_enums(request):
         request.validated[param] = enum.from_string(value)
 
 
+def _get_many(db, cls, values, *columns):
+    """
+    Look up all the values with one query, matching any of the given columns.
+
+    Returns the objects found in the order of the values, and the values that
+    didn't match anything.
+    """
+    found = {}
+    if values:
+        query = db.query(cls).filter(or_(
+            *[column.in_(values) for column in columns]))
+        for obj in query:
+            for column in columns:
+                found.setdefault(getattr(obj, column.key), obj)
+    validated = [found[value] for value in values if value in found]
+    bad = [value for value in values if value not in found]
+    return validated, bad
+
+
 def validate_packages(request):
     """Make sure those packages exist"""
     packages = request.validated.get("packages")
     if packages is None:
         return
 
-    db = request.db
-    bad_packages = []
-    validated_packages = []
-
-    for p in packages:
-        package = Package.get(p, db)
-
-        if not package:
-            bad_packages.append(p)
-        else:
-            validated_packages.append(package)
+    validated_packages, bad_packages = _get_many(
+        request.db, Package, packages, Package.name)
 
     if bad_packages:
         request.errors.add('querystring', 'packages',
@@ -311,20 +357,8 @@ def validate_updates(request):
     if updates is None:
         return
 
-    db = request.db
-    bad_updates = []
-    validated_updates = []
-
-    for u in updates:
-        update = db.query(Update).filter(or_(
-            Update.title==u,
-            Update.alias==u,
-        )).first()
-
-        if not update:
-            bad_updates.append(u)
-        else:
-            validated_updates.append(update)
+    validated_updates, bad_updates = _get_many(
+        request.db, Update, updates, Update.title, Update.alias)
 
     if bad_updates:
         request.errors.add('querystring', 'updates',
@@ -340,17 +374,8 @@ def validate_groups(request):
     if groups is None:
         return
 
-    db = request.db
-    bad_groups = []
-    validated_groups = []
-
-    for g in groups:
-        group = db.query(Group).filter(Group.name==g).first()
-
-        if not group:
-            bad_groups.append(g)
-        else:
-            validated_groups.append(group)
+    validated_groups, bad_groups = _get_many(
+        request.db, Group, groups, Group.name)
 
     if bad_groups:
         request.errors.add('querystring', 'groups',
@@ -381,19 +406,8 @@ def validate_releases(request):
     if releases is None:
         return
 
-    db = request.db
-    bad_releases = []
-    validated_releases = []
-
-    for r in releases:
-        release = db.query(Release).filter(or_(Release.name == r,
-                                               Release.version == r)).first()
-
-        if not release:
-            bad_releases.append(r)
-
-        else:
-            validated_releases.append(release)
+    validated_releases, bad_releases = _get_many(
+        request.db, Release, releases, Release.name, Release.version)
 
     if bad_releases:
         request.errors.add('querystring', 'releases',
@@ -423,7 +437,7 @@ def validate_username(request):
 def validate_update(request):
     """Make sure this update exists"""
     idx = request.validated.get('update')
-    update = Update.get(idx, request.db)
+    update = Update.get_for_request(idx, request)
 
     if update:
         request.validated['update'] = update
@@ -451,7 +465,7 @@ def validate_update_owner(request):
 
 def validate_update_id(request):
     """Ensure that a given update id exists"""
-    update = Update.get(request.matchdict['id'], request.db)
+    update = Update.get_for_request(request.matchdict['id'], request)
     if update:
         request.validated['update'] = update
     else:
@@ -467,9 +481,9 @@ def _conditionally_get_update(request):
     # not, then request.validated['update'] will be a unicode object.
     # So.. we have to handle either situation.  It is, however, not our
     # responsibility to put the update object back in the request.validated
-    # dict.  Note, for speed purposes, sqlalchemy should cache this for us.
+    # dict.  The update is only queried once per request, though.
     if not isinstance(update, Update) and not update is None:
-        update = Update.get(update, request.db)
+        update = Update.get_for_request(update, request)
 
     return update
 
@@ -525,9 +539,9 @@ def validate_testcase_feedback(request):
     # not, then request.validated['update'] will be a unicode object.
     # So.. we have to handle either situation.  It is, however, not our
     # responsibility to put the update object back in the request.validated
-    # dict.  Note, for speed purposes, sqlalchemy should cache this for us.
+    # dict.  The update is only queried once per request, though.
     if not isinstance(update, Update):
-        update = Update.get(update, request.db)
+        update = Update.get_for_request(update, request)
         if not update:
             request.errors.add('url', 'id', 'Invalid update')
             request.errors.status = HTTPNotFound.code
@@ -568,7 +582,7 @@ def validate_comment_id(request):
         request.errors.status = HTTPBadRequest.code
         return
 
-    comment = Comment.get(request.matchdict['id'], request.db)
+    comment = Comment.get_for_request(request.matchdict['id'], request)
 
     if comment:
         request.validated['comment'] = comment
@@ -581,14 +595,14 @@ def validate_override_build(request):
     """ Ensure that the build is properly tagged """
     nvr = request.validated['nvr']
 
-    build = Build.get(nvr, request.db)
+    build = Build.get_for_request(nvr, request)
 
     if build is not None:
 
         if not build.release:
             # Oddly, the build has no associated release.  Let's try to figure
             # that out and apply it.
-            tag_types, tag_rels = Release.get_tags()
+            tag_types, tag_rels = Release.get_tags(request.db)
             valid_tags = tag_types['candidate'] + tag_types['testing']
 
             tags = [tag['name'] for tag in request.koji.listTags(nvr)
@@ -616,7 +630,7 @@ def validate_override_build(request):
             return
 
     else:
-        tag_types, tag_rels = Release.get_tags()
+        tag_types, tag_rels = Release.get_tags(request.db)
         valid_tags = tag_types['candidate'] + tag_types['testing']
 
         tags = [tag['name'] for tag in request.koji.listTags(nvr)
@@ -704,9 +718,8 @@ def validate_stack(request):
 
 
 def _get_valid_requirements(request):
-    """ Returns a list of valid testcases from taskotron. """
-    for testcase in taskotron_results(request.registry.settings, 'testcases'):
-        yield testcase['name']
+    """ Returns the cached set of valid testcases from taskotron. """
+    return get_resultsdb(request.registry.settings).testcases()
 
 
 def validate_requirements(request):
@@ -717,13 +730,21 @@ def validate_requirements(request):
         return
 
     requirements =  tokenize(requirements)
-    valid_requirements = _get_valid_requirements(request)
+    try:
+        valid_requirements = _get_valid_requirements(request)
+    except IOError:
+        log.exception('Unable to fetch the testcases')
+        request.errors.add('querystring', 'requirements',
+                           'Unable to check the requirements against '
+                           'taskotron.  Please try again later.')
+        request.errors.status = HTTPBadRequest.code
+        return
 
     for requirement in requirements:
         if requirement not in valid_requirements:
             request.errors.add(
                 'querystring', 'requirements',
                 'Invalid requirement specified: %s.  Must be one of %s' % (
-                    requirement, ", ".join(valid_requirements)))
+                    requirement, ", ".join(sorted(valid_requirements))))
             request.errors.status = HTTPBadRequest.code
             return
@@ -13,18 +13,60 @@
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
 from pyramid.security import effective_principals
+from pyramid.httpexceptions import HTTPNotFound
+from pyramid.response import Response
 from cornice import Service
 
 from bodhi import log
+from bodhi.metrics import metrics
 from bodhi.security import admin_only_acl
 
 admin_service = Service(name='admin', path='/admin/',
                         description='Administrator view',
                         acl=admin_only_acl)
 
+metrics_service = Service(name='admin_metrics', path='/admin/metrics',
+                          description='Runtime metrics for Prometheus',
+                          acl=admin_only_acl)
+
+sql_service = Service(name='admin_sql', path='/admin/sql',
+                      description='SQL query profiling statistics',
+                      acl=admin_only_acl)
+
 @admin_service.get(permission='admin')
 def admin(request):
     user = request.user
     log.info('%s logged into admin panel' % user.name)
     principals = effective_principals(request)
     return {'user': user.name, 'principals': principals}
+
+
+def get_sql_profiler(request):
+    profiler = getattr(request.registry, 'sql_profiler', None)
+    if profiler is None:
+        raise HTTPNotFound('SQL profiling is disabled')
+    return profiler
+
+
+@sql_service.get(permission='admin')
+def sql_stats(request):
+    """ Return the aggregate query stats collected when profiling.sql is on """
+    return get_sql_profiler(request).stats()
+
+
+@sql_service.delete(permission='admin')
+def reset_sql_stats(request):
+    """ Return the aggregate query stats, and start collecting afresh """
+    profiler = get_sql_profiler(request)
+    stats = profiler.stats()
+    profiler.reset()
+    return stats
+
+
+@metrics_service.get(permission='admin')
+def runtime_metrics(request):
+    """ Return the metrics of every worker in the Prometheus text format """
+    if not metrics.enabled:
+        raise HTTPNotFound('Metrics are disabled')
+    return Response(metrics.render(), charset='utf-8',
+                    content_type='text/plain; version=0.0.4')
@@ -21,7 +21,7 @@ from pyramid.exceptions import HTTPNotFound, HTTPForbidden
 
 from bodhi import log
 import bodhi.models
-from bodhi.util import markup
+from bodhi.util import render_markdown
 
 
 @notfound_view_config(append_slash=True)
@@ -79,7 +79,7 @@ def home(request):
     """ Returns data for the frontpage """
     r = request
 
-    @request.cache.cache_on_arguments()
+    @request.cache.cache_on_arguments(namespace='home')
     def work():
         top_testers = get_top_testers(request)
         critpath_updates = get_latest_updates(request, True, False)
@@ -117,7 +117,7 @@ def latest_candidates(request):
     koji = request.koji
     db = request.db
 
-    @request.cache.cache_on_arguments()
+    @request.cache.cache_on_arguments(namespace='latest_candidates')
     def work(pkg):
         result = []
         koji.multicall = True
@@ -160,10 +160,11 @@ def latest_candidates(request):
 def markdowner(request):
     """ Given some text, return the markdownified html version.
 
-    We use this for "previews" of comments and update notes.
+    We use this for "previews" of comments and update notes.  Those change
+    with every keystroke, so they are rendered without going through the cache.
     """
     text = request.params.get('text')
-    return dict(html=markup(request.context, text))
+    return dict(html=render_markdown(text))
 
 
 @view_config(route_name='new_override', renderer='override.html')
@@ -21,7 +21,6 @@ import bodhi.models as m
 
 @view_config(route_name='metrics', renderer='metrics.html')
 def metrics(request):
-    db = request.db
     data, ticks = [], []
 
     update_types = {
@@ -31,21 +30,18 @@ def metrics(request):
         'newpackage': 'New packages'
     }
 
-    releases = db.query(m.Release).filter(m.Release.name.like(u'F%')).all()
+    stats = m.get_release_stats(request.db, status=m.UpdateStatus.stable,
+                                names=u'F%')
+    # The releases come ordered by their version
+    releases = list(stats)
 
-    for i, release in enumerate(sorted(releases, cmp=lambda x, y:
-            cmp(int(x.version_int), int(y.version_int)))):
-        ticks.append([i, release.name])
+    for i, release in enumerate(releases):
+        ticks.append([i, release])
 
     for update_type, label in update_types.items():
         d = []
-        type = m.UpdateType.from_string(update_type)
         for i, release in enumerate(releases):
-            num = db.query(m.Update).filter_by(
-                release=release,
-                type=type,
-                status=m.UpdateStatus.stable
-            ).count()
+            num = stats[release].get('stable', {}).get(update_type, 0)
             d.append([i, num])
         data.append(dict(data=d, label=label))
 
@@ -12,6 +12,13 @@
 # along with this program; if not, write to the Free Software
 # Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 
+import threading
+import time
+
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import islice
+
 from pyramid.view import view_config
 
 from bodhi import log, buildsys
@@ -24,10 +31,95 @@ def get_all_packages():
     return [pkg['package_name'] for pkg in koji.listPackages()]
 
 
+class PackageIndex(object):
+    """
+    An in-memory index of every package name in Koji.
+
+    Names are kept in a sorted list, so prefix matches are a bisection away,
+    along with a trigram index used to narrow down substring matches.  Once
+    the index is older than `ttl` seconds it is rebuilt in a background
+    thread while the old one keeps answering queries.
+    """
+
+    def __init__(self, ttl=3600):
+        self.ttl = ttl
+        self.updated = None
+        self._index = ([], {})
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def build(self, names):
+        names = sorted(set(names))
+        trigrams = defaultdict(list)  # trigram -> ascending name positions
+        for i, name in enumerate(names):
+            for gram in set(name[j:j + 3] for j in range(len(name) - 2)):
+                trigrams[gram].append(i)
+        self._index = (names, dict(trigrams))
+        self.updated = time.time()
+        log.debug('Indexed %d packages' % len(names))
+
+    def refresh(self):
+        try:
+            self.build(get_all_packages())
+        finally:
+            self._refreshing = False
+
+    def ensure_fresh(self):
+        if self.updated is None:
+            with self._lock:
+                if self.updated is None:
+                    self._refreshing = True
+                    self.refresh()
+        elif time.time() - self.updated > self.ttl:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            thread = threading.Thread(target=self.refresh)
+            thread.daemon = True
+            thread.start()
+
+    def search(self, term, limit=20):
+        """ Return names starting with `term`, then names containing it """
+        names, trigrams = self._index
+        start = bisect_left(names, term)
+        results = []
+        for name in islice(names, start, None):
+            if len(results) >= limit or not name.startswith(term):
+                break
+            results.append(name)
+        if len(results) >= limit:
+            return results
+
+        if len(term) >= 3:
+            postings = sorted((trigrams.get(term[j:j + 3], ())
+                               for j in range(len(term) - 2)), key=len)
+            candidates = set(postings[0]).intersection(*postings[1:])
+            candidates = sorted(candidates)
+        else:
+            candidates = xrange(len(names))
+        for i in candidates:
+            name = names[i]
+            if term in name and not name.startswith(term):
+                results.append(name)
+                if len(results) >= limit:
+                    break
+        return results
+
+package_index = PackageIndex()
+
+
 @view_config(route_name='search_packages', renderer='json',
              request_method='GET')
 def search_packages(request):
     """ Called by the NewUpdateForm.builds AutocompleteWidget """
-    packages = get_all_packages()
-    return [{'id': p, 'label': p, 'value': p} for p in packages
-            if request.GET['term'] in p]
+    settings = request.registry.settings
+    package_index.ttl = int(settings.get('search_packages_ttl', 3600))
+    package_index.ensure_fresh()
+    max_limit = int(settings.get('search_packages_limit', 20))
+    try:
+        limit = min(int(request.GET.get('limit', max_limit)), max_limit)
+    except ValueError:
+        limit = max_limit
+    packages = package_index.search(request.GET['term'], limit)
+    return [{'id': p, 'label': p, 'value': p} for p in packages]
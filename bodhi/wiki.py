@@ -0,0 +1,110 @@
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+The test cases of each package, as listed on the wiki.
+
+The test cases of a package are the pages of its "Category:Package <name> test
+cases", and of its subcategories up to 10 levels down.  The members of each
+category are fetched as many at a time as the wiki allows, and cached for
+``wiki.cache_ttl`` seconds since packages share many subcategories.
+
+The ``bodhi-sync-test-cases`` script stores them in the database for every
+package whose test cases are older than ``wiki.sync_interval`` seconds, so
+that submitting an update never has to wait on the wiki::
+
+    query_wiki_test_cases = True
+    wiki_url = https://fedoraproject.org/w/api.php
+    wiki.cache_ttl = 3600
+    wiki.sync_interval = 86400
+"""
+
+import threading
+import time
+
+from bodhi.config import config
+from bodhi.metrics import metrics
+from bodhi.outbound import outbound
+
+
+class WikiCrawler(object):
+    """ Walks the test case categories of the wiki, caching what it sees """
+
+    def __init__(self, settings=None):
+        self._settings = settings
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    @property
+    def settings(self):
+        return config if self._settings is None else self._settings
+
+    @property
+    def url(self):
+        return self.settings.get('wiki_url',
+                                 'https://fedoraproject.org/w/api.php')
+
+    @property
+    def ttl(self):
+        return int(self.settings.get('wiki.cache_ttl', 3600))
+
+    def members(self, category):
+        """ Return the titles of all the pages and subcategories of a category """
+        entry = self.cache.get(category)
+        if entry is not None and time.time() - entry[0] <= self.ttl:
+            return entry[1]
+
+        members = []
+        query = {'action': 'query', 'list': 'categorymembers',
+                 'cmtitle': category, 'cmlimit': 'max', 'format': 'json',
+                 'continue': ''}
+        while True:
+            with metrics.timer('bodhi_external_seconds', service='wiki',
+                               method='categorymembers'):
+                response = outbound.json('POST', self.url, data=query,
+                                         idempotent=True)
+            members.extend(entry['title'] for entry in
+                           response.get('query', {}).get('categorymembers', [])
+                           if 'title' in entry)
+            if 'continue' not in response:
+                break
+            query.update(response['continue'])
+
+        with self.lock:
+            self.cache[category] = (time.time(), members)
+        return members
+
+    def test_cases(self, package, depth=10):
+        """ Return the names of a package's test cases """
+        test_cases = []
+        seen = set()
+        categories = [('Category:Package %s test cases' % package, depth)]
+        while categories:
+            category, depth = categories.pop(0)
+            for title in self.members(category):
+                if title.startswith('Category:'):
+                    if depth > 0 and title not in seen:
+                        seen.add(title)
+                        categories.append((title, depth - 1))
+                elif title not in test_cases:
+                    test_cases.append(title)
+        return test_cases
+
+    def invalidate(self):
+        with self.lock:
+            self.cache.clear()
+
+
+# The category trees seen by this process
+wiki = WikiCrawler()
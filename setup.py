@@ -56,7 +56,6 @@ requires = [
 
     # External resources
     'python-bugzilla',
-    'simplemediawiki',
     'fedmsg',
 
     'Sphinx',
@@ -109,6 +108,9 @@ setup(name='bodhi',
       initialize_bodhi_db = bodhi.scripts.initializedb:main
       bodhi = bodhi.cli:cli
       bodhi-expire-overrides = bodhi.scripts.expire_overrides:main
+      bodhi-refresh-release-stats = bodhi.scripts.refresh_release_stats:main
+      bodhi-refresh-critpath = bodhi.scripts.refresh_critpath:main
+      bodhi-sync-test-cases = bodhi.scripts.sync_wiki:main
       [moksha.consumer]
       masher = bodhi.masher:Masher
       """,
@@ -17,25 +17,44 @@
 """
 A tool for generating statistics for each release.
 
+Simple counts are computed with SQL aggregates, while the per-comment
+statistics are computed in a single pass over the updates of each release,
+loaded a chunk at a time so that memory use stays bounded.  Progress can be
+saved to a checkpoint file after every chunk, and picked back up from there
+if the run is interrupted::
+
+    python tools/metrics.py --checkpoint metrics.ckpt --json metrics.json F21
+
 .. moduleauthor:: Luke Macken <lmacken@redhat.com>
 """
 
 __requires__ = 'bodhi'
 
-import sys
+import json
+import optparse
+import os
 
 from operator import itemgetter
 from datetime import timedelta
-from collections import defaultdict
 
+from sqlalchemy import func, distinct
 from sqlalchemy.sql import and_
 
 from bodhi.util import get_db_from_config, header, get_critpath_pkgs
-from bodhi.models import Update, Release, UpdateStatus, UpdateType
+from bodhi.models import (Update, Release, UpdateStatus, UpdateType, Build,
+                          Package, Bug, User, Group,
+                          update_bug_table)
 
 statuses = ('stable', 'testing', 'pending', 'obsolete')
 types = ('bugfix', 'enhancement', 'security', 'newpackage')
 
+CHUNK_SIZE = 500
+
+STABLE_KARMA_TEXT = ('This update has reached the stable karma threshold and '
+                     'will be pushed to the stable updates repository')
+TESTING_TIME_TEXT = ('days in testing and can be pushed to stable now if the '
+                     'maintainer wishes')
+
 
 def short_url(update):
     if not update.builds:
@@ -45,284 +64,389 @@ def short_url(update):
         return 'https://admin.fedoraproject.org/updates/%s' % update.builds[0].nvr
 
 
-def main(releases=None):
-    db = get_db_from_config()
+def percent(part, whole):
+    return float(part) / whole * 100 if whole else 0.0
+
+
+def aggregate_release(db, release):
+    """ Compute the statistics SQL can count for us in a few queries """
+    data = {
+        'last_update_id': 0,
+        'done': False,
+        'num_updates': 0,
+        'num_tested': 0,
+        'num_tested_without_karma': 0,
+        'num_feedback': 0,
+        'num_anon_feedback': 0,
+        'num_critpath': 0,
+        'num_critpath_approved': 0,
+        'num_critpath_unapproved': 0,
+        'num_critpath_without_karma': 0,
+        'num_stablekarma': 0,
+        'num_testingtime': 0,
+        'conflicted_proventesters': [],
+        'critpath_positive_karma_including_proventesters': [],
+        'critpath_positive_karma_negative_proventesters': [],
+        'karma': {},
+        # Days spent in testing -> number of updates, and their sum in seconds
+        'occurrences': {},
+        'num_deltas': 0,
+        'accumulative': 0,
+        'proventesters': [],
+        'proventesters_1': 0,
+        'proventesters_0': 0,
+        'proventesters_-1': 0,
+        # for tracking number of types of karma
+        '1': 0,
+        '0': 0,
+        '-1': 0,
+    }
+    for status in statuses:
+        data['num_%s' % status] = 0
+    for type in types:
+        data['num_%s' % type] = 0
+
+    for status, type, num in db.query(
+            Update.status, Update.type, func.count(Update.id))\
+            .filter(Update.release_id == release.id)\
+            .group_by(Update.status, Update.type):
+        data['num_updates'] += num
+        if status.value in statuses:
+            data['num_%s' % status.value] += num
+        if type.value in types:
+            data['num_%s' % type.value] += num
+
+    data['stable_with_negative_karma'] = db.query(Update)\
+        .filter(Update.release_id == release.id)\
+        .filter(and_(Update.status == UpdateStatus.stable,
+                     Update.karma < 0)).count()
+
+    data['num_bugs'] = db.query(func.count(distinct(Bug.bug_id)))\
+        .join(update_bug_table, update_bug_table.c.bug_id == Bug.id)\
+        .join(Update, Update.id == update_bug_table.c.update_id)\
+        .filter(Update.release_id == release.id).scalar()
+
+    data['packages'] = dict(db.query(Package.name, func.count(Build.id))
+                            .join(Build.package).join(Build.update)
+                            .filter(Update.release_id == release.id)
+                            .group_by(Package.name))
+
+    data['submitters'] = dict(db.query(User.name, func.count(Update.id))
+                              .join(Update.user)
+                              .filter(Update.release_id == release.id)
+                              .group_by(User.name))
+    return data
+
+
+def iter_updates(db, release, after=0, chunk_size=CHUNK_SIZE):
+    """ Yield chunks of the updates of a release, ordered by id """
+    while True:
+        chunk = db.query(Update).filter(Update.release_id == release.id)\
+                  .filter(Update.id > after).order_by(Update.id)\
+                  .limit(chunk_size).all()
+        if not chunk:
+            return
+        yield chunk
+        after = chunk[-1].id
+        # Don't let the session hold on to everything we have seen so far
+        db.expunge_all()
+
+
+def process_update(update, data, totals, proventesters):
+    """ Fold the comments of one update into the statistics, in one pass """
+    feedback_done = False
+    stablekarma_done = False
+    pushed_to_testing = pushed_to_stable = None
+    proventester_karma = {}  # {username: karma}
+
+    for comment in update.comments:
+        if not comment.user:
+            print('Error: None comment for %s' % update.title)
+            continue
+        username = comment.user.name
+        if username == 'autoqa':
+            continue
+
+        # Track the # of +1's, -1's, and +0's.
+        if username != 'bodhi':
+            data[str(comment.karma)] += 1
+
+        if username in proventesters:
+            if username not in data['proventesters']:
+                data['proventesters'].append(username)
+            data['proventesters_%d' % comment.karma] += 1
+            proventester_karma[username] = \
+                proventester_karma.get(username, 0) + comment.karma
+
+        if update.status == UpdateStatus.stable and not stablekarma_done:
+            if comment.text == STABLE_KARMA_TEXT:
+                data['num_stablekarma'] += 1
+                stablekarma_done = True
+            elif comment.text and comment.text.endswith(TESTING_TIME_TEXT):
+                data['num_testingtime'] += 1
+                stablekarma_done = True
+
+        # For figuring out if an update has received feedback or not
+        if not feedback_done:
+            if (username != 'bodhi' and comment.karma != 0
+                    and not comment.anonymous):
+                data['num_feedback'] += 1  # per-release tracking of feedback
+                totals['feedback'] += 1  # total number of updates with feedback
+                feedback_done = True
+
+        # Tracking per-author karma & anonymous feedback
+        if username != 'bodhi':
+            if comment.anonymous:
+                # @@: should we track anon +0 comments as "feedback"?
+                if comment.karma != 0:
+                    data['num_anon_feedback'] += 1
+            else:
+                data['karma'][username] = data['karma'].get(username, 0) + 1
+                totals['karma'][username] = \
+                    totals['karma'].get(username, 0) + 1
+
+        if (pushed_to_testing is None and
+                comment.text == 'This update has been pushed to testing'):
+            pushed_to_testing = comment.timestamp
+        if (pushed_to_stable is None and
+                comment.text == 'This update has been pushed to stable'):
+            pushed_to_stable = comment.timestamp
+
+    testingtime_done = pushed_to_testing and pushed_to_stable
+    if testingtime_done:
+        delta = pushed_to_stable - pushed_to_testing
+        days = str(delta.days)
+        data['occurrences'][days] = data['occurrences'].get(days, 0) + 1
+        data['num_deltas'] += 1
+        data['accumulative'] += delta.days * 86400 + delta.seconds
+
+    if update.critpath:
+        if update.critpath_approved or update.status == UpdateStatus.stable:
+            data['num_critpath_approved'] += 1
+        else:
+            if update.status in (UpdateStatus.testing, UpdateStatus.pending):
+                data['num_critpath_unapproved'] += 1
+        data['num_critpath'] += 1
+        if update.status == UpdateStatus.stable and update.karma == 0:
+            data['num_critpath_without_karma'] += 1
+
+        # Proventester metrics
+        positive_proventesters = len(
+            [k for k in proventester_karma.values() if k > 0])
+        negative_proventesters = len(
+            [k for k in proventester_karma.values() if k < 0])
+
+        # Conflicting proventesters
+        if positive_proventesters and negative_proventesters:
+            data['conflicted_proventesters'].append(short_url(update))
+
+        # Track updates with overall positive karma, including positive
+        # karma from a proventester
+        if update.karma > 0 and positive_proventesters:
+            data['critpath_positive_karma_including_proventesters'].append(
+                short_url(update))
+
+        # Track updates with overall positive karma, including negative
+        # karma from a proventester
+        if update.karma > 0 and negative_proventesters:
+            data['critpath_positive_karma_negative_proventesters'].append(
+                short_url(update))
+
+    if testingtime_done:
+        data['num_tested'] += 1
+        if not feedback_done:
+            data['num_tested_without_karma'] += 1
+
+
+def save_checkpoint(path, stats):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(stats, f)
+    os.rename(tmp, path)
+
+
+def compute(db, releases=None, checkpoint=None, chunk_size=CHUNK_SIZE):
+    """ Return the statistics of every release, resuming from `checkpoint` """
+    stats = None
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint) as f:
+            stats = json.load(f)
+        print('Resuming from %s' % checkpoint)
+    if stats is None:
+        stats = {
+            'num_updates': db.query(Update).count(),
+            'feedback': 0,  # total number of updates that received feedback
+            'karma': {},  # {username: # of karma submissions}
+            'releases': {},  # {release: {'stat': ...}}
+        }
 
-    stats = {}  # {release: {'stat': ...}}
-    feedback = 0  # total number of updates that received feedback
-    karma = defaultdict(int)  # {username: # of karma submissions}
-    num_updates = db.query(Update).count()
-    proventesters = set()
+    proventesters = set(name for name, in db.query(User.name)
+                        .join(User.groups)
+                        .filter(Group.name == u'proventesters'))
 
-    for release in db.query(Release).all():
+    for release in db.query(Release).order_by(Release.id).all():
         if releases and release.name not in releases:
             continue
-        updates = db.query(Update).filter_by(release=release)
-        critpath_pkgs = get_critpath_pkgs(release.name.lower())
-        total = updates.count()
-        if not total:
+        data = stats['releases'].get(release.name)
+        if data is None:
+            data = aggregate_release(db, release)
+            if not data['num_updates']:
+                continue
+            stats['releases'][release.name] = data
+        if data['done']:
             continue
-        print header(release.long_name)
-        stats[release.name] = {
-            'num_updates': total,
-            'num_tested': 0,
-            'num_tested_without_karma': 0,
-            'num_feedback': 0,
-            'num_anon_feedback': 0,
-            'critpath_pkgs': defaultdict(int),
-            'num_critpath': 0,
-            'num_critpath_approved': 0,
-            'num_critpath_unapproved': 0,
-            'num_stablekarma': 0,
-            'num_testingtime': 0,
-            'critpath_without_karma': set(),
-            'conflicted_proventesters': [],
-            'critpath_positive_karma_including_proventesters': [],
-            'critpath_positive_karma_negative_proventesters': [],
-            'stable_with_negative_karma': updates.filter(
-                and_(Update.status == UpdateStatus.stable,
-                     Update.karma < 0)).count(),
-            'bugs': set(),
-            'karma': defaultdict(int),
-            'deltas': [],
-            'occurrences': {},
-            'accumulative': timedelta(),
-            'packages': defaultdict(int),
-            'proventesters': set(),
-            'proventesters_1': 0,
-            'proventesters_0': 0,
-            'proventesters_-1': 0,
-            'submitters': defaultdict(int),
-            # for tracking number of types of karma
-            '1': 0,
-            '0': 0,
-            '-1': 0,
-        }
-        data = stats[release.name]
-
-        for status in statuses:
-            data['num_%s' % status] = updates.filter(
-                and_(Update.status == UpdateStatus.from_string(status))).count()
-
-        for type in types:
-            data['num_%s' % type] = updates.filter(
-                Update.type == UpdateType.from_string(type)).count()
-
-        for update in updates.all():
-            assert update.user, update.title
-            data['submitters'][update.user.name] += 1
-            for build in update.builds:
-                data['packages'][build.package.name] += 1
-                if build.package.name in critpath_pkgs:
-                    data['critpath_pkgs'][build.package.name] += 1
-            for bug in update.bugs:
-                data['bugs'].add(bug.bug_id)
-
-            feedback_done = False
-            testingtime_done = False
-            stablekarma_done = False
-
-            for comment in update.comments:
-                if not comment.user:
-                    print('Error: None comment for %s' % update.title)
-                if comment.user.name == 'autoqa':
-                    continue
-
-                # Track the # of +1's, -1's, and +0's.
-                if comment.user.name != 'bodhi':
-                    data[str(comment.karma)] += 1
-
-                if 'proventesters' in [g.name for g in comment.user.groups]:
-                    data['proventesters'].add(comment.user.name)
-                    data['proventesters_%d' % comment.karma] += 1
-
-                if update.status == UpdateStatus.stable:
-                    if not stablekarma_done:
-                        if comment.text == 'This update has reached the stable karma threshold and will be pushed to the stable updates repository':
-                            data['num_stablekarma'] += 1
-                            stablekarma_done = True
-                        elif comment.text and comment.text.endswith('days in testing and can be pushed to stable now if the maintainer wishes'):
-                            data['num_testingtime'] += 1
-                            stablekarma_done = True
-
-                # For figuring out if an update has received feedback or not
-                if not feedback_done:
-                    if (not comment.user.name == 'bodhi'
-                        and comment.karma != 0 and not comment.anonymous):
-                        data['num_feedback'] += 1  # per-release tracking of feedback
-                        feedback += 1  # total number of updates that have received feedback
-                        feedback_done = True  # so we don't run this for each comment
-
-                # Tracking per-author karma & anonymous feedback
-                if not comment.user.name == 'bodhi':
-                    if comment.anonymous:
-                        # @@: should we track anon +0 comments as "feedback"?
-                        if comment.karma != 0:
-                            data['num_anon_feedback'] += 1
-                    else:
-                        author = comment.user.name
-                        data['karma'][author] += 1
-                        karma[author] += 1
-
-                if (not testingtime_done and
-                    comment.text == 'This update has been pushed to testing'):
-                    for othercomment in update.comments:
-                        if othercomment.text == 'This update has been pushed to stable':
-                            delta = othercomment.timestamp - comment.timestamp
-                            data['deltas'].append(delta)
-                            data['occurrences'][delta.days] = \
-                                data['occurrences'].setdefault(
-                                        delta.days, 0) + 1
-                            data['accumulative'] += delta
-                            testingtime_done = True
-                            break
-
-            if update.critpath:
-                if update.critpath_approved or update.status == UpdateStatus.stable:
-                    data['num_critpath_approved'] += 1
-                else:
-                    if update.status in (UpdateStatus.testing, UpdateStatus.pending):
-                        data['num_critpath_unapproved'] += 1
-                data['num_critpath'] += 1
-                #if not feedback_done:
-                if update.status == UpdateStatus.stable and update.karma == 0:
-                    data['critpath_without_karma'].add(update)
-
-                # Proventester metrics
-                proventester_karma = defaultdict(int) # {username: karma}
-                positive_proventesters = 0
-                negative_proventesters = 0
-                for comment in update.comments:
-                    if 'proventesters' in [g.name for g in comment.user.groups]:
-                        proventester_karma[comment.user.name] += comment.karma
-                for _karma in proventester_karma.values():
-                    if _karma > 0:
-                        positive_proventesters += 1
-                    elif _karma < 0:
-                        negative_proventesters += 1
-
-                # Conflicting proventesters
-                if positive_proventesters and negative_proventesters:
-                    data['conflicted_proventesters'] += [short_url(update)]
-
-                # Track updates with overall positive karma, including positive
-                # karma from a proventester
-                if update.karma > 0 and positive_proventesters:
-                    data['critpath_positive_karma_including_proventesters'] += [short_url(update)]
-
-                # Track updates with overall positive karma, including negative
-                # karma from a proventester
-                if update.karma > 0 and negative_proventesters:
-                    data['critpath_positive_karma_negative_proventesters'] += [short_url(update)]
-
-            if testingtime_done:
-                data['num_tested'] += 1
-                if not feedback_done:
-                    data['num_tested_without_karma'] += 1
-
-        data['deltas'].sort()
-
-        print " * %d updates" % data['num_updates']
-        print " * %d packages updated" % (len(data['packages']))
-        for status in statuses:
-            print " * %d %s updates" % (data['num_%s' % status], status)
-        for type in types:
-            print " * %d %s updates (%0.2f%%)" % (data['num_%s' % type], type,
-                    float(data['num_%s' % type]) / data['num_updates'] * 100)
-        print " * %d bugs resolved" % len(data['bugs'])
-        print " * %d critical path updates (%0.2f%%)" % (data['num_critpath'],
-                float(data['num_critpath']) / data['num_updates'] * 100)
-        print " * %d approved critical path updates" % (
-                data['num_critpath_approved'])
-        print " * %d unapproved critical path updates" % (
-                data['num_critpath_unapproved'])
-        print " * %d updates received feedback (%0.2f%%)" % (
-                data['num_feedback'], (float(data['num_feedback']) /
-                 data['num_updates'] * 100))
-        print " * %d +0 comments" % data['0']
-        print " * %d +1 comments" % data['1']
-        print " * %d -1 comments" % data['-1']
-        print " * %d unique authenticated karma submitters" % (
-                len(data['karma']))
-        print " * %d proventesters" % len(data['proventesters'])
-        print "   * %d +1's from proventesters" % data['proventesters_1']
-        print "   * %d -1's from proventesters" % data['proventesters_-1']
-        if data['num_critpath']:
-            print " * %d critpath updates with conflicting proventesters (%0.2f%% of critpath)" % (len(data['conflicted_proventesters']), float(len(data['conflicted_proventesters'])) / data['num_critpath'] * 100)
-            for u in sorted(data['conflicted_proventesters']):
-                print '   <li><a href="%s">%s</a></li>' % (u, u.split('/')[-1])
-            print " * %d critpath updates with positive karma and negative proventester feedback (%0.2f%% of critpath)" % (len(data['critpath_positive_karma_negative_proventesters']), float(len(data['critpath_positive_karma_negative_proventesters'])) / data['num_critpath'] * 100)
-            for u in sorted(data['critpath_positive_karma_negative_proventesters']):
-                print '   <li><a href="%s">%s</a></li>' % (u, u.split('/')[-1])
-            print " * %d critpath updates with positive karma and positive proventester feedback (%0.2f%% of critpath)" % (len(data['critpath_positive_karma_including_proventesters']), float(len(data['critpath_positive_karma_including_proventesters'])) / data['num_critpath'] * 100)
-        print " * %d anonymous users gave feedback (%0.2f%%)" % (
-                data['num_anon_feedback'], float(data['num_anon_feedback']) /
-                (data['num_anon_feedback'] + sum(data['karma'].values())) * 100)
+
+        for chunk in iter_updates(db, release, data['last_update_id'],
+                                  chunk_size):
+            for update in chunk:
+                assert update.user, update.title
+                process_update(update, data, stats, proventesters)
+            data['last_update_id'] = chunk[-1].id
+            if checkpoint:
+                save_checkpoint(checkpoint, stats)
+        data['done'] = True
+        if checkpoint:
+            save_checkpoint(checkpoint, stats)
+
+    return stats
+
+
+def report_release(release, data):
+    """ Print the text report of a single release """
+    critpath_pkgs = get_critpath_pkgs(release.lower())
+    critpath_updated = dict((pkg, num) for pkg, num in data['packages'].items()
+                            if pkg in critpath_pkgs)
+    num_updates = data['num_updates']
+    num_critpath = data['num_critpath']
+
+    print " * %d updates" % num_updates
+    print " * %d packages updated" % (len(data['packages']))
+    for status in statuses:
+        print " * %d %s updates" % (data['num_%s' % status], status)
+    for type in types:
+        print " * %d %s updates (%0.2f%%)" % (data['num_%s' % type], type,
+                percent(data['num_%s' % type], num_updates))
+    print " * %d bugs resolved" % data['num_bugs']
+    print " * %d critical path updates (%0.2f%%)" % (num_critpath,
+            percent(num_critpath, num_updates))
+    print " * %d approved critical path updates" % (
+            data['num_critpath_approved'])
+    print " * %d unapproved critical path updates" % (
+            data['num_critpath_unapproved'])
+    print " * %d updates received feedback (%0.2f%%)" % (
+            data['num_feedback'], percent(data['num_feedback'], num_updates))
+    print " * %d +0 comments" % data['0']
+    print " * %d +1 comments" % data['1']
+    print " * %d -1 comments" % data['-1']
+    print " * %d unique authenticated karma submitters" % (
+            len(data['karma']))
+    print " * %d proventesters" % len(data['proventesters'])
+    print "   * %d +1's from proventesters" % data['proventesters_1']
+    print "   * %d -1's from proventesters" % data['proventesters_-1']
+    if num_critpath:
+        conflicted = data['conflicted_proventesters']
+        negative = data['critpath_positive_karma_negative_proventesters']
+        positive = data['critpath_positive_karma_including_proventesters']
+        print " * %d critpath updates with conflicting proventesters (%0.2f%% of critpath)" % (len(conflicted), percent(len(conflicted), num_critpath))
+        for u in sorted(conflicted):
+            print '   <li><a href="%s">%s</a></li>' % (u, u.split('/')[-1])
+        print " * %d critpath updates with positive karma and negative proventester feedback (%0.2f%% of critpath)" % (len(negative), percent(len(negative), num_critpath))
+        for u in sorted(negative):
+            print '   <li><a href="%s">%s</a></li>' % (u, u.split('/')[-1])
+        print " * %d critpath updates with positive karma and positive proventester feedback (%0.2f%% of critpath)" % (len(positive), percent(len(positive), num_critpath))
+    print " * %d anonymous users gave feedback (%0.2f%%)" % (
+            data['num_anon_feedback'], percent(data['num_anon_feedback'],
+            data['num_anon_feedback'] + sum(data['karma'].values())))
 # This does not take into account updates that reach stablekarma before being pushed to testing!
 #        print " * %d out of %d stable updates went through testing (%0.2f%%)" %(
 #                data['num_tested'], data['num_stable'],
 #                float(data['num_tested']) / data['num_stable'] * 100)
-        print " * %d stable updates reached the stable karma threshold (%0.2f%%)" %(
-                data['num_stablekarma'],
-                float(data['num_stablekarma']) / data['num_stable'] * 100)
-        print " * %d stable updates reached the minimum time in testing threshold (%0.2f%%)" % (
-                data['num_testingtime'],
-                float(data['num_testingtime']) / data['num_stable'] * 100)
-        print " * %d went from testing to stable *without* karma (%0.2f%%)" %(
-                data['num_tested_without_karma'],
-                float(data['num_tested_without_karma']) /
-                data['num_tested'] * 100)
-        print " * %d updates were pushed to stable with negative karma (%0.2f%%)" % (
-                data['stable_with_negative_karma'], float(data['stable_with_negative_karma']) / data['num_stable'] * 100)
-        print " * %d critical path updates pushed to stable *without* karma" % (
-                len(data['critpath_without_karma']))
-        #for update in data['critpath_without_karma']:
-        #    print "   * %s submitted by %s" % (update.title, update.submitter)
+    print " * %d stable updates reached the stable karma threshold (%0.2f%%)" %(
+            data['num_stablekarma'],
+            percent(data['num_stablekarma'], data['num_stable']))
+    print " * %d stable updates reached the minimum time in testing threshold (%0.2f%%)" % (
+            data['num_testingtime'],
+            percent(data['num_testingtime'], data['num_stable']))
+    print " * %d went from testing to stable *without* karma (%0.2f%%)" %(
+            data['num_tested_without_karma'],
+            percent(data['num_tested_without_karma'], data['num_tested']))
+    print " * %d updates were pushed to stable with negative karma (%0.2f%%)" % (
+            data['stable_with_negative_karma'],
+            percent(data['stable_with_negative_karma'], data['num_stable']))
+    print " * %d critical path updates pushed to stable *without* karma" % (
+            data['num_critpath_without_karma'])
+    if data['num_deltas']:
+        occurrences = sorted((int(days), num) for days, num
+                             in data['occurrences'].items())
+        middle, median = data['num_deltas'] / 2, None
+        for days, num in occurrences:
+            middle -= num
+            if middle < 0:
+                median = days
+                break
         print " * Time spent in testing:"
-        print "   * mean = %d days" % (data['accumulative'].days /
-                len(data['deltas']))
-        print "   * median = %d days" % (
-                data['deltas'][len(data['deltas']) / 2].days)
+        print "   * mean = %d days" % (
+                timedelta(seconds=data['accumulative']).days /
+                data['num_deltas'])
+        print "   * median = %d days" % median
         print "   * mode = %d days" % (
-                sorted(data['occurrences'].items(), key=itemgetter(1))[-1][0])
-
-        print "Out of %d packages updated, the top 50 were:" % (
-                len(data['packages']))
-        for package in sorted(data['packages'].iteritems(), key=itemgetter(1), reverse=True)[:50]:
-            print " * %s (%d)" % (package[0], package[1])
-
-        print "Out of %d update submitters, the top 50 were:" % (
-                len(data['submitters']))
-        for submitter in sorted(data['submitters'].iteritems(), key=itemgetter(1), reverse=True)[:50]:
-            print " * %s (%d)" % (submitter[0], submitter[1])
-
-        print "Out of %d critical path updates, the top 50 updated were:" % (
-                len(data['critpath_pkgs']))
-        for x in sorted(data['critpath_pkgs'].iteritems(), key=itemgetter(1), reverse=True)[:50]:
-            print " * %s (%d)" % (x[0], x[1])
-
-        critpath_not_updated = set()
-        for pkg in critpath_pkgs:
-            if pkg not in data['critpath_pkgs']:
-                critpath_not_updated.add(pkg)
-        print "Out of %d critical path packages, %d were never updated:" % (
-                len(critpath_pkgs), len(critpath_not_updated))
-        for pkg in sorted(critpath_not_updated):
-            print(' * %s' % pkg)
-
-        print
+                sorted(occurrences, key=itemgetter(1))[-1][0])
+
+    print "Out of %d packages updated, the top 50 were:" % (
+            len(data['packages']))
+    for package in sorted(data['packages'].iteritems(), key=itemgetter(1), reverse=True)[:50]:
+        print " * %s (%d)" % (package[0], package[1])
+
+    print "Out of %d update submitters, the top 50 were:" % (
+            len(data['submitters']))
+    for submitter in sorted(data['submitters'].iteritems(), key=itemgetter(1), reverse=True)[:50]:
+        print " * %s (%d)" % (submitter[0], submitter[1])
+
+    print "Out of %d critical path updates, the top 50 updated were:" % (
+            len(critpath_updated))
+    for x in sorted(critpath_updated.iteritems(), key=itemgetter(1), reverse=True)[:50]:
+        print " * %s (%d)" % (x[0], x[1])
+
+    critpath_not_updated = set()
+    for pkg in critpath_pkgs:
+        if pkg not in critpath_updated:
+            critpath_not_updated.add(pkg)
+    print "Out of %d critical path packages, %d were never updated:" % (
+            len(critpath_pkgs), len(critpath_not_updated))
+    for pkg in sorted(critpath_not_updated):
+        print(' * %s' % pkg)
 
     print
+
+
+def main(releases=None, checkpoint=None, json_file=None):
+    db = get_db_from_config()
+    stats = compute(db, releases, checkpoint)
+
+    long_names = dict(db.query(Release.name, Release.long_name))
+    for release, data in sorted(stats['releases'].items()):
+        print header(long_names.get(release, release))
+        report_release(release, data)
+
+    num_updates, feedback = stats['num_updates'], stats['feedback']
+    print
     print "Out of %d total updates, %d received feedback (%0.2f%%)" % (
-            num_updates, feedback, (float(feedback) / num_updates * 100))
+            num_updates, feedback, percent(feedback, num_updates))
     print "Out of %d total unique commenters, the top 50 were:" % (
-            len(karma))
-    for submitter in sorted(karma.iteritems(), key=itemgetter(1), reverse=True)[:50]:
+            len(stats['karma']))
+    for submitter in sorted(stats['karma'].iteritems(), key=itemgetter(1), reverse=True)[:50]:
         print " * %s (%d)" % (submitter[0], submitter[1])
 
+    if json_file:
+        with open(json_file, 'w') as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+
 
 if __name__ == '__main__':
-    releases = None
-    if len(sys.argv) > 1:
-        releases = sys.argv[1:]
-    main(releases)
+    parser = optparse.OptionParser(usage='%prog [options] [RELEASE...]')
+    parser.add_option('-c', '--checkpoint', metavar='FILE',
+                      help='Save progress to FILE, and resume from it')
+    parser.add_option('-j', '--json', metavar='FILE',
+                      help='Also write the statistics to FILE as JSON')
+    opts, args = parser.parse_args()
+    main(args or None, opts.checkpoint, opts.json)
@@ -0,0 +1,165 @@
+""" obsolete-bench.py
+
+Benchmark Update.obsolete_older_updates against a release full of active
+updates.
+
+A synthetic database with a single release is generated (see
+bodhi.scripts.generate_data) and every one of its updates is made a testing
+update without a request, so that all of them are candidates for
+obsoletion.  Then, for a sample of those updates, a newer update of the same
+builds is created and obsolete_older_updates is timed, in a transaction that
+is rolled back afterwards::
+
+    python tools/obsolete-bench.py --updates 10000 --samples 200
+
+Along with the timings, the number of SQL queries and ORM rows behind each
+call is reported, next to the number of rows a lookup of every active build
+of the release would load.
+"""
+
+import optparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import transaction
+
+from sqlalchemy import create_engine, event, func
+from sqlalchemy.orm import mapper
+
+from bodhi.models import (Base, Build, DBSession, Update, UpdateRequest,
+                          UpdateStatus)
+from bodhi.scripts.generate_data import generate
+from bodhi.util import get_nvr
+
+
+class Recorder(object):
+    """ Counts the queries and ORM rows between start() and stop() """
+
+    def __init__(self, engine):
+        self.local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self.query)
+        event.listen(mapper, 'load', self.load)
+
+    def query(self, *args):
+        if hasattr(self.local, 'queries'):
+            self.local.queries += 1
+
+    def load(self, *args):
+        if hasattr(self.local, 'rows'):
+            self.local.rows += 1
+
+    def start(self):
+        self.local.queries = self.local.rows = 0
+
+    def stop(self):
+        return self.local.queries, self.local.rows
+
+
+class Request(object):
+    """ The bits of a request that obsolete_older_updates uses """
+
+    def __init__(self, db, builds):
+        self.db = db
+        self.buildinfo = dict((build.nvr, {'nvr': get_nvr(build.nvr)})
+                              for build in builds)
+        self.session = self
+
+    def flash(self, message):
+        pass
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = int(round(pct / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def seed(opts):
+    """ Generate the database, and make every update of it active """
+    dbfile = os.path.join(tempfile.mkdtemp(), 'obsolete-bench.db')
+    engine = create_engine('sqlite:///%s' % dbfile)
+    DBSession.configure(bind=engine)
+    Base.metadata.create_all(engine)
+
+    print 'Seeding %d updates into %s' % (opts.updates, dbfile)
+    with engine.begin() as connection:
+        generate(connection, seed=opts.seed, releases=1,
+                 packages=opts.packages, users=opts.users,
+                 updates=opts.updates, comments=1)
+        connection.execute(Update.__table__.update().values(
+            status=UpdateStatus.testing, request=None))
+    return engine
+
+
+def newer_update(db, update):
+    """ Return a new pending update of newer builds of `update` """
+    builds = []
+    for build in update.builds:
+        name, version, release = get_nvr(build.nvr)
+        builds.append(Build(nvr=u'%s-%s.1-%s' % (name, version, release),
+                            package=build.package, release=update.release))
+    newer = Update(
+        title=u' '.join(build.nvr for build in builds), builds=builds,
+        notes=u'Benchmark update', type=update.type,
+        status=UpdateStatus.pending, request=UpdateRequest.testing,
+        release=update.release, user=update.user)
+    db.add(newer)
+    db.flush()
+    return newer
+
+
+def main(argv=sys.argv[1:]):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--seed', type='int', default=0)
+    parser.add_option('--packages', type='int', default=5000)
+    parser.add_option('--users', type='int', default=500)
+    parser.add_option('--updates', type='int', default=10000,
+                      help='Active updates in the release')
+    parser.add_option('--samples', type='int', default=100,
+                      help='Updates to obsolete')
+    opts, args = parser.parse_args(argv)
+
+    engine = seed(opts)
+    recorder = Recorder(engine)
+
+    db = DBSession()
+    active_builds = db.query(func.count(Build.id)).join(Update.builds)\
+        .filter(Update.status == UpdateStatus.testing).scalar()
+    ids = [id for id, in db.query(Update.id).order_by(Update.id)]
+    step = max(1, len(ids) / opts.samples)
+    ids = ids[::step][:opts.samples]
+    DBSession.remove()
+
+    durations, queries, rows = [], [], []
+    for id in ids:
+        db = DBSession()
+        newer = newer_update(db, db.query(Update).get(id))
+        request = Request(db, newer.builds)
+        recorder.start()
+        start = time.time()
+        newer.obsolete_older_updates(request)
+        durations.append(time.time() - start)
+        sample_queries, sample_rows = recorder.stop()
+        queries.append(sample_queries)
+        rows.append(sample_rows)
+        transaction.abort()
+        DBSession.remove()
+
+    print "-" * 7
+    print "Results"
+    print "-" * 7
+    print '%d samples against %d active updates (%d builds)' % (
+        len(durations), opts.updates, active_builds)
+    print 'p50=%0.4fs p95=%0.4fs p99=%0.4fs' % (
+        percentile(durations, 50), percentile(durations, 95),
+        percentile(durations, 99))
+    print 'queries: p50=%d max=%d' % (percentile(queries, 50), max(queries))
+    print 'rows: p50=%d max=%d (a lookup of all active builds loads %d)' % (
+        percentile(rows, 50), max(rows), active_builds)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,42 +1,297 @@
 """ perf-test.py
 
-Perform HTTP GET requests on a bunch of local bodhi URLs and report how long
-each one took to respond/load.
+Benchmark a bunch of bodhi URLs and report how long each one took to
+respond, along with how many SQL queries it ran and how many rows it loaded.
+
+By default a synthetic database is generated (see bodhi.scripts.generate_data)
+and the WSGI app is driven in-process, which lets us count the queries behind
+each request::
+
+    python tools/perf-test.py --updates 5000 --concurrency 4 --requests 50
+
+Pass --url to benchmark a running instance over HTTP instead.  In that case
+bodhi's own URLs from the seeded data aren't known, so the default paths are
+pointed at --release/--update/--user::
+
+    python tools/perf-test.py --url http://localhost:6543 --release f19 \\
+        --update abrt-2.1.6-2.fc19 --user adamwill
+
+Results can be stored with --save-baseline and later runs compared against
+them with --baseline, which exits non-zero when an endpoint got slower, by
+more than --threshold percent and --min-delta milliseconds, or started
+running more queries.
 """
 
 import collections
-import requests
+import json
+import optparse
+import os
+import sys
+import tempfile
+import threading
 import time
 
+import requests
+
+from sqlalchemy import event
+from sqlalchemy.orm import mapper
+
+import bodhi
+from bodhi.models import Base, DBSession, Update
+from bodhi.scripts.generate_data import generate
+from bodhi.tests.functional.base import BaseWSGICase
+
 items = collections.OrderedDict([
-    ('frontpage', 'http://localhost:6543/'),
-    ('update_list', 'http://localhost:6543/updates'),
-    ('update_view', ('http://localhost:6543/updates/'
-                     'abrt-2.1.6-2.fc19%2Cgnome-abrt'
-                     '-0.3.0-3.fc19%2Clibreport-2.1.6-2.fc19')),
-    ('release_list', 'http://localhost:6543/releases'),
-    ('release_view', 'http://localhost:6543/releases/f19'),
-    ('comment_list', 'http://localhost:6543/comments'),
-    ('comment_view', 'http://localhost:6543/comments/2'),
-    ('user_list', 'http://localhost:6543/users/'),
-    ('user_view', 'http://localhost:6543/users/adamwill'),
+    ('frontpage', '/'),
+    ('update_list', '/updates/'),
+    ('update_view', '/updates/{update}'),
+    ('release_list', '/releases/'),
+    ('release_view', '/releases/{release}'),
+    ('comment_list', '/comments/'),
+    ('comment_view', '/comments/{comment}'),
+    ('user_list', '/users/'),
+    ('user_view', '/users/{user}'),
+    ('metrics', '/metrics'),
 ])
 
-results = collections.OrderedDict()
+# Prefer the HTML pages, but fall back to JSON for the API-only services
+ACCEPT = 'text/html, application/json;q=0.9'
+
+#
+# Measurements
+#
+
+
+class Recorder(object):
+    """ Counts the queries and ORM rows of the request in each thread """
+
+    def __init__(self, engine):
+        self.local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self.query)
+        event.listen(mapper, 'load', self.load)
+
+    def query(self, *args):
+        if hasattr(self.local, 'queries'):
+            self.local.queries += 1
+
+    def load(self, *args):
+        if hasattr(self.local, 'rows'):
+            self.local.rows += 1
+
+    def start(self):
+        self.local.queries = self.local.rows = 0
+
+    def stop(self):
+        return self.local.queries, self.local.rows
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = int(round(pct / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(index, len(values) - 1))]
+
+
+def run(fetch, path, num_requests, concurrency):
+    """ Request `path` num_requests times from `concurrency` threads """
+    samples = []
+    lock = threading.Lock()
+    remaining = [num_requests]
+
+    def worker():
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            sample = fetch(path)
+            with lock:
+                samples.append(sample)
+
+    threads = [threading.Thread(target=worker) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples):
+    durations = [sample[0] for sample in samples]
+    result = {
+        'requests': len(samples),
+        'p50': percentile(durations, 50),
+        'p95': percentile(durations, 95),
+        'p99': percentile(durations, 99),
+    }
+    if samples[0][1] is not None:
+        result['queries'] = max(sample[1] for sample in samples)
+        result['rows'] = max(sample[2] for sample in samples)
+    return result
+
+
+def in_process_fetcher(opts):
+    """ Seed a temporary database and return a function requesting paths """
+    from webtest import TestApp
+
+    dbfile = os.path.join(tempfile.mkdtemp(), 'perf-test.db')
+    settings = BaseWSGICase.app_settings.copy()
+    settings['sqlalchemy.url'] = 'sqlite:///%s' % dbfile
+    app = TestApp(bodhi.main({}, testing=u'guest', **settings))
+    engine = DBSession.get_bind()
+    Base.metadata.create_all(engine)
+
+    print 'Seeding %d updates into %s' % (opts.updates, dbfile)
+    with engine.begin() as connection:
+        generate(connection, seed=opts.seed, releases=opts.releases,
+                 packages=opts.packages, users=opts.users,
+                 updates=opts.updates, comments=opts.comments)
+
+    first = DBSession().query(Update).filter(Update.comments.any())\
+        .filter(Update.pushed == False).first()
+    names = {
+        'update': first.title,
+        'release': first.release.name.lower(),
+        'comment': first.comments[0].id,
+        'user': first.user.name,
+    }
+    DBSession.remove()
+
+    recorder = Recorder(engine)
+
+    def fetch(path):
+        recorder.start()
+        start = time.time()
+        app.get(path, headers={'Accept': ACCEPT})
+        duration = time.time() - start
+        queries, rows = recorder.stop()
+        DBSession.remove()
+        return duration, queries, rows
+
+    return fetch, names
+
+
+def http_fetcher(opts):
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=opts.concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    def fetch(path):
+        start = time.time()
+        session.get(opts.url.rstrip('/') + path,
+                    headers={'Accept': ACCEPT}).raise_for_status()
+        return time.time() - start, None, None
+
+    names = {'update': opts.update, 'release': opts.release,
+             'comment': opts.comment, 'user': opts.user}
+    return fetch, names
+
+
+def compare(results, baseline, threshold, min_delta):
+    """
+    Print how each endpoint changed, and return whether any regressed.  A
+    p95 only regresses when it grew by more than `threshold` percent and by
+    more than `min_delta` milliseconds, so that timer noise on fast endpoints
+    isn't flagged.
+    """
+    regressed = False
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        delta = (result['p95'] - before['p95']) * 1000
+        notes = []
+        if before['p95']:
+            percent = delta / (before['p95'] * 1000) * 100
+            change = '%+0.1f%%' % percent
+            slower = percent > threshold
+        else:
+            # A fast endpoint with a coarse timer, without any percentage
+            change = '%+0.1fms' % delta
+            slower = True
+        if slower and delta > min_delta:
+            notes.append('p95 %s' % change)
+        if result.get('queries', 0) > before.get('queries', result.get(
+                'queries', 0)):
+            notes.append('queries %d -> %d' % (before['queries'],
+                                               result['queries']))
+        if notes:
+            regressed = True
+        print name.rjust(20), change, \
+            'REGRESSION: ' + ', '.join(notes) if notes else 'ok'
+    return regressed
+
+
+def main(argv=sys.argv[1:]):
+    parser = optparse.OptionParser(usage='%prog [options]')
+    parser.add_option('--url', help='Benchmark a running bodhi over HTTP')
+    parser.add_option('--release', default='f19')
+    parser.add_option('--update', default='abrt-2.1.6-2.fc19')
+    parser.add_option('--comment', default='2')
+    parser.add_option('--user', default='adamwill')
+    parser.add_option('--seed', type='int', default=0)
+    parser.add_option('--releases', type='int', default=4)
+    parser.add_option('--packages', type='int', default=500)
+    parser.add_option('--users', type='int', default=200)
+    parser.add_option('--updates', type='int', default=2000)
+    parser.add_option('--comments', type='float', default=5,
+                      help='Average number of comments per update')
+    parser.add_option('-n', '--requests', type='int', default=20,
+                      help='Requests per endpoint')
+    parser.add_option('-c', '--concurrency', type='int', default=1)
+    parser.add_option('--warmup', type='int', default=2,
+                      help='Untimed requests per endpoint')
+    parser.add_option('--only', action='append',
+                      help='Only benchmark this endpoint (repeatable)')
+    parser.add_option('--save-baseline', metavar='FILE')
+    parser.add_option('--baseline', metavar='FILE')
+    parser.add_option('--threshold', type='float', default=20.0,
+                      help='p95 increase, in percent, deemed a regression')
+    parser.add_option('--min-delta', type='float', default=5.0,
+                      help='p95 increase, in milliseconds, below which no '
+                      'regression is reported')
+    opts, args = parser.parse_args(argv)
+
+    if opts.url:
+        fetch, names = http_fetcher(opts)
+    else:
+        fetch, names = in_process_fetcher(opts)
+
+    results = collections.OrderedDict()
+    for name, path in items.items():
+        if opts.only and name not in opts.only:
+            continue
+        path = path.format(**names)
+        print 'Crunching', name, path
+        for i in range(opts.warmup):
+            fetch(path)
+        results[name] = summarize(run(fetch, path, opts.requests,
+                                      opts.concurrency))
+
+    print "-" * 7
+    print "Results"
+    print "-" * 7
+    for name, result in results.items():
+        line = '%s p50=%0.4fs p95=%0.4fs p99=%0.4fs' % (
+            name.rjust(20), result['p50'], result['p95'], result['p99'])
+        if 'queries' in result:
+            line += ' queries=%d rows=%d' % (result['queries'],
+                                             result['rows'])
+        print line
 
+    if opts.save_baseline:
+        with open(opts.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
 
-def clock_it(url):
-    start = time.time()
-    requests.get(url)
-    return time.time() - start
+    if opts.baseline:
+        with open(opts.baseline) as f:
+            baseline = json.load(f)
+        print "-" * 8
+        print "Baseline"
+        print "-" * 8
+        if compare(results, baseline, opts.threshold, opts.min_delta):
+            sys.exit(1)
 
-for name, url in items.items():
-    print 'Crunching', name, url
-    duration = clock_it(url)
-    results[name] = duration
 
-print "-" * 7
-print "Results"
-print "-" * 7
-for name, duration in results.items():
-    print name.rjust(20), duration, "seconds"
+if __name__ == '__main__':
+    main()